@@ -1,8 +1,12 @@
 import streamlit as st
 from sidebar import navigation
 from my_pages import availability, overview, tracker_bbm
+from warmup import start_warmup
 
 st.set_page_config(page_title="Dashboard CDC & TDE", layout="wide")
+
+# --- Background warmup + scheduled prefetch (starts once per server process) ---
+start_warmup()
 # st.write("Available secrets keys:", list(st.secrets.keys()))
 # --- Use sidebar navigation ---
 selected_page = navigation()
@@ -2,23 +2,83 @@ import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 from utils.data_loader import load_all_daily_files, load_all_weekly_files
+from utils.shared_data import (
+    FILTER_CACHE_ENTRIES, get_shared_daily, get_shared_weekly, get_shared_sites, shared_csv_bytes, clear_shared_data
+)
+from utils.site_search import get_site_search_index, site_search_select
+from utils.lazy_tabs import lazy_tabs
+from utils.filter_index import get_hierarchy_index
+from utils.cubes import get_daily_cube, daily_achievement_trend
+from utils.availability_metrics import (
+    RANKING_METRICS, AVAILABILITY_TOLERANCE, site_totals, rank_sites, get_anomalies, get_validation_summary
+)
+from utils.chart_data import downsample_frame, scatter, show_chart
 import random
 
 @st.cache_data
 def get_data():
     return load_all_daily_files()
 
-def app_tab1(df):
+def site_index(shared):
+    """Area -> regional -> site_id index of a shared daily/weekly frame."""
+    return get_hierarchy_index(shared.name, shared.version, shared.df, 'area', 'regional', 'site_id')
+
+def site_search(shared):
+    """Type-ahead index over the frame's site IDs, with names from the KML site master."""
+    sites = get_shared_sites()
+    return get_site_search_index(
+        shared.name, f"{shared.version}:{sites.version}", site_index(shared).sites(),
+        sites.df, "Site ID", "Site Name"
+    )
+
+def _site_class(_df, _index, site_id):
+    site_rows = _index.rows(site=site_id)
+    return _df['site_class'].iloc[site_rows[0]] if len(site_rows) and 'site_class' in _df.columns else 'Unknown'
+
+# --- Memoized filters: keyed by data version + filter selection (LRU-bounded) ---
+@st.cache_resource(max_entries=FILTER_CACHE_ENTRIES)
+def filter_daily_site(version, _df, _index, start_date, end_date, area, regional, site_id):
+    # Index lookup narrows to the site's rows; only the date check runs on that subset
+    site_df = _df.iloc[_index.rows(area, regional, site_id)]
+    mask = (
+        (site_df['Date'] >= pd.to_datetime(start_date)) &
+        (site_df['Date'] <= pd.to_datetime(end_date))
+    )
+    filtered_df = site_df[mask].sort_values('Date')
+
+    # Add formatted labels
+    filtered_df['availability_label'] = filtered_df['availability (%)'].round(2).astype(str) + '%'
+    filtered_df['outage_4g_label'] = filtered_df['outage_4g (Hour)'].round(2).astype(str) + ' hrs'
+
+    site_class = _site_class(_df, _index, site_id)
+
+    csv_filtered = filtered_df.to_csv(index=False).encode('utf-8')
+    return filtered_df, site_class, csv_filtered
+
+@st.cache_resource(max_entries=FILTER_CACHE_ENTRIES)
+def filter_weekly_site(version, _df, _index, weeks, year, area, regional, site_id):
+    site_df = _df.iloc[_index.rows(area, regional, site_id)]
+    mask = (
+        (site_df['Week'].isin(weeks)) &
+        (site_df['Year'] == year)
+    )
+    filtered_df = site_df[mask].sort_values('Week_Num')
+
+    site_class = _site_class(_df, _index, site_id)
+
+    csv_filtered = filtered_df.to_csv(index=False).encode("utf-8")
+    return filtered_df, site_class, csv_filtered
+
+@st.cache_resource(max_entries=FILTER_CACHE_ENTRIES)
+def ranking_totals(version, _df, _index, start_date, end_date, area, regional):
+    return site_totals(_df, start_date, end_date, rows=_index.rows(area, regional))
+
+def app_tab1(shared):
     st.subheader("📌 Daily Availability Summary")
 
-    # --- Preprocess ---
-    df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-    df['occurrence'] = pd.to_numeric(df['occurrence'], errors='coerce')
-    df['outage_2g (Hour)'] = pd.to_numeric(df['outage_2g (Hour)'], errors='coerce')
-    df['outage_4g (Hour)'] = pd.to_numeric(df['outage_4g (Hour)'], errors='coerce')
-    df['availability (%)'] = pd.to_numeric(df['availability (%)'], errors='coerce')
-    df = df.dropna(subset=['Date'])
-    df['Date_Display'] = df['Date'].dt.strftime('%d-%B-%Y')
+    # Shared, already-preprocessed frame: read only, never assign into it
+    df = shared.df
+    index = site_index(shared)
 
     # --- Filters ---
     min_date, max_date = df['Date'].min(), df['Date'].max()
@@ -28,46 +88,40 @@ def app_tab1(df):
         date_range = st.date_input("Date Range", [min_date, max_date], min_value=min_date, max_value=max_date, key="tab1_date_range")
 
     with col2:
-        area_options = sorted(df['area'].dropna().unique())
+        area_options = index.areas()
         selected_area = st.selectbox("Area", area_options, key="tab1_area")
 
     with col3:
-        reg_df = df[df['area'] == selected_area]
-        reg_options = sorted(reg_df['regional'].dropna().unique())
+        reg_options = index.regionals(selected_area)
         selected_regional = st.selectbox("Regional", reg_options, key="tab1_regional")
 
     with col4:
-        site_df = reg_df[reg_df['regional'] == selected_regional]
-        site_options = sorted(site_df['site_id'].dropna().unique())
+        site_options = list(index.sites(selected_area, selected_regional))
 
         if site_options:
             # Get previous selection if valid, otherwise pick random
             previous_selection = st.session_state.get("tab1_siteid")
             if previous_selection in site_options:
-                default_index = site_options.index(previous_selection)
+                default_site = previous_selection
             else:
-                default_index = random.randint(0, len(site_options)-1)
+                default_site = random.choice(site_options)
 
-            selected_siteid = st.selectbox(
-                "Site ID",
-                site_options,
-                index=default_index,
-                key="tab1_siteid"
+            # Only the matches for the typed ID / name are sent to the browser
+            selected_siteid = site_search_select(
+                "Site ID", site_search(shared), "tab1_siteid",
+                allowed=site_options, default=default_site
             )
+            if selected_siteid is None:
+                return
         else:
             selected_siteid = None
 
     if len(date_range) == 2:
-        mask = (
-            (df['Date'] >= pd.to_datetime(date_range[0])) &
-            (df['Date'] <= pd.to_datetime(date_range[1])) &
-            (df['area'] == selected_area) &
-            (df['regional'] == selected_regional) &
-            (df['site_id'] == selected_siteid)
+        filtered_df, site_class, csv_filtered = filter_daily_site(
+            shared.version, df, index, date_range[0], date_range[1],
+            selected_area, selected_regional, selected_siteid
         )
 
-        filtered_df = df[mask].sort_values('Date')
-
         if filtered_df.empty:
             st.warning("No data found for the selected filters.")
             return
@@ -76,9 +130,6 @@ def app_tab1(df):
         return
 
     # --- Dynamic Title ---
-    site_info = df[df['site_id'] == selected_siteid].iloc[0]
-    site_class = site_info.get('site_class', 'Unknown')
-
     st.markdown(f"""
         <div style="font-size:24px; font-weight:bold; margin-bottom:5px;">
             📊 Daily Availability
@@ -90,17 +141,30 @@ def app_tab1(df):
         </div>
     """, unsafe_allow_html=True)
 
+    # --- Rolling 7/30-day metrics (precomputed with the daily data) ---
+    if 'availability_7d' in filtered_df.columns:
+        latest = filtered_df.iloc[-1]
+        m1, m2, m3, m4 = st.columns(4)
+        m1.metric("Availability 7D", f"{latest['availability_7d']:.2f}%")
+        m2.metric("Availability 30D", f"{latest['availability_30d']:.2f}%")
+        m3.metric("Outage 4G 7D", f"{latest['outage_4g_7d']:.2f} hrs")
+        m4.metric("Outage 4G 30D", f"{latest['outage_4g_30d']:.2f} hrs")
+        st.caption(f"Rolling windows ending {latest['Date'].strftime('%d-%B-%Y')}")
+
     # --- Plot Chart ---
+    # Long date ranges are reduced to screen resolution before they reach the browser
+    plot_df = downsample_frame(filtered_df, 'Date', ['occurrence', 'outage_2g (Hour)', 'outage_4g (Hour)', 'availability (%)'])
+
     fig = go.Figure()
 
     # Bar: Occurrence
     fig.add_trace(go.Bar(
-        x=filtered_df['Date'],
-        y=filtered_df['occurrence'],
+        x=plot_df['Date'],
+        y=plot_df['occurrence'],
         name='Occurrence',
         marker_color="#F7C989",
         yaxis='y1',
-        text=filtered_df['occurrence'],
+        text=plot_df['occurrence'],
         textposition='auto',
         #insidetextanchor='start',
         textfont=dict(size=16, color='black'),
@@ -108,9 +172,9 @@ def app_tab1(df):
     ))
 
     # Line: Outage 2G
-    fig.add_trace(go.Scatter(
-        x=filtered_df['Date'],
-        y=filtered_df['outage_2g (Hour)'],
+    fig.add_trace(scatter(
+        x=plot_df['Date'],
+        y=plot_df['outage_2g (Hour)'],
         mode='lines+markers',
         name='Outage 2G (Hr)',
         yaxis='y1',
@@ -119,9 +183,9 @@ def app_tab1(df):
     ))
 
     # Line: Outage 4G
-    fig.add_trace(go.Scatter(
-        x=filtered_df['Date'],
-        y=filtered_df['outage_4g (Hour)'],
+    fig.add_trace(scatter(
+        x=plot_df['Date'],
+        y=plot_df['outage_4g (Hour)'],
         mode='lines+markers',
         name='Outage 4G (Hr)',
         yaxis='y1',
@@ -129,24 +193,32 @@ def app_tab1(df):
         hovertemplate='Outage 4G : %{y:.2f} jam<extra></extra>'
     ))
 
-    # Add formatted labels
-    filtered_df['availability_label'] = filtered_df['availability (%)'].round(2).astype(str) + '%'
-    filtered_df['outage_4g_label'] = filtered_df['outage_4g (Hour)'].round(2).astype(str) + ' hrs'
-
     # Line: Availability %
-    fig.add_trace(go.Scatter(
-        x=filtered_df['Date'],
-        y=filtered_df['availability (%)'],
+    fig.add_trace(scatter(
+        x=plot_df['Date'],
+        y=plot_df['availability (%)'],
         mode='lines+markers+text',
         name='Availability (%)',
         yaxis='y2',
         line=dict(color='#2ca02c', width=4),
-        text=filtered_df['availability (%)'].round(2).astype(str) + '%',
+        text=plot_df['availability (%)'].round(2).astype(str) + '%',
         textposition='top center',
         textfont=dict(size=16, color='#2ca02c'),
         hovertemplate='Availability : %{y:.2f}%<extra></extra>'
     ))
 
+    # Line: rolling 7-day availability
+    if 'availability_7d' in plot_df.columns:
+        fig.add_trace(scatter(
+            x=plot_df['Date'],
+            y=plot_df['availability_7d'],
+            mode='lines',
+            name='Availability 7D (%)',
+            yaxis='y2',
+            line=dict(color='#2ca02c', width=2, dash='dot'),
+            hovertemplate='Availability 7D : %{y:.2f}%<extra></extra>'
+        ))
+
     fig.update_layout(
         #dashboard_title = f"📊 Daily Performance — Site: {selected_siteid} (Regional: {selected_regional}, Class: {site_class})",
         xaxis=dict(
@@ -189,15 +261,13 @@ def app_tab1(df):
         height=500
     )
 
-    st.plotly_chart(fig, use_container_width=True)
+    show_chart(fig, "daily_availability", rows=len(plot_df), source_rows=len(filtered_df))
 
     with st.expander("🧾 Filtered Data Details"):
-        df_to_display = filtered_df.copy()
-        df_to_display['Date'] = df_to_display['Date'].dt.strftime('%d-%B-%Y')
+        df_to_display = filtered_df.assign(Date=filtered_df['Date'].dt.strftime('%d-%B-%Y'))
         st.dataframe(df_to_display, use_container_width=True)
 
     # --- Download filtered data ---
-    csv_filtered = filtered_df.to_csv(index=False).encode('utf-8')
     st.download_button(
         label="📥 Download Filtered CSV",
         data=csv_filtered,
@@ -207,7 +277,7 @@ def app_tab1(df):
     )
 
     # --- Download raw (unfiltered) data ---
-    csv_raw = df.to_csv(index=False).encode('utf-8')
+    csv_raw = shared_csv_bytes(shared.name, shared.version, df)
     st.download_button(
         label="📄 Download Raw CSV",
         data=csv_raw,
@@ -216,16 +286,15 @@ def app_tab1(df):
         key="download_raw"
     )
 
-def app_tab2(df):
+def app_tab2(shared):
     import plotly.graph_objects as go
     st.subheader("📊 Availability Achievement Trend")
 
-    # --- Prepare Date column ---
-    df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-    df['Date'] = df['Date'].dt.date
+    df = shared.df
+    index = site_index(shared)
 
-    min_date = df['Date'].min()
-    max_date = df['Date'].max()
+    min_date = df['Date'].min().date()
+    max_date = df['Date'].max().date()
 
     # --- Filter UI ---
     with st.expander("🔍 Filter Data"):
@@ -239,53 +308,41 @@ def app_tab2(df):
             key="filter_date_range"
         )
 
-        area_options = ['All'] + sorted(df['area'].dropna().unique())
+        area_options = ['All'] + list(index.areas())
         selected_area = col2.selectbox("Area", area_options, key="tab2_area")
 
         # --- Cascading Regional Options ---
-        if selected_area == 'All':
-            regional_filtered_df = df
-        else:
-            regional_filtered_df = df[df['area'] == selected_area]
-
-        regional_options = ['All'] + sorted(regional_filtered_df['regional'].dropna().unique())
+        regional_options = ['All'] + list(index.regionals(selected_area))
         selected_regional = col3.selectbox("Regional", regional_options, key="tab2_regional")
 
         # --- Cascading Site Options ---
-        if selected_regional == 'All':
-            site_filtered_df = regional_filtered_df
-        else:
-            site_filtered_df = regional_filtered_df[regional_filtered_df['regional'] == selected_regional]
-
+        site_filtered_df = df.iloc[index.rows(selected_area, selected_regional)]
         site_options = ['All'] + sorted(site_filtered_df['networksite'].dropna().unique())
         selected_site = col4.selectbox("Network Site", site_options, key="tab2_site")
 
-    # --- Apply Filters ---
-    filtered_df = df.copy()
-
+    if len(date_range) != 2:
+        st.info("Please select both a start and end date to continue.")
+        return
     start_date, end_date = date_range
-    filtered_df = filtered_df[(filtered_df['Date'] >= start_date) & (filtered_df['Date'] <= end_date)]
-
-    if selected_area != 'All':
-        filtered_df = filtered_df[filtered_df['area'] == selected_area]
-    if selected_regional != 'All':
-        filtered_df = filtered_df[filtered_df['regional'] == selected_regional]
-    if selected_site != 'All':
-        filtered_df = filtered_df[filtered_df['networksite'] == selected_site]
 
     # --- Group Data ---
-    grouped = (
-        filtered_df.groupby(['Date', 'Achievement'])
-        .size()
-        .reset_index(name='Count')
-    )
-
-    pivoted = grouped.pivot(index='Date', columns='Achievement', values='Count').fillna(0)
-    if 'Achieved' not in pivoted.columns:
-        pivoted['Achieved'] = 0
-    if 'Not Achieved' not in pivoted.columns:
-        pivoted['Not Achieved'] = 0
-    pivoted = pivoted[['Achieved', 'Not Achieved']].sort_index()
+    if selected_site == 'All':
+        # Read the pre-aggregated day x area x regional x site class cube
+        cube = get_daily_cube(shared.name, shared.version, df)
+        pivoted = daily_achievement_trend(cube, start_date, end_date, selected_area, selected_regional)
+    else:
+        # Single network site: below the cube's grain, count its few rows directly
+        filtered_df = site_filtered_df[
+            (site_filtered_df['networksite'] == selected_site) &
+            (site_filtered_df['Date'] >= pd.Timestamp(start_date)) &
+            (site_filtered_df['Date'] <= pd.Timestamp(end_date))
+        ]
+        pivoted = (
+            filtered_df.groupby(['Date', 'Achievement']).size()
+            .unstack(fill_value=0)
+            .reindex(columns=['Achieved', 'Not Achieved'], fill_value=0)
+            .sort_index()
+        )
 
     # --- Plot ---
     fig = go.Figure()
@@ -344,37 +401,12 @@ def app_tab2(df):
 
     st.plotly_chart(fig, use_container_width=True)
 
-def app_tab3(df):
+def app_tab3(shared):
     st.subheader("📅 Weekly Availability Summary")
 
-    # --- Extract and clean Week info ---
-    df['Week'] = df['Week'].astype(str)
-
-    # Extract numeric week number (e.g., from '2025-W14' -> 14)
-    df['Week_Num'] = df['Week'].str.extract(r'W(\d+)')[0]
-    df['Week_Num'] = pd.to_numeric(df['Week_Num'], errors='coerce')
-
-    # Drop rows missing either
-    df = df.dropna(subset=['Week', 'Week_Num'])
-
-    # Get unique sorted week labels
-    week_df = df[['Week', 'Week_Num']].drop_duplicates().sort_values('Week_Num')
-    unique_weeks = week_df['Week'].tolist()
-
-    # Error handling
-    if not unique_weeks:
-        st.warning("No valid week data available. Check the 'Week' column format.")
-        return
-
-    # Convert relevant columns to numeric
-    df['occurrence'] = pd.to_numeric(df['occurrence'], errors='coerce')
-    df['outage_2g (Hour)'] = pd.to_numeric(df['outage_2g (Hour)'], errors='coerce')
-    df['outage_4g (Hour)'] = pd.to_numeric(df['outage_4g (Hour)'], errors='coerce')
-    df['availability (%)'] = pd.to_numeric(df['availability (%)'], errors='coerce')
-    df['Year'] = df['period'].astype(str).str[:4].astype(int)
-
-    # Drop rows where Week or Week_Num is missing
-    df = df.dropna(subset=['Week', 'Week_Num'])
+    # Week_Num / Year and numeric columns are derived once in utils.shared_data
+    df = shared.df
+    index = site_index(shared)
 
     # --- Week Range Filter Logic ---
     # Get unique week labels, sorted by their numeric week number
@@ -407,52 +439,45 @@ def app_tab3(df):
         selected_year = st.slider("Year", min_value=year_min, max_value=year_max, value=year_max, step=1)
 
     with col3:
-        area_options = sorted(df['area'].dropna().unique())
+        area_options = index.areas()
         selected_area = st.selectbox("Area", area_options, key="tab3_area")
 
     with col4:
-        reg_df = df[df['area'] == selected_area]
-        reg_options = sorted(reg_df['regional'].dropna().unique())
+        reg_options = index.regionals(selected_area)
         selected_regional = st.selectbox("Regional", reg_options, key="tab3_regional")
 
     with col5:
-        site_df = reg_df[reg_df['regional'] == selected_regional]
-        site_options = sorted(site_df['site_id'].dropna().unique())
+        site_options = list(index.sites(selected_area, selected_regional))
 
         if site_options:
             # Get previous selection if valid, otherwise pick random
             previous_selection = st.session_state.get("tab3_siteid")
             if previous_selection in site_options:
-                default_index = site_options.index(previous_selection)
+                default_site = previous_selection
             else:
-                default_index = random.randint(0, len(site_options)-1)
+                default_site = random.choice(site_options)
 
-            selected_siteid = st.selectbox(
-                "Site ID",
-                site_options,
-                index=default_index,
-                key="tab3_siteid"
+            # Only the matches for the typed ID / name are sent to the browser
+            selected_siteid = site_search_select(
+                "Site ID", site_search(shared), "tab3_siteid",
+                allowed=site_options, default=default_site
             )
+            if selected_siteid is None:
+                return
         else:
             selected_siteid = None
 
     # --- Filter Data ---
-    mask = (
-        (df['Week'].isin(selected_weeks)) &
-        (df['Year'] == selected_year) &
-        (df['area'] == selected_area) &
-        (df['regional'] == selected_regional) &
-        (df['site_id'] == selected_siteid)
+    filtered_df, site_class, csv_filtered = filter_weekly_site(
+        shared.version, df, index, tuple(selected_weeks), selected_year,
+        selected_area, selected_regional, selected_siteid
     )
-    filtered_df = df[mask].sort_values('Week_Num')
 
     if filtered_df.empty:
         st.warning("No data found for the selected filters.")
         return
 
     # --- Dynamic Title ---
-    site_info = df[df['site_id'] == selected_siteid].iloc[0]
-    site_class = site_info.get('site_class', 'Unknown')
 
     st.markdown(f"""
         <div style="font-size:24px; font-weight:bold; margin-bottom:5px;">
@@ -466,45 +491,47 @@ def app_tab3(df):
     """, unsafe_allow_html=True)
 
     # --- Chart ---
+    plot_df = downsample_frame(filtered_df, 'Week_Num', ['occurrence', 'outage_2g (Hour)', 'outage_4g (Hour)', 'availability (%)'])
+
     fig = go.Figure()
 
     fig.add_trace(go.Bar(
-        x=filtered_df['Week'],
-        y=filtered_df['occurrence'],
+        x=plot_df['Week'],
+        y=plot_df['occurrence'],
         name='Occurrence',
         marker_color="#F7C989",
-        text=filtered_df['occurrence'],
+        text=plot_df['occurrence'],
         textposition='auto',
         textfont=dict(size=16, color='black'),
         hovertemplate='Kejadian : %{y}<extra></extra>'
     ))
 
-    fig.add_trace(go.Scatter(
-        x=filtered_df['Week'],
-        y=filtered_df['outage_2g (Hour)'],
+    fig.add_trace(scatter(
+        x=plot_df['Week'],
+        y=plot_df['outage_2g (Hour)'],
         mode='lines+markers',
         name='Outage 2G (Hr)',
         line=dict(color='#1f77b4', width=4),
         hovertemplate='Outage 2G : %{y:.2f} jam<extra></extra>'
     ))
 
-    fig.add_trace(go.Scatter(
-        x=filtered_df['Week'],
-        y=filtered_df['outage_4g (Hour)'],
+    fig.add_trace(scatter(
+        x=plot_df['Week'],
+        y=plot_df['outage_4g (Hour)'],
         mode='lines+markers',
         name='Outage 4G (Hr)',
         line=dict(color='#d62728', width=4),
         hovertemplate='Outage 4G : %{y:.2f} jam<extra></extra>'
     ))
 
-    fig.add_trace(go.Scatter(
-        x=filtered_df['Week'],
-        y=filtered_df['availability (%)'],
+    fig.add_trace(scatter(
+        x=plot_df['Week'],
+        y=plot_df['availability (%)'],
         mode='lines+markers+text',
         name='Availability (%)',
         yaxis='y2',
         line=dict(color='#2ca02c', width=4),
-        text=filtered_df['availability (%)'].round(2).astype(str) + '%',
+        text=plot_df['availability (%)'].round(2).astype(str) + '%',
         textposition='top center',
         textfont=dict(size=16, color='#2ca02c'),
         hovertemplate='Availability : %{y:.2f}%<extra></extra>'
@@ -541,7 +568,7 @@ def app_tab3(df):
         height=500
     )
 
-    st.plotly_chart(fig, use_container_width=True)
+    show_chart(fig, "weekly_availability", rows=len(plot_df), source_rows=len(filtered_df))
 
     # --- Details ---
     with st.expander("🧾 Filtered Weekly Data"):
@@ -550,18 +577,152 @@ def app_tab3(df):
     # --- Download Buttons ---
     st.download_button(
         label="📥 Download Filtered CSV",
-        data=filtered_df.to_csv(index=False).encode("utf-8"),
+        data=csv_filtered,
         file_name="weekly_filtered_data.csv",
         mime="text/csv"
     )
 
     st.download_button(
         label="📄 Download Raw Weekly CSV",
-        data=df.to_csv(index=False).encode("utf-8"),
+        data=shared_csv_bytes(shared.name, shared.version, df),
         file_name="weekly_raw_data.csv",
         mime="text/csv"
     )
 
+def app_tab4(shared):
+    st.subheader("🏆 Site Ranking")
+
+    df = shared.df
+    index = site_index(shared)
+
+    min_date, max_date = df['Date'].min().date(), df['Date'].max().date()
+
+    # --- Filters ---
+    col1, col2, col3, col4, col5, col6 = st.columns([3, 2, 2, 2, 2, 1])
+    date_range = col1.date_input("Date Range", [min_date, max_date], min_value=min_date, max_value=max_date, key="tab4_date_range")
+    selected_area = col2.selectbox("Area", ['All'] + list(index.areas()), key="tab4_area")
+    selected_regional = col3.selectbox("Regional", ['All'] + list(index.regionals(selected_area)), key="tab4_regional")
+    metric = col4.selectbox("Rank By", list(RANKING_METRICS.keys()), key="tab4_metric")
+    order = col5.radio("Show", ["Worst", "Best"], horizontal=True, key="tab4_order")
+    top_n = col6.number_input("N", min_value=5, max_value=200, value=20, step=5, key="tab4_n")
+
+    if len(date_range) != 2:
+        st.info("Please select both a start and end date to continue.")
+        return
+
+    # One grouped pass over every site in the window (memoized per selection)
+    totals = ranking_totals(shared.version, df, index, date_range[0], date_range[1], selected_area, selected_regional)
+    if totals.empty:
+        st.warning("No data found for the selected filters.")
+        return
+
+    ranked = rank_sites(totals, metric, n=int(top_n), worst=(order == "Worst"))
+    st.caption(f"{len(totals):,} sites ranked")
+
+    st.dataframe(
+        ranked.rename(columns={
+            "site_id": "Site ID",
+            "availability_avg": "Availability (%)",
+            "outage_2g_total": "Outage 2G (Hr)",
+            "outage_4g_total": "Outage 4G (Hr)",
+            "occurrence_total": "Occurrence",
+            "days_below_target": "Days Below Target",
+            "days": "Days",
+        }).round(2),
+        use_container_width=True,
+        hide_index=True
+    )
+
+    # --- Drill-down: daily detail of one ranked site ---
+    drill_site = st.selectbox("🔎 Drill down to site", ranked['site_id'].tolist(), key="tab4_drill_site")
+    if drill_site is None:
+        return
+
+    site_df = df.iloc[index.rows(site=drill_site)]
+    site_df = site_df[
+        (site_df['Date'] >= pd.Timestamp(date_range[0])) & (site_df['Date'] <= pd.Timestamp(date_range[1]))
+    ].sort_values('Date')
+
+    plot_df = downsample_frame(site_df, 'Date', ['outage_4g (Hour)', 'availability (%)'])
+
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        x=plot_df['Date'],
+        y=plot_df['outage_4g (Hour)'],
+        name='Outage 4G (Hr)',
+        marker_color="#F7C989",
+        hovertemplate='Outage 4G : %{y:.2f} jam<extra></extra>'
+    ))
+    fig.add_trace(scatter(
+        x=plot_df['Date'],
+        y=plot_df['availability (%)'],
+        mode='lines+markers',
+        name='Availability (%)',
+        yaxis='y2',
+        line=dict(color='#2ca02c', width=3),
+        hovertemplate='Availability : %{y:.2f}%<extra></extra>'
+    ))
+    fig.update_layout(
+        title=f"Site {drill_site}",
+        yaxis=dict(title="Outage Hours", showgrid=False),
+        yaxis2=dict(title="Availability (%)", overlaying='y', side='right', gridcolor='lightgrey'),
+        hovermode='x unified',
+        legend=dict(orientation="h"),
+        margin=dict(l=40, r=40, t=60, b=40),
+        height=400
+    )
+    show_chart(fig, "ranking_drilldown", rows=len(plot_df), source_rows=len(site_df))
+
+def app_tab5(shared):
+    st.subheader("🚨 Outage Anomalies")
+    st.caption("Site-days whose occurrence or outage hours are far above that site's own baseline (robust z-score).")
+
+    df = shared.df
+    index = site_index(shared)
+
+    # Scored once per data version for the whole fleet
+    anomalies = get_anomalies(shared.name, shared.version, df)
+    if anomalies.empty:
+        st.success("No anomalies found.")
+        return
+
+    min_date, max_date = anomalies['Date'].min().date(), anomalies['Date'].max().date()
+    col1, col2, col3, col4 = st.columns(4)
+    date_range = col1.date_input("Date Range", [min_date, max_date], min_value=min_date, max_value=max_date, key="tab5_date_range")
+    selected_area = col2.selectbox("Area", ['All'] + list(index.areas()), key="tab5_area")
+    selected_regional = col3.selectbox("Regional", ['All'] + list(index.regionals(selected_area)), key="tab5_regional")
+    selected_metrics = col4.multiselect(
+        "Metric", anomalies['metric'].unique().tolist(), default=anomalies['metric'].unique().tolist(), key="tab5_metric"
+    )
+
+    if len(date_range) != 2:
+        st.info("Please select both a start and end date to continue.")
+        return
+
+    view = anomalies[
+        (anomalies['Date'] >= pd.Timestamp(date_range[0])) &
+        (anomalies['Date'] <= pd.Timestamp(date_range[1])) &
+        (anomalies['metric'].isin(selected_metrics))
+    ]
+    if selected_area != 'All':
+        view = view[view['area'] == selected_area]
+    if selected_regional != 'All':
+        view = view[view['regional'] == selected_regional]
+
+    st.markdown(f"**{len(view):,}** flagged site-days across **{view['site_id'].nunique():,}** sites")
+    st.dataframe(
+        view.assign(Date=view['Date'].dt.strftime('%d-%B-%Y')),
+        use_container_width=True,
+        hide_index=True
+    )
+    st.download_button(
+        label="📥 Download Anomalies CSV",
+        data=view.to_csv(index=False).encode('utf-8'),
+        file_name="availability_anomalies.csv",
+        mime="text/csv",
+        key="download_anomalies"
+    )
+
 def app():
     col1, col2 = st.columns([9, 1])
     with col1:
@@ -569,31 +730,42 @@ def app():
     with col2:
         if st.button("🔄 Refresh Data", help="Reload availability data"):
             st.cache_data.clear()
+            clear_shared_data()
             st.rerun()
 
-    # Load daily and weekly data
-    df_daily = load_all_daily_files()
-    df_weekly = load_all_weekly_files()  # <-- Add this line
+    # Load daily and weekly data (shared across sessions, prepared once per version)
+    df_daily = get_shared_daily()
+    df_weekly = get_shared_weekly()
 
     if df_daily.empty and df_weekly.empty:
         st.warning("No availability data found.")
         return
 
-    # Define tabs
-    tab1, tab2, tab3 = st.tabs([
-        "📌 Daily Availability",
-        "📈 Daily Achievement",
-        "📅 Weekly Availability"         # <-- New Tab 3
-    ])
-
-    # Render each tab
-    with tab1:
-        app_tab1(df_daily)
-    with tab2:
-        app_tab2(df_daily)
-    with tab3:
-        if df_weekly.empty:
-            st.warning("No weekly data available.")
-        else:
-            app_tab3(df_weekly)   # <-- You will define this
+    # --- Ingest validation: reported vs recomputed availability per daily file ---
+    if not df_daily.empty:
+        validation = get_validation_summary(df_daily.name, df_daily.version, df_daily.df)
+        mismatches = int(validation['mismatches'].sum()) if not validation.empty else 0
+        if mismatches:
+            with st.expander(f"⚠️ {mismatches:,} daily rows where reported availability differs from outage hours by more than {AVAILABILITY_TOLERANCE} pp"):
+                st.dataframe(validation, use_container_width=True, hide_index=True)
+                mismatch_rows = df_daily.df[df_daily.df['availability_mismatch']]
+                st.download_button(
+                    label="📥 Download Mismatched Rows",
+                    data=mismatch_rows.to_csv(index=False).encode('utf-8'),
+                    file_name="availability_mismatches.csv",
+                    mime="text/csv",
+                    key="download_mismatches"
+                )
+
+    def requires(frame, render, message):
+        return (lambda: st.warning(message)) if frame.empty else (lambda: render(frame))
+
+    # Define tabs; only the selected one runs on a rerun
+    lazy_tabs({
+        "📌 Daily Availability": lambda: app_tab1(df_daily),
+        "📈 Daily Achievement": lambda: app_tab2(df_daily),
+        "📅 Weekly Availability": requires(df_weekly, app_tab3, "No weekly data available."),
+        "🏆 Site Ranking": requires(df_daily, app_tab4, "No daily data available."),
+        "🚨 Anomalies": requires(df_daily, app_tab5, "No daily data available."),
+    }, key="availability_tab")
 
@@ -1,14 +1,28 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import folium
 from streamlit_folium import folium_static
-from utils.data_loader import get_drive, load_kml_file
 import folium
 from streamlit_folium import st_folium 
 import plotly.graph_objects as go
 import plotly.express as px
 from io import BytesIO
 from branca.element import Element
+from utils.shared_data import (
+    FILTER_CACHE_ENTRIES, get_shared_sites, refresh_shared_sites, session_sites, editable_session_sites,
+    clear_shared_data
+)
+from utils.filter_index import get_hierarchy_index
+from utils.lazy_tabs import lazy_tabs
+from utils.site_map import (
+    STATUS_FILTERS, site_map_html, site_layer, marker_rows, status_mask, view_bounds, viewport_positions,
+    regional_layer, hex_layer
+)
+from utils.site_levels import HEX_SIZE_DEG, get_site_levels, level_for_zoom
+from utils.site_search import get_site_search_index, site_search_select
+from utils.spatial_index import get_spatial_index
+import streamlit.components.v1 as components
 
 # Utility: define color per Regional
 def get_color(regional):
@@ -40,6 +54,38 @@ REGIONAL_COLORS = {
 def get_card_color(regional):
     return REGIONAL_COLORS.get(regional, "#dfe6e9")  # default light gray if not found
 
+SITE_TABLE_COLUMNS = ["Area", "Regional", "NS", "Site ID", "Site Name", "Site Class", "Target", "Status"]
+MAP_MODES = ["All sites", "Sites in view"]
+
+@st.cache_resource(max_entries=FILTER_CACHE_ENTRIES)
+def filter_site_table(version, _df, _index, selected_area, selected_regional, selected_ns, selected_status):
+    """Filtered site list, its table rows HTML and Excel export for one filter selection."""
+    filtered_df = _df.iloc[_index.rows(selected_area, selected_regional, selected_ns)]
+
+    if selected_status == "On Service":
+        filtered_df = filtered_df[
+            filtered_df["Status"].str.lower().str.contains("on", na=False)
+        ]
+    elif selected_status == "Cut Off":
+        filtered_df = filtered_df[
+            filtered_df["Status"].str.lower().str.contains("cut", na=False)
+        ]
+
+    center_align_cols = {"Site Class", "Target", "Status"}
+    rows_html = ""
+    for _, row in filtered_df.iterrows():
+        rows_html += "<tr>"
+        for col in SITE_TABLE_COLUMNS:
+            align = "center" if col in center_align_cols else "left"
+            rows_html += f'<td style="text-align: {align};">{row[col]}</td>'
+        rows_html += "</tr>"
+
+    to_excel = BytesIO()
+    with pd.ExcelWriter(to_excel, engine="openpyxl") as writer:
+        filtered_df.to_excel(writer, index=False, sheet_name="CDC Sites")
+
+    return filtered_df, rows_html, to_excel.getvalue()
+
 def app_tab1():
     col1, col2 = st.columns([9, 1])  # Title wide, button narrow
 
@@ -49,14 +95,12 @@ def app_tab1():
     with col2:
         refresh = st.button("🔄 Refresh from Drive", help="Reload the latest KML file")
     
-    #--- Load data only once per session ---
-    if refresh or "cdc_sites_gdf" not in st.session_state:
+    #--- Sites are loaded once per process and shared by every session ---
+    if refresh:
         with st.spinner("Loading site data..."):
-            drive = get_drive()
-            gdf = load_kml_file(drive)
-        st.session_state["cdc_sites_gdf"] = gdf
+            refresh_shared_sites()
 
-    gdf = st.session_state["cdc_sites_gdf"]
+    gdf = session_sites()
 
     if gdf.empty:
         st.warning("No data to display. Please check your KML file.")
@@ -128,44 +172,17 @@ def app_tab1():
 
     # Ensure lat/lon columns
     if "Latitude" not in gdf.columns or "Longitude" not in gdf.columns:
+        gdf = editable_session_sites()  # copy-on-write: never touch the shared frame
         gdf["Latitude"] = gdf.geometry.y
         gdf["Longitude"] = gdf.geometry.x
 
-    # --- Folium map setup ---
-    m = folium.Map(location=[-2, 118], zoom_start=5)
-
-    for _, row in gdf.iterrows():
-        popup_html = f"""
-        <div style="font-size: 14px; font-family: Arial, sans-serif;">
-            <b>Site ID:</b> {row.get('Site Id', row.get('Name', ''))}<br>
-            <b>Site Name:</b> {row.get('Site Name', '')}<br>
-            <b>Longitude:</b> {row.get('Longitude', '')}<br>
-            <b>Latitude:</b> {row.get('Latitude', '')}<br>
-            <b>Area:</b> {row.get('Area', '')}<br>
-            <b>Regional:</b> {row.get('Regional', '')}<br>
-            <b>NS:</b> {row.get('NS', '')}<br>
-            <b>Site Class:</b> {row.get('Site Class', '')}<br>
-            <b>Target AVA:</b> {row.get('Target', '')}<br>
-            <b>Status:</b> {row.get('Status', '')}
-        </div>
-        """
-        if pd.notna(row["Latitude"]) and pd.notna(row["Longitude"]):
-
-            status = str(row.get("Status", "")).lower()
-
-            # If site is Cut Off → force grey
-            if "cut" in status:
-                marker_color = "lightgray"
-            else:
-                # Otherwise use regional color mapping
-                marker_color = get_color(row.get("Regional"))
-
-            folium.Marker(
-                location=[row["Latitude"], row["Longitude"]],
-                tooltip=row.get("Site Name", ""),
-                popup=folium.Popup(popup_html, max_width=300),
-                icon=folium.Icon(color=marker_color)
-            ).add_to(m)
+    # --- Map: one client-side cluster layer, HTML cached per data version and status filter ---
+    col_status, col_mode = st.columns([3, 2])
+    with col_status:
+        map_status = st.radio("Show sites", STATUS_FILTERS, horizontal=True, key="map_status")
+    with col_mode:
+        map_mode = st.radio("Map", MAP_MODES, horizontal=True, key="map_mode",
+                            help="'Sites in view' sends only the sites inside the visible area")
 
     st.markdown("""
         <style>
@@ -183,6 +200,69 @@ def app_tab1():
         .to_dict()
     )
     
+    # Zoomed out, regional bubbles and class hex bins stand in for the individual sites
+    shared = get_shared_sites()
+    levels = get_site_levels(shared.name, shared.version, gdf)
+    regional_colors = {reg: get_color(reg) for reg in unique_regionals}
+
+    colors = marker_colors(gdf)
+    if map_mode == "Sites in view":
+        render_viewport_map(gdf, map_status, colors, on_summary, levels[map_status], regional_colors)
+        return
+
+    html = site_map_html(
+        st.session_state["cdc_sites_version"], map_status, gdf, colors,
+        lambda m: add_on_service_legend(m, on_summary), levels, regional_colors
+    )
+    components.html(html, width=2015, height=800)
+
+def render_viewport_map(gdf, map_status, colors, on_summary, levels, regional_colors):
+    """Map fed from the spatial index with the sites (or aggregates, zoomed out) inside the last reported view."""
+    shared = get_shared_sites()
+    index = get_spatial_index(shared.name, shared.version, gdf)
+
+    # The component's last value (bounds and zoom of the current view) is in session state before it renders
+    view = st.session_state.get("site_view_map") or {}
+    bounds = view_bounds(view)
+    level = level_for_zoom(view.get("zoom"))
+
+    if level == "regional":
+        sites_in_view = regional_layer(levels["regional"], regional_colors, name="Sites in view")
+    elif level == "hex":
+        south, west, north, east = bounds
+        bins = levels["hex"]
+        bins = bins[
+            bins["lat"].between(south - HEX_SIZE_DEG, north + HEX_SIZE_DEG)
+            & bins["lon"].between(west - HEX_SIZE_DEG, east + HEX_SIZE_DEG)
+        ]
+        sites_in_view = hex_layer(bins, name="Sites in view")
+    else:
+        positions, total = viewport_positions(index, status_mask(gdf, map_status), bounds)
+        rows = marker_rows(gdf.iloc[positions], colors[positions])
+        sites_in_view = folium.FeatureGroup(name="Sites in view")
+        site_layer(rows).add_to(sites_in_view)
+
+    m = folium.Map(location=[-2, 118], zoom_start=5)
+    add_on_service_legend(m, on_summary)
+    st_folium(
+        m, key="site_view_map", width=2015, height=800,
+        feature_group_to_add=sites_in_view, returned_objects=["bounds", "zoom"]
+    )
+    if level != "sites":
+        st.caption("Zoom in to see individual sites.")
+    elif total > len(rows):
+        st.caption(f"Showing {len(rows):,} of {total:,} sites in view — zoom in to see all of them.")
+    else:
+        st.caption(f"{total:,} sites in view.")
+
+def marker_colors(gdf):
+    """Marker color per site: light gray when Cut Off, else the regional color."""
+    regional_colors = gdf["Regional"].map(get_color) if "Regional" in gdf.columns else pd.Series("gray", index=gdf.index)
+    cut_off = gdf["Status"].astype(str).str.lower().str.contains("cut", na=False)
+    return regional_colors.where(~cut_off, "lightgray").to_numpy()
+
+def add_on_service_legend(m, on_summary):
+    """"Site On Service" legend box (count per Regional) on the map."""
     from branca.element import MacroElement, Figure
     from jinja2 import Template
 
@@ -242,18 +322,11 @@ def app_tab1():
     macro._template = Template(template)
     m.get_root().add_child(macro)
 
-    folium_static(m, width=2015, height=800)
-
-    #folium_static(m, width=2015, height=800)
-    #from streamlit_folium import st_folium
-    #st.write("Total ON:", total_on)
-    #st_folium(m, width=2015, height=800)
-
 # --- TAB 2: Summary View ---
 def app_tab2():
     st.subheader("📊 CDC Sites Summary")
 
-    gdf = st.session_state.get("cdc_sites_gdf")
+    gdf = session_sites()
     if gdf is None or gdf.empty:
         st.warning("Data is not available. Please refresh from Tab 1.")
         return
@@ -270,7 +343,7 @@ def app_tab2():
     elif status_filter == "Cut Off":
         filtered_gdf = gdf[gdf["Status"].str.lower().str.contains("cut", na=False)]
     else:
-        filtered_gdf = gdf.copy()
+        filtered_gdf = gdf
 
 
     # Use 1:2 ratio layout (wider pie chart column now)
@@ -501,20 +574,22 @@ def app_tab2():
 def app_tab3():
     st.subheader("📋 CDC Site Data Table")
 
-    gdf = st.session_state.get("cdc_sites_gdf")
+    gdf = session_sites()
     if gdf is None or gdf.empty:
         st.warning("Data is not available. Please refresh from Tab 1.")
         return
 
     # Define target columns in order
-    display_columns = ["Area", "Regional", "NS", "Site ID", "Site Name", "Site Class", "Target", "Status"]
+    display_columns = SITE_TABLE_COLUMNS
 
     missing_cols = [col for col in display_columns if col not in gdf.columns]
     if missing_cols:
         st.error(f"Missing columns in data: {missing_cols}")
         return
 
-    df = gdf[display_columns].copy()
+    df = gdf[display_columns]
+    shared = get_shared_sites()
+    index = get_hierarchy_index(shared.name, shared.version, gdf, "Area", "Regional", "NS")
 
     # ---- FONT SIZE CONTROL ----
     font_size_map = {
@@ -531,40 +606,33 @@ def app_tab3():
 
     # ---- AREA FILTER ----
     with col1:
-        area_options = ["All"] + sorted(df["Area"].dropna().unique())
+        area_options = ["All"] + list(index.areas())
         selected_area = st.selectbox("Area", area_options)
 
-    filtered_df = df[df["Area"] == selected_area] if selected_area != "All" else df.copy()
-
     # ---- REGIONAL FILTER ----
     with col2:
-        regional_options = ["All"] + sorted(filtered_df["Regional"].dropna().unique())
+        regional_options = ["All"] + list(index.regionals(selected_area))
         selected_regional = st.selectbox("Regional", regional_options)
 
-    if selected_regional != "All":
-        filtered_df = filtered_df[filtered_df["Regional"] == selected_regional]
-
     # ---- NS FILTER ----
     with col3:
-        ns_options = ["All"] + sorted(filtered_df["NS"].dropna().unique())
+        ns_options = ["All"] + list(index.sites(selected_area, selected_regional))
         selected_ns = st.selectbox("NS", ns_options)
 
-    if selected_ns != "All":
-        filtered_df = filtered_df[filtered_df["NS"] == selected_ns]
-
     # ---- STATUS FILTER ----
     with col4:
         status_options = ["All", "On Service", "Cut Off"]
         selected_status = st.selectbox("Status", status_options)
 
-    if selected_status == "On Service":
-        filtered_df = filtered_df[
-            filtered_df["Status"].str.lower().str.contains("on", na=False)
-        ]
-    elif selected_status == "Cut Off":
-        filtered_df = filtered_df[
-            filtered_df["Status"].str.lower().str.contains("cut", na=False)
-        ]
+    # Memoized per data version + filter selection: font size changes skip all of this
+    filtered_df, rows_html, excel_bytes = filter_site_table(
+        shared.version, df, index,
+        selected_area, selected_regional, selected_ns, selected_status
+    )
+
+    # ---- NEARBY SITES ----
+    with st.expander("📍 Nearby Sites"):
+        render_nearby_sites(shared, gdf)
 
     # ---- STYLED TABLE ----
     col_title, col_font = st.columns([8, 2])
@@ -593,8 +661,6 @@ def app_tab3():
         st.info("No data matching the selected filters.")
         return
 
-    center_align_cols = {"Site Class", "Target", "Status"}
-
     # Scrollable div style
     html = f"""
     <style>
@@ -637,13 +703,7 @@ def app_tab3():
     for col in display_columns:
         html += f"<th>{col}</th>"
     html += "</tr></thead><tbody>"
-
-    for _, row in filtered_df.iterrows():
-        html += "<tr>"
-        for col in display_columns:
-            align = "center" if col in center_align_cols else "left"
-            html += f'<td style="text-align: {align};">{row[col]}</td>'
-        html += "</tr>"
+    html += rows_html
     html += "</tbody></table></div>"
 
     st.markdown(html, unsafe_allow_html=True)
@@ -651,18 +711,52 @@ def app_tab3():
     # ---- EXPORT BUTTON ----
     st.markdown("### 📥 Export Data Site List CDC")
 
-    to_excel = BytesIO()
-    with pd.ExcelWriter(to_excel, engine="openpyxl") as writer:
-        filtered_df.to_excel(writer, index=False, sheet_name="CDC Sites")
-    to_excel.seek(0)
-
     st.download_button(
         label="📤 Download Site List CDC",
-        data=to_excel,
+        data=excel_bytes,
         file_name="Filtered_CDC_Sites.xlsx",
         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
     )
 
+def render_nearby_sites(shared, gdf):
+    """Sites within a radius of (or nearest to) one site, from the spatial index."""
+    site_ids = gdf["Site ID"].astype(str).str.strip()
+    search_index = get_site_search_index(
+        shared.name, shared.version, sorted(site_ids.dropna().unique()), gdf, "Site ID", "Site Name"
+    )
+    col_site, col_mode, col_value = st.columns([4, 2, 2])
+    with col_site:
+        site_id = site_search_select("Site", search_index, key="nearby_site")
+    with col_mode:
+        mode = st.radio("Find", ["Within radius", "Nearest"], horizontal=True, key="nearby_mode")
+    with col_value:
+        if mode == "Within radius":
+            radius_km = st.number_input("Radius (km)", min_value=1.0, max_value=500.0, value=20.0, step=5.0, key="nearby_radius")
+        else:
+            k = st.number_input("Number of sites", min_value=1, max_value=100, value=10, key="nearby_k")
+    if site_id is None:
+        return
+
+    index = get_spatial_index(shared.name, shared.version, gdf)
+    matches = [p for p in np.flatnonzero(site_ids.to_numpy() == site_id) if np.isfinite(index.point(p)).all()]
+    if not matches:
+        st.info("This site has no coordinates.")
+        return
+    origin = matches[0]
+    lat, lon = index.point(origin)
+    if mode == "Within radius":
+        positions, distances = index.within(lat, lon, radius_km, exclude=origin)
+    else:
+        positions, distances = index.nearest(lat, lon, int(k), exclude=origin)
+
+    if len(positions) == 0:
+        st.info("No other sites found.")
+        return
+    nearby = gdf.iloc[positions][SITE_TABLE_COLUMNS].copy()
+    nearby.insert(0, "Distance (km)", np.round(distances, 2))
+    st.markdown(f"**{len(nearby)} site(s)** near {site_id}")
+    st.dataframe(nearby, use_container_width=True, hide_index=True)
+
 def app():
     st.title("CDC Overview Dashboard")
 
@@ -672,25 +766,16 @@ def app():
     with col2:
         if st.button("🔄 Refresh Data", help="Reload data"):
             st.cache_data.clear()
-            st.session_state.pop("cdc_sites_gdf", None)  # Clear only this key
+            clear_shared_data()
+            st.session_state.pop("cdc_sites_gdf", None)  # Drop this session's private copy, if any
             st.rerun()
 
-    # Load data only if not already in session state
-    if "cdc_sites_gdf" not in st.session_state:
-        with st.spinner("Loading CDC site data..."):
-            drive = get_drive()
-            gdf = load_kml_file(drive)
-            st.session_state["cdc_sites_gdf"] = gdf
-
-    tab1, tab2, tab3 = st.tabs(["📍 Site Map", "📊 CDC Site Summary", "📋 Site List CDC"])
-
-    with tab1:
-        app_tab1()
-
-    with tab2:
-        app_tab2()
-
-    with tab3:
+    # Shared process-wide site data; the session only tracks which version it sees
+    session_sites()
 
-        app_tab3()
+    lazy_tabs({
+        "📍 Site Map": app_tab1,
+        "📊 CDC Site Summary": app_tab2,
+        "📋 Site List CDC": app_tab3,
+    }, key="overview_tab")
 
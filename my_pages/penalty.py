@@ -2,150 +2,176 @@ import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
-from utils.data_loader import get_drive, load_penalty_data, load_availability_vs_penalty_data
+from utils.data_loader import get_drive, dataset, load_availability_vs_penalty_data
 from io import BytesIO
 import io
-from utils.helper import render_html_table_with_scroll, prepare_penalty_table
+import itertools
+from utils.helper import render_html_table_with_scroll, prepare_penalty_table, format_rupiah
+from utils.shared_data import FILTER_CACHE_ENTRIES, get_shared_availability_vs_penalty, get_shared_daily, clear_shared_data
+from utils.penalty_engine import (
+    BAND_TABLES, PENALTY_STEPS, class_table_key, scenario_grid, scenario_cache_key, scenario_totals,
+    get_month_end_projection, get_scenario_results, incremental_penalty_facts
+)
+from utils.site_search import get_site_search_index, site_search_select
+from utils.lazy_tabs import lazy_tabs
+from utils.statements import STATEMENT_WORKERS, build_statements_zip
+from utils.filter_index import get_hierarchy_index
+from utils.cubes import get_penalty_cube, penalty_trend
+from utils.chart_data import scatter, show_chart
+
+def penalty_index(shared):
+    """Area -> Regional TI -> Site Id index; Area comes from the KML site master."""
+    return get_hierarchy_index(shared.name, shared.version, shared.df, "Area", "Regional TI", "Site Id")
+
+def build_penalty_facts(df, penalty_ke):
+    """Penalty table rows of ``df`` with their precomputed Penalty Ke, sorted and formatted for display."""
+    facts = prepare_penalty_table(df, penalty_ke=penalty_ke)
+    facts.columns = facts.columns.astype(str)
+
+    # Sort by month (from the "April-2025" label), then Regional TI and Site Id
+    month = pd.to_datetime(facts["Month"], format="%B-%Y")
+    facts = facts.assign(_month=month).sort_values(by=["_month", "Regional TI", "Site Id"]).drop(columns="_month")
 
-def app_tab2():
-    st.subheader("📌 Still on Development Phase")
-    st.markdown("Please Stay tuned..")
-
-def app_tab1():
-    st.markdown("## Availability vs Penalty Data")
-    
-    df = load_availability_vs_penalty_data()
-    if df.empty:
-        st.warning("No data to display.")
-        return
+    # Format percentage columns safely
+    for col in ["Target Availability (%)", "Availability", "Gap Ava"]:
+        if col in facts.columns:
+            facts[col] = (
+                pd.to_numeric(facts[col], errors="coerce") * 100
+            ).fillna(0).map("{:.2f}%".format)
+    return facts
+
+@st.cache_resource(max_entries=2, show_spinner="Computing penalty table...")
+def penalty_facts(version, _df):
+    """Penalty table (band, streak, penalty %, rupiah) for the whole dataset, sorted and formatted for display.
+
+    Streaks run over each site's full history, so filters only pick rows
+    (by the shared frame's index) and never change a row's result.
+    """
+    # Closed months come from the stored table; only a newly added month is built
+    return incremental_penalty_facts(_df, build_penalty_facts)
+
+@st.cache_resource(max_entries=2, show_spinner="Generating penalty statements...")
+def statements_zip(version, _df):
+    """Zip of every regional's statement workbook, built once per data version."""
+    return build_statements_zip(_df, penalty_facts(version, _df))
+
+@st.cache_resource(max_entries=FILTER_CACHE_ENTRIES)
+def build_penalty_view(version, _df, _index, selected_area, selected_regional, selected_site):
+    """Filtered rows plus every aggregate the page renders, memoized per filter selection."""
+    if selected_area == selected_regional == selected_site == "All":
+        filtered_df = _df
+    else:
+        filtered_df = _df.iloc[_index.rows(selected_area, selected_regional, selected_site)]
 
-    # Define Area to Regional TI mapping
-    area_to_regional = {
-        "Area 1": ["Sumbagsel", "Sumbagteng"],
-        "Area 3": ["Balnus", "Jatim"],
-        "Area 4": ["Kalimantan", "Puma", "Sulawesi"]
-    }
+    if filtered_df.empty:
+        return None
 
-    # 1. Create filters in one row
-    col_area, col_regional, col_site = st.columns([3, 3, 3])
+    # Prepare data for plotting
+    # Sort by Year and Month order to make line chart smooth
+    filtered_df = filtered_df.sort_values(by=["Year", "Month_Num"])
 
-    # Area filter
-    area_options = ["All"] + list(area_to_regional.keys())
-    selected_area = col_area.selectbox("Select Area", area_options, index=0)
+    # Step 1-2: mean/sum lines and status counts per month come from the pre-aggregated cube
+    agg_df, status_counts = penalty_trend(
+        get_penalty_cube("availability_vs_penalty", version, _df),
+        selected_area, selected_regional, selected_site
+    )
 
-    # Filter Regional TI options based on Area selection
-    if selected_area == "All":
-        regional_options = ["All"] + sorted(df["Regional TI"].dropna().unique().tolist())
-    else:
-        regional_options = ["All"] + area_to_regional.get(selected_area, [])
+    agg_df["Availability_fmt"] = agg_df["Availability"].map(lambda x: f"{x*100:.2f}%")
+    agg_df["Target_Availability_fmt"] = agg_df["Target Availability (%)"].map(lambda x: f"{x*100:.2f}%")
+    agg_df["Persentase_Penalty_fmt"] = agg_df["Persentase Penalty"].map(lambda x: f"{x*100:.2f}%")
+    agg_df["Nilai_Penalty_fmt"] = agg_df["Nilai Penalty"].map(lambda x: f"Rp {int(x):,}".replace(",", "."))
 
-    selected_regional = col_regional.selectbox("Select Regional TI", regional_options, index=0)
+    agg_df["Availability_pct"] = agg_df["Availability"] * 100
+    agg_df["Target_Availability_pct"] = agg_df["Target Availability (%)"] * 100
+    agg_df["Persentase_Penalty_pct"] = agg_df["Persentase Penalty"] * 100
 
-    # Filter Site Id options based on Regional TI selection
-    if selected_regional == "All":
-        if selected_area == "All":
-            site_options = ["All"] + sorted(df["Site Id"].dropna().unique().tolist())
-        else:
-            # Sites within Area's Regional TIs
-            sites_in_area = df[df["Regional TI"].isin(area_to_regional[selected_area])]["Site Id"].unique().tolist()
-            site_options = ["All"] + sorted(sites_in_area)
-    else:
-        # Sites within selected Regional TI
-        sites_in_regional = df[df["Regional TI"] == selected_regional]["Site Id"].unique().tolist()
-        site_options = ["All"] + sorted(sites_in_regional)
+    site_class = site_name = None
+    if selected_site != "All":
+        # Filter for this site
+        site_df = _df.iloc[_index.rows(site=selected_site)]
 
-    selected_site = col_site.selectbox("Select Site Id", site_options, index=0)
+        # Sort so the last row is the latest
+        site_df = site_df.sort_values(["Year", "Month_Num"], ascending=True)
 
-    # 2. Filter DataFrame based on selections
-    filtered_df = df.copy()
+        # Get the latest record
+        latest_site_data = site_df.iloc[-1]
 
-    if selected_area != "All":
-        filtered_df = filtered_df[filtered_df["Regional TI"].isin(area_to_regional[selected_area])]
+        site_class = latest_site_data.get("Class Site", "Unknown")
+        site_name = latest_site_data.get("Site Name", "Unknown")
 
-    if selected_regional != "All":
-        filtered_df = filtered_df[filtered_df["Regional TI"] == selected_regional]
+    # Precomputed rows of the filtered sites, already in display order
+    facts = penalty_facts(version, _df)
+    penalty_table_df = facts[facts.index.isin(filtered_df.index)].reset_index(drop=True)
 
-    if selected_site != "All":
-        filtered_df = filtered_df[filtered_df["Site Id"] == selected_site]
+    html_table = render_html_table_with_scroll(penalty_table_df, max_height=450)
 
-    if filtered_df.empty:
-        st.warning("No data for the selected filters.")
-        return
+    # Create a BytesIO buffer
+    buffer = io.BytesIO()
 
-    # Prepare data for plotting
-    # Create Month-Year string for x-axis, e.g. "January-2025"
-    filtered_df["Month-Year"] = filtered_df.apply(lambda r: f"{r['Month']}-{r['Year']}", axis=1)
+    # Save filtered_df to this buffer as Excel
+    filtered_df.to_excel(buffer, index=False)
 
-    # Sort by Year and Month order to make line chart smooth
-    filtered_df["Month_Num"] = pd.to_datetime(filtered_df["Month-Year"], format="%B-%Y").dt.month
-    filtered_df = filtered_df.sort_values(by=["Year", "Month_Num"])
+    return {
+        "filtered_df": filtered_df,
+        "agg_df": agg_df,
+        "status_counts": status_counts,
+        "site_class": site_class,
+        "site_name": site_name,
+        "penalty_table_html": html_table,
+        "excel_bytes": buffer.getvalue(),
+    }
 
-    #import plotly.graph_objects as go
+def app_tab1():
+    st.markdown("## Availability vs Penalty Data")
+    
+    # Shared frame with Month-Year / Month_Num / Status already derived; read only
+    shared = get_shared_availability_vs_penalty()
+    df = shared.df
+    if df.empty:
+        st.warning("No data to display.")
+        return
 
-    x_vals = filtered_df["Month-Year"].unique()
+    # 1. Create filters in one row
+    col_area, col_regional, col_site = st.columns([3, 3, 3])
 
-    # Step 1: Add Status column for each row in original data (not aggregated)
-    filtered_df["Status"] = filtered_df.apply(
-        lambda row: "Achieved" if row["Availability"] >= row["Target Availability (%)"] else "Not Achieved",
-        axis=1
-    )
+    # Cascading options come from the hierarchy index (built once per data version)
+    index = penalty_index(shared)
 
-    # Step 2: Aggregate for lines (mean/sum)
-    agg_df = filtered_df.groupby("Month-Year").agg({
-        "Availability": "mean",
-        "Target Availability (%)": "mean",
-        "Persentase Penalty": "mean",
-        "Nilai Penalty": "sum"
-    }).reindex(x_vals)
+    # Area filter
+    area_options = ["All"] + list(index.areas())
+    selected_area = col_area.selectbox("Select Area", area_options, index=0)
 
-    agg_df["Availability_fmt"] = agg_df["Availability"].map(lambda x: f"{x*100:.2f}%")
-    agg_df["Target_Availability_fmt"] = agg_df["Target Availability (%)"].map(lambda x: f"{x*100:.2f}%")
-    agg_df["Persentase_Penalty_fmt"] = agg_df["Persentase Penalty"].map(lambda x: f"{x*100:.2f}%")
-    agg_df["Nilai_Penalty_fmt"] = agg_df["Nilai Penalty"].map(lambda x: f"Rp {int(x):,}".replace(",", "."))
+    # Filter Regional TI options based on Area selection
+    regional_options = ["All"] + list(index.regionals(selected_area))
+    selected_regional = col_regional.selectbox("Select Regional TI", regional_options, index=0)
 
-    agg_df["Availability_pct"] = agg_df["Availability"] * 100
-    agg_df["Target_Availability_pct"] = agg_df["Target Availability (%)"] * 100
-    agg_df["Persentase_Penalty_pct"] = agg_df["Persentase Penalty"] * 100
+    # Filter Site Id options based on Area / Regional TI selection; search by ID or name
+    search_index = get_site_search_index(shared.name, shared.version, index.sites(), df, "Site Id", "Site Name")
+    with col_site:
+        selected_site = site_search_select(
+            "Select Site Id", search_index, "penalty_site",
+            allowed=index.sites(selected_area, selected_regional), default="All", leading=("All",)
+        )
 
-    # Step 3: Count Achieved and Not Achieved per Month-Year
-    status_counts = filtered_df.groupby(["Month-Year", "Status"]).size().unstack(fill_value=0).reindex(x_vals, fill_value=0)
+    # 2. Filter + aggregate (memoized per data version and filter selection)
+    view = build_penalty_view(shared.version, df, index, selected_area, selected_regional, selected_site)
+    if view is None:
+        st.warning("No data for the selected filters.")
+        return
 
-    # Make sure columns exist even if some are missing
-    if "Achieved" not in status_counts.columns:
-        status_counts["Achieved"] = 0
-    if "Not Achieved" not in status_counts.columns:
-        status_counts["Not Achieved"] = 0
+    filtered_df = view["filtered_df"]
+    agg_df = view["agg_df"]
+    status_counts = view["status_counts"]
 
     main_title = "Availability vs. Penalty"
 
     # Default info_line
     info_line = ""
 
-    # Create a combined Month-Year column in "YYYY-MM" format (string)
-    df['Month-Year'] = df['Year'].astype(str) + '-' + df['Month'].astype(str).str.zfill(2)
-    # Helper: get latest month available in df (or filtered_df)
-    latest_month = df["Month-Year"].max()
-
     if selected_site != "All":
         site_id = selected_site
-        
-        # Filter for this site
-        site_df = df[df["Site Id"] == site_id].copy()
-
-        # Make a proper datetime from Year and Month name
-        site_df["date_key"] = pd.to_datetime(
-            site_df["Year"].astype(str) + "-" + site_df["Month"].astype(str),
-            format="%Y-%B"  # %B = full month name, e.g., "January"
-        )
-
-        # Sort so the last row is the latest
-        site_df = site_df.sort_values(["date_key"], ascending=True)
-
-        # Get the latest record
-        latest_site_data = site_df.iloc[-1]
-
-        site_class = latest_site_data.get("Class Site", "Unknown")
-        site_name = latest_site_data.get("Site Name", "Unknown")
+        site_class = view["site_class"]
+        site_name = view["site_name"]
 
         info_line = (
             f"Site ID: <b style='color:green'>{site_id}</b> | "
@@ -198,7 +224,7 @@ def app_tab1():
     ))
 
     # Add line traces with labels
-    fig.add_trace(go.Scatter(
+    fig.add_trace(scatter(
         x=agg_df.index,
         y=agg_df["Availability_pct"],
         mode='lines+markers+text',
@@ -211,7 +237,7 @@ def app_tab1():
         customdata=agg_df[["Availability_fmt"]]
     ))
 
-    fig.add_trace(go.Scatter(
+    fig.add_trace(scatter(
         x=agg_df.index,
         y=agg_df["Target_Availability_pct"],
         mode='lines+markers',
@@ -221,7 +247,7 @@ def app_tab1():
         customdata=agg_df[["Target_Availability_fmt"]]
     ))
 
-    fig.add_trace(go.Scatter(
+    fig.add_trace(scatter(
         x=agg_df.index,
         y=agg_df["Persentase_Penalty_pct"],
         mode='lines+markers+text',
@@ -234,7 +260,7 @@ def app_tab1():
         customdata=agg_df[["Persentase_Penalty_fmt"]]
     ))
 
-    fig.add_trace(go.Scatter(
+    fig.add_trace(scatter(
         x=agg_df.index,
         y=agg_df["Nilai Penalty"],
         mode='lines+markers+text',
@@ -317,37 +343,12 @@ def app_tab1():
         margin=dict(l=40, r=60, t=100, b=80)
     )
 
-    st.plotly_chart(fig, use_container_width=True)
+    show_chart(fig, "penalty_trend")
     
     st.markdown("---")
     st.markdown("### Tabel Penalty")
-    penalty_table_df = prepare_penalty_table(filtered_df)
-
-    # Ensure clean DataFrame (no multi-index, no index name)
-    penalty_table_df = penalty_table_df.reset_index(drop=True)
-    penalty_table_df.columns = penalty_table_df.columns.astype(str)
-
-    # Convert Month to datetime (assuming format like "April-2025")
-    penalty_table_df["Month"] = pd.to_datetime(
-        penalty_table_df["Month"], format="%B-%Y"
-    )
-    # Sort it properly
-    penalty_table_df = penalty_table_df.sort_values(
-        by=["Month", "Regional TI", "Site Id"]
-    ).reset_index(drop=True)
-    # Display back as "Month-Year"
-    penalty_table_df["Month"] = penalty_table_df["Month"].dt.strftime("%B-%Y")
-
-    # Format percentage columns safely
-    for col in ["Target Availability (%)", "Availability", "Gap Ava"]:
-        if col in penalty_table_df.columns:
-            penalty_table_df[col] = (
-                pd.to_numeric(penalty_table_df[col], errors="coerce") * 100
-            ).fillna(0).map("{:.2f}%".format)
-
     # Render table
-    html_table = render_html_table_with_scroll(penalty_table_df, max_height=450)
-    st.markdown(html_table, unsafe_allow_html=True)
+    st.markdown(view["penalty_table_html"], unsafe_allow_html=True)
 
     st.markdown("---")
     st.markdown("### Chart Data")
@@ -359,21 +360,200 @@ def app_tab1():
             # Show dataframe with default Streamlit table
             st.dataframe(filtered_df, use_container_width=True)
     
-    # Create a BytesIO buffer
-    buffer = io.BytesIO()
-
-    # Save filtered_df to this buffer as Excel
-    filtered_df.to_excel(buffer, index=False)
-    buffer.seek(0)
-
     # Add a download button
     st.download_button(
         label="📥 Download Data",
-        data=buffer,
+        data=view["excel_bytes"],
         file_name="filtered_data.xlsx",
         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
     )
 
+def app_tab3():
+    st.markdown("## 🔮 Month-End Projection")
+
+    daily = get_shared_daily()
+    penalty = get_shared_availability_vs_penalty()
+    if daily.empty or penalty.empty:
+        st.warning("Daily availability and penalty data are both needed for the projection.")
+        return
+
+    # Whole fleet in one pass, cached per (daily, penalty) data version
+    projection = get_month_end_projection(daily.version, penalty.version, daily.df, penalty.df)
+    if projection.empty:
+        st.warning("No sites matched between the daily availability and penalty data.")
+        return
+
+    as_of = daily.df["Date"].max()
+    st.caption(
+        f"Month-to-date up to {as_of.strftime('%d-%B-%Y')}; remaining days projected at each site's "
+        "rolling 7-day availability. Penalty Ke continues the site's missed months of this year."
+    )
+
+    col1, col2, col3 = st.columns(3)
+    at_risk = projection[projection["Projected Status"] == "Not Achieved"]
+    col1.metric("Sites Projected to Miss Target", f"{len(at_risk):,} / {len(projection):,}")
+    col2.metric("Projected Exposure", f"Rp {projection['Projected Exposure'].sum():,.0f}".replace(",", "."))
+    regional_options = ["All"] + sorted(projection["Regional TI"].dropna().unique().tolist())
+    selected_regional = col3.selectbox("Regional TI", regional_options, key="projection_regional")
+
+    view = projection if selected_regional == "All" else projection[projection["Regional TI"] == selected_regional]
+    only_at_risk = st.checkbox("Only sites projected to miss target", value=True, key="projection_at_risk")
+    if only_at_risk:
+        view = view[view["Projected Status"] == "Not Achieved"]
+
+    display = view[[
+        "Site Id", "Site Name", "Regional TI", "Class Site", "Target Availability (%)",
+        "MTD Availability (%)", "MTD Days", "Projected Availability", "Projected Band",
+        "Penalty Ke (so far)", "Projected Penalty Ke", "Projected Penalty (%)", "Projected Exposure"
+    ]].assign(**{
+        "Target Availability (%)": (pd.to_numeric(view["Target Availability (%)"], errors="coerce") * 100).round(2),
+        "MTD Availability (%)": view["MTD Availability (%)"].round(2),
+        "Projected Availability": (view["Projected Availability"] * 100).round(2),
+        "Projected Exposure": view["Projected Exposure"].map(lambda x: f"Rp {x:,.0f}".replace(",", ".")),
+    })
+    st.dataframe(display, use_container_width=True, hide_index=True)
+
+    buffer = io.BytesIO()
+    view.to_excel(buffer, index=False)
+    st.download_button(
+        label="📥 Download Projection",
+        data=buffer.getvalue(),
+        file_name="month_end_projection.xlsx",
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    )
+
+def app_tab2():
+    st.markdown("## 🧾 Penalty Statements per Regional")
+
+    shared = get_shared_availability_vs_penalty()
+    if shared.empty:
+        st.warning("No data to display.")
+        return
+
+    df = shared.df
+    regionals = df["Regional TI"].fillna("Unknown")
+    summary = df.assign(**{"Regional TI": regionals}).groupby("Regional TI").agg(
+        Sites=("Site Id", "nunique"),
+        **{"Site-Months": ("Site Id", "size")},
+        **{"Nilai Penalty": ("Nilai Penalty", lambda s: pd.to_numeric(s, errors="coerce").sum())},
+    ).reset_index()
+    summary["Nilai Penalty"] = format_rupiah(summary["Nilai Penalty"])
+
+    st.caption(
+        f"One workbook per Regional TI (Penalty Table, Monthly Summary, Site Details), "
+        f"built in {STATEMENT_WORKERS} parallel worker(s) and packaged as one zip."
+    )
+    st.dataframe(summary, use_container_width=True, hide_index=True)
+
+    if st.button("⚙️ Generate All Statements", key="generate_statements"):
+        st.session_state["statements_version"] = shared.version
+
+    # Built once per data version; later visits reuse the archive
+    if st.session_state.get("statements_version") == shared.version:
+        archive = statements_zip(shared.version, df)
+        st.download_button(
+            label=f"📥 Download {len(summary)} Statements (ZIP)",
+            data=archive,
+            file_name="penalty_statements.zip",
+            mime="application/zip",
+            key="download_statements"
+        )
+
+def _parse_values(text):
+    """Comma-separated numbers; blank entries are skipped."""
+    return [float(v) for v in str(text).replace(";", ",").split(",") if v.strip()]
+
+# Upper bound on scenarios per run (grid size is the product of all inputs)
+MAX_SCENARIOS = 1000
+
+def app_tab4():
+    st.markdown("## 🧪 What-If Penalty Scenarios")
+    st.caption(
+        "Every combination of the values below is evaluated against the full site-month history. "
+        "Band shifts move all of a class's band cut-offs by that many percentage points; "
+        "a blank target keeps the workbook's target availability."
+    )
+
+    shared = get_shared_availability_vs_penalty()
+    if shared.empty:
+        st.warning("No data to display.")
+        return
+
+    with st.form("scenario_form"):
+        band_inputs, target_inputs = {}, {}
+        cols = st.columns(len(BAND_TABLES))
+        for col, table in zip(cols, BAND_TABLES):
+            key = class_table_key(table)
+            title = " / ".join(k.title() for k in table[0])
+            col.markdown(f"**{title}**")
+            band_inputs[key] = col.text_input("Band shift (pp)", "0", key=f"scenario_shift_{key}")
+            target_inputs[key] = col.text_input("Target (%)", "", key=f"scenario_target_{key}")
+        factor_input = st.text_input("Penalty % multipliers", "1", key="scenario_factors")
+        submitted = st.form_submit_button("▶️ Run Scenarios")
+
+    try:
+        shifts = {key: _parse_values(text) or [0.0] for key, text in band_inputs.items()}
+        targets = {key: _parse_values(text) for key, text in target_inputs.items()}
+        factors = _parse_values(factor_input) or [1.0]
+    except ValueError:
+        st.error("Use comma-separated numbers, e.g. -0.5, 0, 0.5")
+        return
+
+    # Band options: every combination of per-class shifts (0 = current table, no label)
+    base_bounds = {class_table_key(t): [lower for _, lower in t[1]] for t in BAND_TABLES}
+    band_options = {}
+    for combo in itertools.product(*[[(key, d) for d in values] for key, values in shifts.items()]):
+        label = " ".join(f"{key.title()} {d:+g}pp" for key, d in combo if d)
+        band_options[label] = {key: [b + d for b in base_bounds[key]] for key, d in combo if d}
+    target_options = {"": {}}
+    for combo in itertools.product(*[[(key, None)] + [(key, t) for t in values] for key, values in targets.items()]):
+        label = " ".join(f"{key.title()} target {t:g}%" for key, t in combo if t is not None)
+        if label:
+            target_options[label] = {key: t for key, t in combo if t is not None}
+    step_options = {
+        ("" if f == 1 else f"x{f:g} penalty"): ({} if f == 1 else {band: tuple(p * f for p in steps) for band, steps in PENALTY_STEPS.items()})
+        for f in factors
+    }
+
+    scenarios = scenario_grid(bands=band_options, steps=step_options, targets=target_options)
+    if len(scenarios) > MAX_SCENARIOS:
+        st.error(f"{len(scenarios):,} scenarios requested; the limit is {MAX_SCENARIOS:,}. Use fewer values.")
+        return
+    if not submitted and "scenario_ran" not in st.session_state:
+        st.info(f"{len(scenarios):,} scenario(s) configured. Press Run Scenarios to evaluate.")
+        return
+    st.session_state["scenario_ran"] = True
+
+    # All scenarios in one broadcast pass, cached per (data version, scenario grid)
+    result = get_scenario_results(shared.version, scenario_cache_key(scenarios), shared.df, scenarios)
+    totals = scenario_totals(result)
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Scenarios", f"{len(totals):,}")
+    col2.metric("Lowest Total Penalty", format_rupiah(totals["Penalty (Rp)"].head(1)).iloc[0])
+    col3.metric("Highest Total Penalty", format_rupiah(totals["Penalty (Rp)"].tail(1)).iloc[0])
+
+    display = totals.assign(**{
+        col: format_rupiah(totals[col]) for col in ["Penalty (Rp)", "vs Current (Rp)"] if col in totals.columns
+    })
+    st.dataframe(display, use_container_width=True, hide_index=True)
+
+    # Regional x month breakdown of one scenario
+    selected = st.selectbox("Breakdown for scenario", totals["Scenario"].tolist(), key="scenario_breakdown")
+    breakdown = result[result["Scenario"] == selected].pivot_table(
+        index="Regional TI", columns="Month", values="Penalty (Rp)", aggfunc="sum", fill_value=0
+    )
+    breakdown.columns = [c.strftime("%b-%Y") for c in breakdown.columns]
+    st.dataframe(breakdown.apply(format_rupiah), use_container_width=True)
+
+    st.download_button(
+        label="📥 Download Scenario Results (CSV)",
+        data=result.to_csv(index=False).encode("utf-8"),
+        file_name="penalty_scenarios.csv",
+        mime="text/csv",
+        key="download_scenarios"
+    )
+
 # --- Main App Entry ---
 def app():
     col1, col2 = st.columns([9, 1])
@@ -382,19 +562,19 @@ def app():
     with col2:
         if st.button("🔄 Refresh Data", help="Reload availability data"):
             st.cache_data.clear()
+            clear_shared_data()
             st.rerun()
 
-    df_raw = load_penalty_data()
-
-    if df_raw.empty:
+    # Metadata lookup only; the penalty workbooks are not downloaded or parsed here
+    if not dataset("penalty").exists():
         return
 
-    tab1, tab2 = st.tabs(["📉 Availability vs Penalty Tracker", "Tab 2 (In Development)"])
-    with tab1:
-        app_tab1()
-
-    with tab2:
-        app_tab2()
+    lazy_tabs({
+        "📉 Availability vs Penalty Tracker": app_tab1,
+        "🧾 Regional Statements": app_tab2,
+        "🔮 Month-End Projection": app_tab3,
+        "🧪 What-If Scenarios": app_tab4,
+    }, key="penalty_tab")
 
 
 
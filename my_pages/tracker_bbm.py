@@ -8,6 +8,10 @@ import re
 import streamlit.components.v1 as components
 from utils.data_loader import get_drive_oauth, upload_file_to_drive, download_file_from_drive, load_bbm_tracker_data
 from utils.data_loader import get_drive as get_drive_auto
+from utils.shared_data import frame_fingerprint
+from utils.site_search import get_site_search_index, site_search_select
+from utils.lazy_tabs import lazy_tabs
+from utils.prefetch import prefetchable
 
 # Constants
 DATA_FOLDER_ID = "1qAn7O6QEahUtVhAxRfLzDZZ36s5v2_fk"
@@ -31,9 +35,15 @@ def app_tab1():
         st.error(f"Gagal memuat data site: {e}")
         return
 
-    with st.form("form_pengisian_bbm"):
-        site_id = st.selectbox("Pilih Site ID", sorted(site_ids))
+    # Site search sits outside the form so matches update before submit
+    name_col = 'site_name' if 'site_name' in df_sites.columns else 'site_id'
+    search_index = get_site_search_index(
+        "bbm_sites", frame_fingerprint(df_sites[['site_id', name_col]]), sorted(site_ids),
+        df_sites, 'site_id', name_col
+    )
+    site_id = site_search_select("Pilih Site ID", search_index, "bbm_site_id")
 
+    with st.form("form_pengisian_bbm"):
         gmt7 = pytz.timezone("Asia/Jakarta")
         tanggal = st.date_input("Tanggal Pengisian", datetime.now(gmt7).date())
 
@@ -46,6 +56,9 @@ def app_tab1():
         submit = st.form_submit_button("Submit")
 
     if submit:
+        if site_id is None:
+            st.error("❌ Pilih Site ID terlebih dahulu.")
+            return
         photos = photos or []
 
         if len(photos) > 3:
@@ -116,6 +129,7 @@ def app_tab1():
 
 # --- Cached Data Loading ---
 @st.cache_data(ttl=3600)
+@prefetchable
 def load_processed_data():
     #from data_loader import load_bbm_tracker_data, get_drive  # Adjust imports if needed
     df = load_bbm_tracker_data(
@@ -273,20 +287,9 @@ def app_tab2():
 def app():
     st.title("📊 Dashboard Tracker BBM")
 
-    tabs = st.tabs([
-        "⛽ Input Data Pengisian BBM",
-        "📄 Tracker Pengisian BBM",
-        "📈 Visualisasi"
-    ])
-
-    with tabs[0]:
-        app_tab1()
-
-    with tabs[1]:
-        #st.info("📄 Tracker Pengisian BBM.")
-        app_tab2()
-
-    with tabs[2]:
-        st.info("📈 Visualisasi belum diimplementasikan.")
+    lazy_tabs({
+        "⛽ Input Data Pengisian BBM": app_tab1,
+        "📄 Tracker Pengisian BBM": app_tab2,
         # from tracker_bbm_tab3 import app_tab3
-        # app_tab3()
+        "📈 Visualisasi": lambda: st.info("📈 Visualisasi belum diimplementasikan."),
+    }, key="bbm_tab")
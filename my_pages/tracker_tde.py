@@ -5,6 +5,8 @@ from zoneinfo import ZoneInfo  # ✅ For timezone-aware datetime
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from utils.drive_utils import get_drive, upload_file_to_drive, download_file_from_drive, read_excel_from_drive, load_kurva_s
+from utils.chart_data import downsample_frame, scatter, show_chart
+from utils.lazy_tabs import lazy_tabs
 import io
 import time
 
@@ -755,12 +757,14 @@ def app_tab4():
 
     # --- Create the plot ---
     fig = make_subplots(specs=[[{"secondary_y": True}]])
-    df_actual_until_today = df[df["Date"] <= today]
+    # Plotted rows only; the full df still feeds the table and the Excel export
+    plot_df = downsample_frame(df, "Date", ["Plan", "Cumulative Percentage", "Quantity", "Percentage Actual"])
+    df_actual_until_today = plot_df[plot_df["Date"] <= today]
 
     # --- Bar chart for Plan (Quantity Target) ---
     fig.add_trace(go.Bar(
-        x=df["Date"],
-        y=df["Plan"],
+        x=plot_df["Date"],
+        y=plot_df["Plan"],
         name="Plan Quantity",
         marker_color="lightblue",
         opacity=0.8,
@@ -778,12 +782,12 @@ def app_tab4():
     ), secondary_y=True)
 
     # Line chart for Cumulative Percentage
-    fig.add_trace(go.Scatter(
-        x=df["Date"],
-        y=df["Cumulative Percentage"],
+    fig.add_trace(scatter(
+        x=plot_df["Date"],
+        y=plot_df["Cumulative Percentage"],
         mode="lines+markers",
         name="% Plan",
-        text=df["Cumulative Percentage"].apply(lambda x: f"{x:.2f}%"),
+        text=plot_df["Cumulative Percentage"].apply(lambda x: f"{x:.2f}%"),
         textposition="top center",
         marker=dict(size=8),
         line=dict(shape="spline", width=5),
@@ -792,10 +796,10 @@ def app_tab4():
             "<b>Cumulative Plan:</b> %{customdata[1]:,.0f}<br>"
             "<b>Cumulative Plan %:</b> %{y:.2f}%<extra></extra>"
         ),
-        customdata=df[["Plan", "Cumulative Plan"]]
+        customdata=plot_df[["Plan", "Cumulative Plan"]]
     ), secondary_y=False)
 
-    fig.add_trace(go.Scatter(
+    fig.add_trace(scatter(
         x=df_actual_until_today["Date"],
         y=df_actual_until_today["Percentage Actual"],
         mode="lines+markers",
@@ -902,7 +906,7 @@ def app_tab4():
     )
 
     # Show the chart
-    st.plotly_chart(fig, use_container_width=True)
+    show_chart(fig, "kurva_s", rows=len(plot_df), source_rows=len(df))
 
     # Add a horizontal separator or title (optional)
     st.markdown("### 📋 Data Table")
@@ -949,15 +953,13 @@ def app_tab4():
 def app():
     st.title("⚙️ Tracker Activity TDE")
 
-    tab1, tab2, tab3, tab4 = st.tabs(["📝 Activity Form", "📊 Activity Completion Tracker", "🧭 Riwayat Aktivitas TDE", "📈 Kurva-S TDE"])
-    with tab1:
-        app_tab1()
-    with tab2:
-        app_tab2()
-    with tab3:
-        app_tab3()
-    with tab4:
-        app_tab4()
+    # Only the selected tab runs (and reads its workbooks from Drive) on a rerun
+    lazy_tabs({
+        "📝 Activity Form": app_tab1,
+        "📊 Activity Completion Tracker": app_tab2,
+        "🧭 Riwayat Aktivitas TDE": app_tab3,
+        "📈 Kurva-S TDE": app_tab4,
+    }, key="tde_tab")
 
 
 
@@ -0,0 +1,16 @@
+import pandas as pd
+
+from utils.availability_metrics import add_availability_check, normalize_availability_scale
+
+
+def test_ratio_files_rescaled_per_source_file():
+    df = pd.DataFrame({
+        "source_file": ["ratio.xlsx", "ratio.xlsx", "percent.xlsx", "percent.xlsx"],
+        "availability (%)": [1.0, 0.5, 100.0, 0.5],
+        "outage_2g (Hour)": [0.0, 12.0, 0.0, 0.0],
+        "outage_4g (Hour)": [0.0, 0.0, 0.0, 23.88],
+    })
+    df = add_availability_check(normalize_availability_scale(df))
+    assert df["availability (%)"].tolist() == [100.0, 50.0, 100.0, 0.5]
+    assert df["availability_recomputed"].round(2).tolist() == [100.0, 50.0, 100.0, 0.5]
+    assert not df["availability_mismatch"].any()
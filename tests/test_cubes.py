@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+
+from utils.cubes import (
+    _daily_cube_state,
+    build_daily_cube,
+    daily_achievement_trend,
+    get_daily_cube,
+    get_penalty_cube,
+    penalty_trend,
+)
+from utils.filter_index import HierarchyIndex
+
+
+def _daily_rows(days=20, sites=30, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2025-03-01", periods=days)
+    site_ids = [f"S{i:03d}" for i in range(sites)]
+    areas = {s: f"Area {i % 2 + 1}" for i, s in enumerate(site_ids)}
+    regionals = {s: f"Regional {i % 4 + 1}" for i, s in enumerate(site_ids)}
+    df = pd.DataFrame([(d, s) for d in dates for s in site_ids], columns=["Date", "site_id"])
+    df["area"] = df["site_id"].map(areas)
+    df["regional"] = df["site_id"].map(regionals)
+    df["availability (%)"] = rng.uniform(90, 100, len(df)).round(2)
+    df["Achievement"] = np.where(df["availability (%)"] >= 97, "Achieved", "Not Achieved")
+    return df
+
+
+def _baseline_trend(df, start, end, area="All", regional="All"):
+    # The availability page's grouping before the cube
+    filtered = df[(df["Date"] >= start) & (df["Date"] <= end)]
+    if area != "All":
+        filtered = filtered[filtered["area"] == area]
+    if regional != "All":
+        filtered = filtered[filtered["regional"] == regional]
+    grouped = filtered.groupby(["Date", "Achievement"]).size().reset_index(name="Count")
+    pivoted = grouped.pivot(index="Date", columns="Achievement", values="Count").fillna(0)
+    for col in ["Achieved", "Not Achieved"]:
+        if col not in pivoted.columns:
+            pivoted[col] = 0
+    return pivoted[["Achieved", "Not Achieved"]].sort_index()
+
+
+def _assert_trend_equal(cube, df, **filters):
+    start, end = pd.Timestamp("2025-03-03"), pd.Timestamp("2025-03-17")
+    got = daily_achievement_trend(cube, start, end, **filters)
+    expected = _baseline_trend(df, start, end, **filters)
+    pd.testing.assert_frame_equal(got.astype(float), expected.astype(float), check_names=False, check_freq=False)
+
+
+def test_daily_trend_matches_grouping():
+    df = _daily_rows()
+    cube = build_daily_cube(df)
+    for filters in ({}, {"area": "Area 1"}, {"regional": "Regional 2"}, {"area": "Area 2", "regional": "Regional 2"}):
+        _assert_trend_equal(cube, df, **filters)
+
+
+def test_daily_cube_only_rebuilds_changed_days():
+    _daily_cube_state.clear()
+    df = _daily_rows()
+    get_daily_cube("daily", "v1", df)
+
+    # One day edited, two days appended
+    changed = pd.concat([df, _daily_rows(days=22).iloc[len(df):]], ignore_index=True)
+    changed.loc[changed["Date"] == "2025-03-05", ["availability (%)", "Achievement"]] = [50.0, "Not Achieved"]
+    cube = get_daily_cube("daily", "v2", changed)
+
+    expected = build_daily_cube(changed)
+    keys = ["Date", "area", "regional", "site_class"]
+    pd.testing.assert_frame_equal(
+        cube.sort_values(keys).reset_index(drop=True),
+        expected.sort_values(keys).reset_index(drop=True),
+        check_dtype=False,
+    )
+    _assert_trend_equal(cube, changed)
+
+
+def _penalty_frame(seed=0):
+    rng = np.random.default_rng(seed)
+    months = pd.date_range("2024-11-01", periods=5, freq="MS")
+    rows = [(m, f"S{i:02d}") for m in months for i in range(24)]
+    df = pd.DataFrame(rows, columns=["periode", "Site Id"])
+    df["Year"] = df["periode"].dt.year
+    df["Month_Num"] = df["periode"].dt.month
+    df["Month-Year"] = df["periode"].dt.strftime("%B-%Y")
+    df["Area"] = np.where(df["Site Id"].str[-1].astype(int) % 2 == 0, "Area 1", "Area 2")
+    df["Regional TI"] = "Regional " + (df["Site Id"].str[-1].astype(int) % 3 + 1).astype(str)
+    df["Availability"] = rng.uniform(0.95, 1.0, len(df))
+    df.loc[::7, "Availability"] = np.nan
+    df["Target Availability (%)"] = rng.choice([0.975, 0.99], len(df))
+    df["Persentase Penalty"] = rng.choice([0, 0.05, 0.1], len(df))
+    df["Nilai Penalty"] = rng.uniform(0, 1e6, len(df)).round()
+    df["Status"] = np.where(df["Availability"] >= df["Target Availability (%)"], "Achieved", "Not Achieved")
+    return df.drop(columns="periode")
+
+
+def test_penalty_trend_matches_grouping():
+    df = _penalty_frame()
+    cubes = get_penalty_cube("availability_vs_penalty", "test", df)
+    for area, regional, site in [("All", "All", "All"), ("Area 1", "All", "All"), ("All", "Regional 2", "All"),
+                                 ("Area 2", "Regional 1", "All"), ("All", "All", "S05")]:
+        filtered = df
+        for col, value in (("Area", area), ("Regional TI", regional), ("Site Id", site)):
+            if value != "All":
+                filtered = filtered[filtered[col] == value]
+        filtered = filtered.sort_values(["Year", "Month_Num"])
+        x_vals = filtered["Month-Year"].unique()
+        expected = filtered.groupby("Month-Year").agg({
+            "Availability": "mean",
+            "Target Availability (%)": "mean",
+            "Persentase Penalty": "mean",
+            "Nilai Penalty": "sum",
+        }).reindex(x_vals)
+        counts = filtered.groupby(["Month-Year", "Status"]).size().unstack(fill_value=0).reindex(x_vals, fill_value=0)
+
+        agg_df, status_counts = penalty_trend(cubes, area, regional, site)
+        pd.testing.assert_frame_equal(agg_df, expected, check_names=False)
+        pd.testing.assert_frame_equal(
+            status_counts, counts[["Achieved", "Not Achieved"]], check_names=False, check_dtype=False
+        )
+
+
+def test_hierarchy_index_matches_masks():
+    df = _daily_rows(days=3)
+    df.loc[df.index[::11], "regional"] = None
+    index = HierarchyIndex(df, "area", "regional", "site_id")
+
+    assert index.areas() == sorted(df["area"].dropna().unique())
+    assert index.regionals() == sorted(df["regional"].dropna().unique())
+    for area in index.areas():
+        in_area = df[df["area"] == area]
+        assert index.regionals(area) == sorted(in_area["regional"].dropna().unique())
+        assert index.sites(area) == sorted(in_area["site_id"].dropna().unique())
+        for regional in index.regionals(area):
+            in_pair = in_area[in_area["regional"] == regional]
+            assert index.sites(area, regional) == sorted(in_pair["site_id"].unique())
+
+    for area in ["All", "Area 1", "Area 9"]:
+        for regional in ["All", "Regional 2", "Regional 3"]:
+            for site in ["All", "S002", "S005"]:
+                mask = pd.Series(True, index=df.index)
+                for col, value in (("area", area), ("regional", regional), ("site_id", site)):
+                    if value != "All":
+                        mask &= df[col] == value
+                assert list(index.rows(area, regional, site)) == list(np.flatnonzero(mask)), (area, regional, site)
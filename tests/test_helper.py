@@ -0,0 +1,21 @@
+import numpy as np
+import pandas as pd
+
+from utils.helper import format_rupiah
+
+
+def _row_format(x):
+    # The per-row formatter format_rupiah replaced
+    return f"Rp {x:,.0f}".replace(",", ".")
+
+
+def test_format_rupiah_matches_row_formatter():
+    values = [0, 1, 999, 1000, 1234567.4, 1234567.5, -1500, -0.4, 2.5e12]
+    assert format_rupiah(values).tolist() == [_row_format(x) for x in values]
+
+
+def test_format_rupiah_missing_and_infinite():
+    values = pd.Series([np.nan, np.inf, -np.inf, None, 1500], dtype=float)
+    result = format_rupiah(values)
+    assert result.tolist() == ["Rp nan", "Rp inf", "Rp -inf", "Rp nan", "Rp 1.500"]
+    assert result.notna().all()
@@ -0,0 +1,164 @@
+import numpy as np
+import pandas as pd
+
+from utils.helper import prepare_penalty_table
+from utils.penalty_engine import (
+    _penalty_state,
+    assign_band,
+    incremental_penalty_facts,
+    penalty_map,
+    penalty_streak,
+    scenario_totals,
+    simulate_scenarios,
+)
+
+CLASSES = ["Platinum", "Diamond", " gold ", "Silver", "bronze", "", None, "Other"]
+BOUNDS = [99.4, 99.0, 98.5, 98.0, 97.5, 97.0, 96.5, 95.0]
+
+
+# --- Per-row / per-group logic the vectorized engine replaced ---
+def _baseline_band(ava, class_site):
+    if pd.isna(ava):
+        return None
+    ava_pct = ava * 100
+    cls = str(class_site).strip().lower()
+    if "diamond" in cls or "platinum" in cls:
+        limits, names = [99.4, 99.0, 98.0, 97.0], ["Ach", "A", "B", "C", "D"]
+    elif "gold" in cls:
+        limits, names = [99.0, 98.5, 98.0, 97.0], ["Ach", "E", "F", "G", "H"]
+    elif "silver" in cls or "bronze" in cls:
+        limits, names = [97.5, 97.0, 96.5, 95.0], ["Ach", "I", "J", "K", "L"]
+    else:
+        return None
+    if limits[0] <= ava_pct <= 100:
+        return names[0]
+    for upper, lower, name in zip(limits, limits[1:], names[1:]):
+        if lower <= ava_pct < upper:
+            return name
+    return names[-1]
+
+
+def _baseline_streaks(df):
+    ke = pd.Series(0, index=df.index)
+    for _, group in df.sort_values(["Site Id", "Year", "Month_sort"]).groupby(["Site Id", "Year"]):
+        counter = 0
+        for idx, row in group.iterrows():
+            counter = 0 if row["Achievement"] == "Achieved" else min(counter + 1, 3)
+            ke[idx] = counter
+    return ke
+
+
+def _penalty_rows(months, n_sites=40, seed=0):
+    rng = np.random.default_rng(seed)
+    frames = []
+    for year, month in months:
+        availability = rng.choice([rng.uniform(0.94, 1.0), np.nan], size=n_sites, p=[0.95, 0.05])
+        frames.append(pd.DataFrame({
+            "Regional TI": rng.choice(["Regional 1", "Regional 2", "Regional 3"], n_sites),
+            "Site Id": [f"S{i:03d}" for i in range(n_sites)],
+            "Site Name": [f"Site {i}" for i in range(n_sites)],
+            "Class Site": [CLASSES[i % len(CLASSES)] for i in range(n_sites)],
+            "Periode Tagihan (Awal)": pd.Timestamp(year, month, 1).strftime("%d-%B-%Y"),
+            "Target Availability (%)": rng.choice([0.975, 0.99, 0.994], n_sites),
+            "Availability": availability,
+            "Nilai Penalty": rng.uniform(0, 5e6, n_sites).round(),
+            "Nilai BAST": rng.uniform(1e7, 5e7, n_sites).round(),
+        }))
+    return frames
+
+
+MONTHS = [(2024, 10), (2024, 11), (2024, 12), (2025, 1), (2025, 2), (2025, 3)]
+
+
+def test_assign_band_matches_row_logic():
+    edges = [b / 100 + d for b in BOUNDS for d in (-1e-9, 0, 1e-9)]
+    values = edges + [0.5, 0.95, 1.0, 1.0001, np.nan] + list(np.random.default_rng(1).uniform(0.93, 1.0, 200))
+    availability = np.repeat(values, len(CLASSES))
+    classes = CLASSES * len(values)
+    expected = [_baseline_band(a, c) for a, c in zip(availability, classes)]
+    assert list(assign_band(availability, classes)) == expected
+
+
+def test_penalty_streak_matches_group_loop():
+    df = pd.concat(_penalty_rows(MONTHS), ignore_index=True)
+    df["Month_sort"] = pd.to_datetime(df["Periode Tagihan (Awal)"])
+    df["Year"] = df["Month_sort"].dt.year
+    df["Achievement"] = np.where(df["Availability"] >= df["Target Availability (%)"], "Achieved", "Not Achieved")
+    ordered = df.sort_values(["Site Id", "Year", "Month_sort"])
+    streak = penalty_streak(ordered["Achievement"].eq("Not Achieved"), [ordered["Site Id"], ordered["Year"]])
+    assert streak.tolist() == _baseline_streaks(df).loc[ordered.index].tolist()
+
+
+def test_prepare_penalty_table_matches_baseline():
+    df = pd.concat(_penalty_rows(MONTHS), ignore_index=True)
+    table = prepare_penalty_table(df)
+
+    periode = pd.to_datetime(df["Periode Tagihan (Awal)"])
+    reference = df.assign(
+        Month_sort=periode,
+        Year=periode.dt.year,
+        Achievement=np.where(df["Availability"] - df["Target Availability (%)"] >= 0, "Achieved", "Not Achieved"),
+        Band=[_baseline_band(a, c) for a, c in zip(df["Availability"], df["Class Site"])],
+    )
+    reference["Penalty Ke"] = _baseline_streaks(reference)
+    key = reference["Band"].astype(str) + reference["Penalty Ke"].astype(str)
+    reference["Prosentase Penalty"] = key.map(penalty_map()).fillna(0).astype(int).astype(str) + "%"
+    reference["Nilai Penalty"] = reference["Nilai Penalty"].map(lambda x: f"Rp {x:,.0f}".replace(",", "."))
+    reference = reference.loc[table.index]
+
+    for col in ["Achievement", "Band", "Penalty Ke", "Prosentase Penalty", "Nilai Penalty"]:
+        assert table[col].tolist() == reference[col].tolist(), col
+
+
+def _build(rows, penalty_ke):
+    # Display order is month first, as the penalty page sorts it
+    table = prepare_penalty_table(rows, penalty_ke=penalty_ke)
+    month = pd.to_datetime(table["Month"], format="%B-%Y")
+    return table.assign(_month=month).sort_values(["_month", "Regional TI", "Site Id"]).drop(columns="_month")
+
+
+def test_incremental_facts_match_full_build():
+    _penalty_state.clear()
+    months = _penalty_rows(MONTHS)
+    built = []
+
+    def build(rows, penalty_ke):
+        built.append(len(rows))
+        return _build(rows, penalty_ke)
+
+    for n in range(1, len(months) + 1):
+        df = pd.concat(months[:n], ignore_index=True)
+        facts = incremental_penalty_facts(df, build)
+        pd.testing.assert_frame_equal(facts.sort_index(), prepare_penalty_table(df).sort_index())
+    # Only the first build covers more than the month it added
+    assert built == [len(m) for m in months]
+
+    # A changed closed month rebuilds everything
+    months[1] = months[1].assign(Availability=0.5)
+    df = pd.concat(months, ignore_index=True)
+    facts = incremental_penalty_facts(df, build)
+    assert built[-1] == len(df)
+    pd.testing.assert_frame_equal(facts.sort_index(), prepare_penalty_table(df).sort_index())
+
+
+def test_current_scenario_matches_penalty_table():
+    df = pd.concat(_penalty_rows(MONTHS), ignore_index=True)
+    result = simulate_scenarios(df, [{"name": "Current"}, {"name": "No penalty", "steps": {b: (0, 0, 0) for b in "ABCDEFGHIJKL"}}])
+
+    table = prepare_penalty_table(df)
+    pct = table["Prosentase Penalty"].str.rstrip("%").astype(int)
+    expected = pd.DataFrame({
+        "Regional TI": table["Regional TI"],
+        "Month": pd.to_datetime(table["Month"], format="%B-%Y"),
+        "Penalty (Rp)": pct / 100 * df.loc[table.index, "Nilai BAST"],
+        "Penalized Site-Months": (pct > 0).astype(int),
+    }).groupby(["Regional TI", "Month"]).sum()
+
+    current = result[result["Scenario"] == "Current"].set_index(["Regional TI", "Month"])
+    pd.testing.assert_series_equal(current["Penalty (Rp)"], expected["Penalty (Rp)"], check_names=False)
+    assert current["Penalized Site-Months"].tolist() == expected["Penalized Site-Months"].tolist()
+
+    totals = scenario_totals(result).set_index("Scenario")
+    assert totals.loc["No penalty", "Penalty (Rp)"] == 0
+    assert totals.loc["Current", "vs Current (Rp)"] == 0
+    assert np.isclose(totals.loc["No penalty", "vs Current (Rp)"], -expected["Penalty (Rp)"].sum())
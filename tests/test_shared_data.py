@@ -0,0 +1,30 @@
+import pandas as pd
+
+from utils.shared_data import prepare_availability_vs_penalty
+
+
+def _penalty_rows():
+    return pd.DataFrame({
+        "Regional TI": ["Regional 1", "Regional 2", None],
+        "Site Id": ["S1", "S2", "S3"],
+        "Month": ["January", "February", "January"],
+        "Year": [2025, 2025, 2025],
+        "Availability": [99.5, 97.0, 98.0],
+        "Target Availability (%)": [99.0, 99.0, 99.0],
+    })
+
+
+def test_area_from_sites_majority():
+    sites = pd.DataFrame({"Site ID": ["S1", "S2"], "Area": ["Area 1", ""]})
+    df = prepare_availability_vs_penalty(_penalty_rows(), sites)
+    assert df["Area"].tolist()[:2] == ["Area 1", "Unmapped"]
+    assert pd.isna(df["Area"].iloc[2])
+    assert df["Status"].tolist() == ["Achieved", "Not Achieved", "Not Achieved"]
+    assert df["Month-Year"].tolist() == ["January-2025", "February-2025", "January-2025"]
+
+
+def test_empty_sites_marks_every_regional_unmapped():
+    for sites in (pd.DataFrame(), None, pd.DataFrame({"Site ID": ["X"], "Area": ["Area 9"]})):
+        df = prepare_availability_vs_penalty(_penalty_rows(), sites)
+        assert df["Area"].tolist()[:2] == ["Unmapped", "Unmapped"]
+        assert pd.isna(df["Area"].iloc[2])
@@ -0,0 +1,42 @@
+import pandas as pd
+
+from utils.site_search import SiteSearchIndex, get_site_search_index
+
+IDS = ["JKT001", "JKT002", "JKT010", "BDG001", "SBY100", "MDN007"]
+NAMES = ["Menara Sudirman", "Kuningan Tower", "Gatot Subroto", "Dago Atas", "Tunjungan Plaza", None]
+
+
+def test_prefix_matches_every_id_with_the_prefix():
+    index = SiteSearchIndex(IDS, NAMES)
+    for query in ["j", "JKT", "jkt0", "jkt01", "bdg", "s"]:
+        expected = {site for site in IDS if site.lower().startswith(query.lower())}
+        assert expected <= set(index.search(query))
+
+
+def test_ranking_and_matches():
+    index = SiteSearchIndex(IDS, NAMES)
+    # Exact ID first, then the other ID prefixes in ID order
+    assert index.search("JKT001")[0] == "JKT001"
+    assert index.search("jkt0")[:3] == ["JKT001", "JKT002", "JKT010"]
+    # Name prefix, on the first or a later word
+    assert index.search("kuningan")[0] == "JKT002"
+    assert index.search("tower")[0] == "JKT002"
+    # Typo in a name still finds the site
+    assert index.search("tunjungn plaza")[0] == "SBY100"
+    assert index.search("zzz") == []
+    assert index.search("  ") == []
+
+
+def test_allowed_and_limit():
+    index = SiteSearchIndex(IDS, NAMES)
+    assert index.search("jkt", allowed=["JKT002", "BDG001"]) == ["JKT002"]
+    assert index.search("jkt", limit=2) == ["JKT001", "JKT002"]
+
+
+def test_labels_and_names_from_lookup():
+    lookup = pd.DataFrame({"Site ID": [" JKT001 ", "MDN007", "MDN007"], "Site Name": ["Menara", "Medan", "Other"]})
+    index = get_site_search_index("test", "v1", ["JKT001", "JKT002", "MDN007"], lookup, "Site ID", "Site Name")
+    assert index.label("JKT001") == "JKT001 — Menara"
+    assert index.label("JKT002") == "JKT002"
+    assert index.label("MDN007") == "MDN007 — Medan"
+    assert index.search("medan") == ["MDN007"]
@@ -0,0 +1,64 @@
+import geopandas as gpd
+import pandas as pd
+from shapely.geometry import Point
+
+from utils import data_loader
+from utils.snapshot import SNAPSHOT_ENV, read_manifest, read_snapshot_dataset, write_snapshot
+
+
+def _datasets():
+    daily = pd.DataFrame({
+        "Date": pd.to_datetime(["2025-03-01", "2025-03-02"]),
+        "site_id": ["S1", "S2"],
+        "availability (%)": [99.5, 97.25],
+        "remark": ["ok", 3],  # mixed types, as Excel loads them
+    })
+    sites = gpd.GeoDataFrame(
+        {"Site ID": ["S1", "S2"], "lon": [106.8, 107.6], "lat": [-6.2, -6.9]},
+        geometry=[Point(106.8, -6.2), Point(107.6, -6.9)],
+        crs="EPSG:4326",
+    )
+    return {"daily": daily, "kml_sites": sites, "penalty": pd.DataFrame({2025: [1, 2], "Site Id": ["S1", "S2"]})}
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "bundle.zip")
+    datasets = _datasets()
+    manifest = write_snapshot(path, datasets)
+
+    assert {name: entry["rows"] for name, entry in manifest["datasets"].items()} == {"daily": 2, "kml_sites": 2, "penalty": 2}
+    assert read_manifest(path)["version"] == manifest["version"]
+
+    daily = read_snapshot_dataset("daily", path)
+    pd.testing.assert_frame_equal(daily[["Date", "site_id", "availability (%)"]], datasets["daily"][["Date", "site_id", "availability (%)"]])
+    assert daily["remark"].tolist() == ["ok", "3"]
+
+    sites = read_snapshot_dataset("kml_sites", path)
+    assert isinstance(sites, gpd.GeoDataFrame)
+    assert sites.geometry.x.tolist() == [106.8, 107.6] and sites.geometry.y.tolist() == [-6.2, -6.9]
+
+    # Column names are stored as strings
+    assert list(read_snapshot_dataset("penalty", path).columns) == ["2025", "Site Id"]
+
+
+def test_same_data_same_version(tmp_path):
+    first = write_snapshot(str(tmp_path / "a.zip"), _datasets())
+    second = write_snapshot(str(tmp_path / "b.zip"), _datasets())
+    assert first["version"] == second["version"]
+
+    changed = _datasets()
+    changed["daily"].loc[0, "availability (%)"] = 50.0
+    assert write_snapshot(str(tmp_path / "c.zip"), changed)["version"] != first["version"]
+
+
+def test_loaders_and_handles_read_the_bundle(tmp_path, monkeypatch):
+    path = str(tmp_path / "bundle.zip")
+    write_snapshot(path, _datasets())
+    monkeypatch.setenv(SNAPSHOT_ENV, path)
+
+    daily = data_loader.load_all_daily_files.__wrapped__()
+    assert daily["site_id"].tolist() == ["S1", "S2"]
+
+    handle = data_loader.dataset("penalty")
+    assert handle.exists() and handle.row_count() == 2 and handle.schema() == ["2025", "Site Id"]
+    assert not data_loader.dataset("availability_vs_penalty").exists()
@@ -0,0 +1,96 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+from utils.site_levels import (
+    HEX_SIZE_DEG,
+    SITE_CLASSES,
+    build_site_levels,
+    hex_center,
+    regional_centroids,
+    status_mask,
+)
+from utils.spatial_index import SpatialIndex, haversine_km, site_coordinates
+
+
+def _sites(n=600, seed=0):
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(-9, 4, n)
+    lon = rng.uniform(95, 120, n)
+    lat[::37] = np.nan  # sites without coordinates
+    df = pd.DataFrame({
+        "Site ID": [f"S{i:04d}" for i in range(n)],
+        "Latitude": lat,
+        "Longitude": lon,
+        "Regional": rng.choice(["Regional 1", "Regional 2", "Regional 3", None], n),
+        "Site Class": rng.choice(SITE_CLASSES + ["Unknown", None], n),
+        "Status": rng.choice(["On Service", "Cut Off", "on service", ""], n),
+    })
+    return gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(df["Longitude"].fillna(0), df["Latitude"].fillna(0)))
+
+
+def test_bbox_matches_scan():
+    gdf = _sites()
+    lat, lon = site_coordinates(gdf)
+    index = SpatialIndex(lat, lon)
+    for south, west, north, east in [(-2, 100, 1, 106), (-9, 95, 4, 120), (3.9, 119.9, 5, 121), (-90, -180, 90, 180)]:
+        expected = np.flatnonzero((lat >= south) & (lat <= north) & (lon >= west) & (lon <= east))
+        assert index.bbox(south, west, north, east).tolist() == expected.tolist()
+    assert len(index.bbox(1, 100, -1, 106)) == 0
+
+
+def test_within_and_nearest_match_scan():
+    gdf = _sites()
+    lat, lon = site_coordinates(gdf)
+    index = SpatialIndex(lat, lon)
+    valid = np.flatnonzero(np.isfinite(lat))
+    for origin in valid[:20]:
+        distances = haversine_km(lat[origin], lon[origin], lat[valid], lon[valid])
+        others = valid != origin
+
+        for radius in (25, 150, 800):
+            positions, got = index.within(lat[origin], lon[origin], radius, exclude=origin)
+            keep = others & (distances <= radius)
+            assert sorted(positions.tolist()) == sorted(valid[keep].tolist())
+            assert np.allclose(got, np.sort(distances[keep]))
+
+        positions, got = index.nearest(lat[origin], lon[origin], 5, exclude=origin)
+        assert np.allclose(got, np.sort(distances[others])[:5])
+
+
+def test_site_levels_match_grouping():
+    gdf = _sites()
+    levels = build_site_levels(gdf)
+    assert set(levels) == {"All", "On Service", "Cut Off"}
+
+    for status, level in levels.items():
+        mask = status_mask(gdf, status)
+        points = gdf[mask & gdf["Latitude"].notna().to_numpy()]
+        expected = points.dropna(subset=["Regional"]).groupby("Regional").agg(
+            lat=("Latitude", "mean"), lon=("Longitude", "mean"), Sites=("Latitude", "size")
+        )
+        got = level["regional"].set_index("Regional")
+        pd.testing.assert_frame_equal(got[["lat", "lon", "Sites"]], expected, check_names=False)
+
+        classes = points["Site Class"].where(points["Site Class"].isin(SITE_CLASSES), "Other")
+        for cls in SITE_CLASSES + ["Other"]:
+            assert level["hex"][cls].sum() == (classes == cls).sum()
+        assert level["hex"]["Sites"].sum() == len(points)
+
+
+def test_hex_bins_hold_their_nearest_sites():
+    gdf = _sites()
+    bins = build_site_levels(gdf)["All"]["hex"]
+    centers = np.column_stack(hex_center(bins["q"].to_numpy(), bins["r"].to_numpy(), HEX_SIZE_DEG))
+    counts = np.zeros(len(bins), dtype=int)
+    for lat, lon in gdf[["Latitude", "Longitude"]].dropna().to_numpy():
+        # In planar lon/lat, a point belongs to the hex whose center is nearest
+        nearest = np.argmin((centers[:, 0] - lat) ** 2 + (centers[:, 1] - lon) ** 2)
+        counts[nearest] += 1
+    assert counts.tolist() == bins["Sites"].tolist()
+
+
+def test_regional_centroids_empty():
+    gdf = _sites(n=10)
+    empty = regional_centroids(gdf, np.zeros(len(gdf), dtype=bool))
+    assert empty.empty and "Regional" in empty.columns
@@ -0,0 +1,293 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.cubes import day_fingerprints
+
+# --- Fleet-wide site ranking ---
+# metric -> (column in the totals frame, True when a higher value is worse)
+RANKING_METRICS = {
+    "Availability (%)": ("availability_avg", False),
+    "Outage 2G (Hr)": ("outage_2g_total", True),
+    "Outage 4G (Hr)": ("outage_4g_total", True),
+    "Occurrence": ("occurrence_total", True),
+    "Days Below Target": ("days_below_target", True),
+}
+
+
+def site_totals(df: pd.DataFrame, start_date, end_date, rows=None) -> pd.DataFrame:
+    """Per-site totals over a date window, for every site in one grouped pass.
+
+    ``rows`` optionally restricts the frame to iloc positions (e.g. from the
+    hierarchy index) before the window is applied.
+    """
+    if rows is not None:
+        df = df.iloc[rows]
+    window = df[(df["Date"] >= pd.Timestamp(start_date)) & (df["Date"] <= pd.Timestamp(end_date))]
+    if window.empty:
+        return pd.DataFrame()
+
+    frame = pd.DataFrame({
+        "site_id": window["site_id"],
+        "availability": window["availability (%)"],
+        "outage_2g": window["outage_2g (Hour)"],
+        "outage_4g": window["outage_4g (Hour)"],
+        "occurrence": window["occurrence"],
+        "below_target": window["Achievement"].eq("Not Achieved").astype(int),
+    })
+    totals = frame.groupby("site_id", sort=False).agg(
+        availability_avg=("availability", "mean"),
+        outage_2g_total=("outage_2g", "sum"),
+        outage_4g_total=("outage_4g", "sum"),
+        occurrence_total=("occurrence", "sum"),
+        days_below_target=("below_target", "sum"),
+        days=("availability", "size"),
+    )
+
+    # Site attributes from each site's first row in the window
+    first = window.drop_duplicates("site_id").set_index("site_id")
+    for col in ["area", "regional", "site_class"]:
+        if col in first.columns:
+            totals[col] = first[col].reindex(totals.index)
+    return totals.reset_index()
+
+
+def rank_sites(totals: pd.DataFrame, metric: str, n: int = 10, worst: bool = True) -> pd.DataFrame:
+    """Top/bottom ``n`` sites of a totals frame by one ranking metric."""
+    if totals.empty:
+        return totals
+    column, higher_is_worse = RANKING_METRICS[metric]
+    largest = higher_is_worse == worst
+    ranked = totals.nlargest(n, column) if largest else totals.nsmallest(n, column)
+    ranked = ranked.reset_index(drop=True)
+    ranked.insert(0, "Rank", np.arange(1, len(ranked) + 1))
+    return ranked
+
+
+# --- Rolling 7/30-day metrics per site (running sums, appended days only) ---
+ROLLING_WINDOWS = {"7d": 7, "30d": 30}
+NUMERIC_ROLLING_SOURCES = ["availability (%)", "outage_2g (Hour)", "outage_4g (Hour)"]
+RUNNING_SUMS = ["avail_sum", "avail_days", "outage_2g_sum", "outage_4g_sum"]
+ROLLING_COLUMNS = [
+    f"{metric}_{label}" for label in ROLLING_WINDOWS for metric in ("availability", "outage_2g", "outage_4g")
+]
+
+
+def _site_day_sums(df: pd.DataFrame) -> pd.DataFrame:
+    """One row per site-day with the values the running sums add up."""
+    frame = pd.DataFrame({
+        "site_id": df["site_id"],
+        "Date": df["Date"],
+        "avail_sum": df["availability (%)"].fillna(0),
+        "avail_days": df["availability (%)"].notna().astype(int),
+        "outage_2g_sum": df["outage_2g (Hour)"].fillna(0),
+        "outage_4g_sum": df["outage_4g (Hour)"].fillna(0),
+    })
+    return frame.groupby(["site_id", "Date"], sort=True).sum().reset_index()
+
+
+def extend_running_sums(running: pd.DataFrame, new_rows: pd.DataFrame) -> pd.DataFrame:
+    """Append days to the per-site running sums and fill their rolling windows.
+
+    ``new_rows`` must only hold days after each site's last day in ``running``;
+    existing rows (and their window values) are left as they are.
+    """
+    days = _site_day_sums(new_rows)
+    base = running.groupby("site_id")[RUNNING_SUMS].last() if not running.empty else None
+
+    cums = days.groupby("site_id")[RUNNING_SUMS].cumsum()
+    if base is not None:
+        cums += base.reindex(days["site_id"]).fillna(0).to_numpy()
+    appended = pd.concat([days[["site_id", "Date"]], cums], axis=1)
+
+    history = appended if running.empty else pd.concat(
+        [running[["site_id", "Date"] + RUNNING_SUMS], appended], ignore_index=True
+    )
+    history = history.sort_values("Date", kind="stable")
+    for label, length in ROLLING_WINDOWS.items():
+        # Running sums as of the day before the window starts (0 when the site has no earlier day)
+        before = pd.merge_asof(
+            appended[["site_id", "Date"]].assign(window_start=appended["Date"] - pd.Timedelta(days=length))
+            .reset_index().sort_values("window_start"),
+            history.rename(columns={"Date": "window_start"}),
+            on="window_start", by="site_id", direction="backward",
+        ).set_index("index").sort_index()[RUNNING_SUMS].fillna(0)
+
+        window = appended[RUNNING_SUMS] - before
+        appended[f"availability_{label}"] = window["avail_sum"] / window["avail_days"].where(window["avail_days"] > 0)
+        appended[f"outage_2g_{label}"] = window["outage_2g_sum"]
+        appended[f"outage_4g_{label}"] = window["outage_4g_sum"]
+
+    combined = pd.concat([running, appended], ignore_index=True) if not running.empty else appended
+    return combined.sort_values(["site_id", "Date"]).reset_index(drop=True)
+
+
+@st.cache_resource
+def _rolling_state():
+    # Running sums of the last prepared daily data, kept across refreshes
+    return {"lock": threading.Lock(), "running": None, "fingerprints": None}
+
+
+def rolling_metrics(df: pd.DataFrame) -> pd.DataFrame:
+    """Rolling 7/30-day availability and outage totals per site-day.
+
+    When a refresh only appends days after the last known one, only those
+    days are summed; a change to an earlier day rebuilds the running sums.
+    """
+    state = _rolling_state()
+    with state["lock"]:
+        fingerprints = day_fingerprints(df[["site_id", "Date"] + NUMERIC_ROLLING_SOURCES])
+        previous, running = state["fingerprints"], state["running"]
+
+        append_only = False
+        if previous is not None and running is not None:
+            changed = fingerprints.index[~fingerprints.eq(previous.reindex(fingerprints.index))]
+            removed = previous.index.difference(fingerprints.index)
+            append_only = removed.empty and (changed.empty or changed.min() > previous.index.max())
+
+        if append_only:
+            new_rows = df[df["Date"].isin(changed)]
+            if not new_rows.empty:
+                running = extend_running_sums(running, new_rows)
+        else:
+            running = extend_running_sums(pd.DataFrame(columns=["site_id", "Date"] + RUNNING_SUMS), df)
+
+        state["running"], state["fingerprints"] = running, fingerprints
+        return running
+
+
+def add_rolling_metrics(df: pd.DataFrame) -> pd.DataFrame:
+    """Daily frame with the rolling columns joined on (site_id, Date)."""
+    if df.empty:
+        return df
+    running = rolling_metrics(df)
+    return df.merge(running[["site_id", "Date"] + ROLLING_COLUMNS], on=["site_id", "Date"], how="left")
+
+
+# --- Outage anomaly detection (robust z-score against each site's own history) ---
+# metric column -> smallest excess over the site's median worth flagging
+ANOMALY_METRICS = {"occurrence": 3, "outage_2g (Hour)": 2.0, "outage_4g (Hour)": 2.0}
+ANOMALY_Z_THRESHOLD = 3.5
+
+
+def detect_anomalies(df: pd.DataFrame, z_threshold=ANOMALY_Z_THRESHOLD) -> pd.DataFrame:
+    """Site-days whose outage metrics sit far above that site's baseline.
+
+    Baseline is the site's median over its whole history and the scale its
+    MAD (1.4826 * MAD, or 1.2533 * mean absolute deviation when most days are
+    identical, e.g. zero outage). One grouped pass per metric, no per-site loop.
+    """
+    if df.empty:
+        return pd.DataFrame()
+
+    sites = df["site_id"].to_numpy()
+    flagged = []
+    for col, min_excess in ANOMALY_METRICS.items():
+        values = df[col]
+        median = values.groupby(sites).transform("median")
+        deviation = (values - median).abs()
+        mad = deviation.groupby(sites).transform("median") * 1.4826
+        mean_ad = deviation.groupby(sites).transform("mean") * 1.2533
+        scale = mad.where(mad > 0, mean_ad).where(lambda x: x > 0)
+
+        score = (values - median) / scale
+        hit = (score > z_threshold) & ((values - median) >= min_excess)
+        if hit.any():
+            rows = df.loc[hit, ["Date", "area", "regional", "site_id"]].copy()
+            rows["metric"] = col
+            rows["value"] = values[hit]
+            rows["baseline"] = median[hit]
+            rows["score"] = score[hit].round(2)
+            flagged.append(rows)
+
+    if not flagged:
+        return pd.DataFrame(columns=["Date", "area", "regional", "site_id", "metric", "value", "baseline", "score"])
+    return pd.concat(flagged, ignore_index=True).sort_values(["Date", "score"], ascending=[False, False]).reset_index(drop=True)
+
+
+@st.cache_resource(max_entries=2, show_spinner="Scanning outages for anomalies...")
+def get_anomalies(name, version, _df) -> pd.DataFrame:
+    """Flagged site-days of a shared daily frame, computed once per data version."""
+    return detect_anomalies(_df)
+
+
+# --- Availability recomputed from outage hours (checked at ingest) ---
+PERIOD_HOURS = 24  # one daily row
+# Allowed gap between reported and recomputed availability, in percentage points
+AVAILABILITY_TOLERANCE = float(os.environ.get("DASHBOARD_AVAILABILITY_TOLERANCE", 0.5))
+OUTAGE_COLUMNS = {"2g": "outage_2g (Hour)", "4g": "outage_4g (Hour)"}
+
+
+def recompute_availability(df: pd.DataFrame, period_hours=PERIOD_HOURS, basis="max") -> pd.Series:
+    """Availability (%) from outage hours over the period.
+
+    ``basis`` picks the outage that counts as downtime: "2g", "4g", or "max"
+    (the site is down while either technology is down).
+    """
+    if basis == "max":
+        outage = df[list(OUTAGE_COLUMNS.values())].max(axis=1)
+    else:
+        outage = df[OUTAGE_COLUMNS[basis]]
+    return (1 - outage.clip(0, period_hours) / period_hours) * 100
+
+
+def normalize_availability_scale(df: pd.DataFrame) -> pd.DataFrame:
+    """Rescale ``availability (%)`` of files exported as a 0-1 ratio to 0-100.
+
+    The scale is decided per source file, so one ratio file among percent
+    files is rescaled on its own and every reader sees percentages.
+    """
+    if df.empty:
+        return df
+    reported = df["availability (%)"]
+    source = df["source_file"].fillna("unknown") if "source_file" in df.columns else pd.Series("unknown", index=df.index)
+    ratio_scale = reported.groupby(source).transform("max") <= 1.5
+    df["availability (%)"] = reported.where(~ratio_scale, reported * 100)
+    return df
+
+
+def add_availability_check(df: pd.DataFrame, tolerance=AVAILABILITY_TOLERANCE) -> pd.DataFrame:
+    """Add recomputed availability, its gap to the reported value and a mismatch flag.
+
+    ``availability (%)`` is expected on the 0-100 scale (``normalize_availability_scale``).
+    """
+    if df.empty:
+        return df
+    reported = df["availability (%)"]
+    df["availability_recomputed"] = recompute_availability(df)
+    df["availability_gap"] = (reported - df["availability_recomputed"]).abs()
+    df["availability_mismatch"] = df["availability_gap"] > tolerance
+    return df
+
+
+def availability_validation_summary(df: pd.DataFrame) -> pd.DataFrame:
+    """Per source file: rows, missing availability, mismatches and gap stats."""
+    if df.empty or "availability_gap" not in df.columns:
+        return pd.DataFrame()
+    source = df["source_file"].fillna("unknown") if "source_file" in df.columns else pd.Series("unknown", index=df.index)
+    summary = pd.DataFrame({
+        "source_file": source,
+        "missing": df["availability (%)"].isna(),
+        "mismatch": df["availability_mismatch"],
+        "gap": df["availability_gap"],
+        "Date": df["Date"],
+    }).groupby("source_file").agg(
+        rows=("mismatch", "size"),
+        first_date=("Date", "min"),
+        last_date=("Date", "max"),
+        missing=("missing", "sum"),
+        mismatches=("mismatch", "sum"),
+        mean_gap=("gap", "mean"),
+        max_gap=("gap", "max"),
+    ).reset_index()
+    summary["mismatch_pct"] = (summary["mismatches"] / summary["rows"] * 100).round(2)
+    return summary.sort_values("mismatches", ascending=False).reset_index(drop=True)
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def get_validation_summary(name, version, _df) -> pd.DataFrame:
+    """Validation summary of a shared daily frame, built once per data version."""
+    return availability_validation_summary(_df)
@@ -0,0 +1,102 @@
+import os
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+
+# --- Config (environment) ---
+# Points kept per chart; roughly the pixel width of a wide chart
+MAX_POINTS = int(os.environ.get("DASHBOARD_CHART_MAX_POINTS", 2000))
+# Scatter traces with at least this many points are drawn with WebGL instead of SVG
+WEBGL_THRESHOLD = int(os.environ.get("DASHBOARD_WEBGL_THRESHOLD", 1000))
+# Show the payload size under every chart
+SHOW_CHART_STATS = os.environ.get("DASHBOARD_CHART_STATS", "") not in ("", "0")
+
+
+def _as_numeric_x(x):
+    x = pd.Series(x)
+    if pd.api.types.is_datetime64_any_dtype(x):
+        return x.astype("int64").to_numpy(dtype=float)
+    if pd.api.types.is_numeric_dtype(x):
+        return x.to_numpy(dtype=float)
+    # Category / string axis (weeks, month labels): points are evenly spaced
+    return np.arange(len(x), dtype=float)
+
+
+def lttb_indices(x, y, n_out):
+    """Largest-Triangle-Three-Buckets: positions of ``n_out`` points that keep the series' shape."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.nan_to_num(np.asarray(y, dtype=float))
+    bucket = (n - 2) / (n_out - 2)
+
+    selected = np.empty(n_out, dtype=np.intp)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start = int(i * bucket) + 1
+        end = int((i + 1) * bucket) + 1
+        next_end = min(int((i + 2) * bucket) + 1, n)
+
+        # Average of the next bucket is the third triangle vertex
+        if end < next_end:
+            avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def downsample_frame(df: pd.DataFrame, x_col, y_cols, max_points=MAX_POINTS) -> pd.DataFrame:
+    """Rows of ``df`` (sorted by ``x_col``) reduced to about ``max_points``.
+
+    Each y column gets its share of the budget via LTTB and the union of the
+    selected rows is kept, so every plotted series keeps its peaks and dips.
+    """
+    if len(df) <= max_points:
+        return df
+
+    x = _as_numeric_x(df[x_col])
+    budget = max(max_points // max(len(y_cols), 1), 3)
+    keep = np.unique(np.concatenate([lttb_indices(x, df[col].to_numpy(), budget) for col in y_cols]))
+    return df.iloc[keep]
+
+
+def scatter(x, y, **kwargs):
+    """``go.Scatter``, or ``go.Scattergl`` once the series is large enough for SVG to lag."""
+    if len(x) < WEBGL_THRESHOLD:
+        return go.Scatter(x=x, y=y, **kwargs)
+
+    line = kwargs.get("line")
+    if isinstance(line, dict) and line.get("shape") == "spline":
+        kwargs["line"] = {**line, "shape": "linear"}  # WebGL has no spline
+    return go.Scattergl(x=x, y=y, **kwargs)
+
+
+def chart_payload(fig) -> dict:
+    points = sum(len(trace.x) for trace in fig.data if trace.x is not None)
+    webgl = sum(1 for trace in fig.data if trace.type == "scattergl")
+    return {"points": points, "webgl_traces": webgl, "bytes": len(fig.to_json())}
+
+
+def show_chart(fig, name, rows=None, source_rows=None):
+    """``st.plotly_chart``; with SHOW_CHART_STATS, plus a payload report (points sent, JSON size, downsampling)."""
+    st.plotly_chart(fig, use_container_width=True)
+    if not SHOW_CHART_STATS:
+        return None
+
+    stats = chart_payload(fig)
+    reduced = f" ({rows:,} of {source_rows:,} rows)" if rows is not None and source_rows and rows < source_rows else ""
+    report = (
+        f"{stats['points']:,} points{reduced} · {stats['bytes'] / 1024:,.1f} KB"
+        f"{' · WebGL' if stats['webgl_traces'] else ''}"
+    )
+    st.caption(f"📦 Chart payload ({name}): {report}")
+    return stats
@@ -0,0 +1,150 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# --- Daily achievement cube: day x area x regional x site class ---
+DAILY_CUBE_KEYS = ["Date", "area", "regional", "site_class"]
+DAILY_CUBE_MEASURES = ["achieved", "not_achieved", "sites", "avail_sum", "avail_count", "avail_min", "avail_max"]
+
+
+def day_fingerprints(df: pd.DataFrame) -> pd.Series:
+    """Order-independent content hash per Date, to find days that are new or changed."""
+    try:
+        hashed = pd.util.hash_pandas_object(df, index=False)
+    except TypeError:
+        hashed = pd.util.hash_pandas_object(df.astype(str), index=False)
+    # 44-bit slices so a per-day sum cannot overflow
+    return pd.Series((hashed.to_numpy() >> np.uint64(20)).astype(np.int64)).groupby(df["Date"].to_numpy()).sum()
+
+
+def build_daily_cube(df: pd.DataFrame) -> pd.DataFrame:
+    """Aggregate daily rows into cube cells (counts plus mergeable availability stats)."""
+    if df.empty:
+        return pd.DataFrame(columns=DAILY_CUBE_KEYS + DAILY_CUBE_MEASURES)
+
+    achievement = df["Achievement"]
+    frame = pd.DataFrame({
+        "Date": df["Date"],
+        "area": df["area"],
+        "regional": df["regional"],
+        "site_class": df["site_class"] if "site_class" in df.columns else "Unknown",
+        "achieved": achievement.eq("Achieved").astype(int),
+        "not_achieved": achievement.eq("Not Achieved").astype(int),
+        "avail": df["availability (%)"],
+    })
+    return (
+        frame.groupby(DAILY_CUBE_KEYS, dropna=False, sort=False)
+        .agg(
+            achieved=("achieved", "sum"),
+            not_achieved=("not_achieved", "sum"),
+            sites=("avail", "size"),
+            avail_sum=("avail", "sum"),
+            avail_count=("avail", "count"),
+            avail_min=("avail", "min"),
+            avail_max=("avail", "max"),
+        )
+        .reset_index()
+    )
+
+
+@st.cache_resource
+def _daily_cube_state():
+    # Survives data refreshes: the previous cube and per-day fingerprints it was built from
+    return {"lock": threading.Lock(), "cube": None, "fingerprints": None}
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def get_daily_cube(name, version, _df) -> pd.DataFrame:
+    """Daily achievement cube for a shared daily frame.
+
+    Only days that are new or whose rows changed since the previous data
+    version are re-aggregated; cells of unchanged days are carried over.
+    """
+    state = _daily_cube_state()
+    with state["lock"]:
+        fingerprints = day_fingerprints(_df) if not _df.empty else pd.Series(dtype="int64")
+        previous = state["fingerprints"]
+
+        if state["cube"] is None or previous is None:
+            changed_days = fingerprints.index
+            kept = build_daily_cube(_df.iloc[:0])
+        else:
+            unchanged = fingerprints.eq(previous.reindex(fingerprints.index))
+            changed_days = fingerprints.index[~unchanged]
+            kept = state["cube"][state["cube"]["Date"].isin(fingerprints.index[unchanged])]
+
+        fresh = build_daily_cube(_df[_df["Date"].isin(changed_days)]) if len(changed_days) else kept.iloc[:0]
+        parts = [part for part in (kept, fresh) if not part.empty]
+        cube = pd.concat(parts, ignore_index=True) if parts else fresh
+        cube = cube.sort_values("Date", kind="stable").reset_index(drop=True)
+
+        state["cube"] = cube
+        state["fingerprints"] = fingerprints
+        return cube
+
+
+def daily_achievement_trend(cube, start_date, end_date, area="All", regional="All") -> pd.DataFrame:
+    """Achieved / Not Achieved site counts per day from the cube (index: Date)."""
+    mask = (cube["Date"] >= pd.Timestamp(start_date)) & (cube["Date"] <= pd.Timestamp(end_date))
+    if area != "All":
+        mask &= cube["area"] == area
+    if regional != "All":
+        mask &= cube["regional"] == regional
+
+    trend = cube.loc[mask].groupby("Date")[["achieved", "not_achieved"]].sum()
+    trend = trend[(trend["achieved"] + trend["not_achieved"]) > 0]
+    return trend.rename(columns={"achieved": "Achieved", "not_achieved": "Not Achieved"}).sort_index()
+
+
+# --- Penalty trend cube: month x area x regional x site ---
+PENALTY_CUBE_KEYS = ["Year", "Month_Num", "Month-Year", "Area", "Regional TI", "Site Id"]
+PENALTY_MEAN_COLUMNS = ["Availability", "Target Availability (%)", "Persentase Penalty"]
+
+
+def build_penalty_cube(df: pd.DataFrame, keys=PENALTY_CUBE_KEYS) -> pd.DataFrame:
+    """Mergeable penalty measures per cube cell: sums and counts for means, penalty sum, status counts."""
+    keys = [key for key in keys if key in df.columns]
+    frame = pd.DataFrame({key: df[key] for key in keys})
+    for col in PENALTY_MEAN_COLUMNS:
+        values = pd.to_numeric(df[col], errors="coerce")
+        frame[f"{col}_sum"] = values
+        frame[f"{col}_count"] = values.notna().astype(int)
+    frame["Nilai Penalty"] = pd.to_numeric(df["Nilai Penalty"], errors="coerce")
+    frame["Achieved"] = df["Status"].eq("Achieved").astype(int)
+    frame["Not Achieved"] = df["Status"].eq("Not Achieved").astype(int)
+    return frame.groupby(keys, dropna=False, sort=False).sum(min_count=0).reset_index()
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def get_penalty_cube(name, version, _df) -> dict:
+    """Site-level penalty cube plus its month x area x regional rollup, built once per data version."""
+    site_cube = build_penalty_cube(_df)
+    measures = [col for col in site_cube.columns if col not in PENALTY_CUBE_KEYS]
+    rollup_keys = [key for key in PENALTY_CUBE_KEYS if key != "Site Id" and key in site_cube.columns]
+    regional_cube = site_cube.groupby(rollup_keys, dropna=False, sort=False)[measures].sum().reset_index()
+    return {"site": site_cube, "regional": regional_cube}
+
+
+def penalty_trend(cubes, area="All", regional="All", site="All"):
+    """Per Month-Year (in calendar order): mean availability / target / penalty %, penalty sum, status counts.
+
+    Same values as grouping the filtered rows by Month-Year; returns (agg_df, status_counts).
+    """
+    cube = cubes["regional"] if site == "All" else cubes["site"]
+    mask = pd.Series(True, index=cube.index)
+    if area != "All":
+        mask &= cube["Area"] == area
+    if regional != "All":
+        mask &= cube["Regional TI"] == regional
+    if site != "All":
+        mask &= cube["Site Id"] == site
+    cells = cube.loc[mask].sort_values(["Year", "Month_Num"])
+
+    months = cells.groupby("Month-Year", sort=False, dropna=False)
+    sums = months[[col for col in cells.columns if col.endswith(("_sum", "_count"))] + ["Nilai Penalty", "Achieved", "Not Achieved"]].sum()
+    agg_df = pd.DataFrame({col: sums[f"{col}_sum"] / sums[f"{col}_count"].replace(0, np.nan) for col in PENALTY_MEAN_COLUMNS})
+    agg_df["Nilai Penalty"] = sums["Nilai Penalty"]
+    status_counts = sums[["Achieved", "Not Achieved"]]
+    return agg_df, status_counts
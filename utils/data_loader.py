@@ -13,9 +13,14 @@ import os
 import tempfile
 import toml
 import yaml 
+from utils.snapshot import snapshot_path, read_snapshot_dataset, read_manifest
+from utils.prefetch import prefetchable
 
 
 def get_drive():
+    # Offline snapshot mode: no Drive connection (and no credentials) needed
+    if snapshot_path():
+        return None
     # Automatically switch based on what's available in secrets
     if "google_service_account" in st.secrets:
         return get_drive_service()
@@ -111,7 +116,11 @@ def read_excel_from_drive(drive, file_id, use_multi_header=False):
 
 # --- Load all daily Excel files from Drive ---
 @st.cache_data(ttl=3600)
+@prefetchable
 def load_all_daily_files():
+    if snapshot_path():
+        return read_snapshot_dataset("daily")
+
     files = list_files_in_folder(drive, FOLDER_ID)
     
     # Filter only files starting with 'daily'
@@ -128,6 +137,7 @@ def load_all_daily_files():
     for f in daily_files:
         try:
             df = read_excel_from_drive(drive, f['id'])
+            df["source_file"] = f['title']  # per-file validation summary at ingest
             df_all.append(df)
         except Exception as e:
             print(f"[ERROR] Failed to read file {f['title']}: {e}")
@@ -165,7 +175,11 @@ def parse_description(desc):
     return fields
 
 @st.cache_data(ttl=3600)
+@prefetchable
 def load_kml_file(_drive, filename="site_sewa_daya_2026.kml"):
+    if snapshot_path():
+        return read_snapshot_dataset("kml_sites")
+
     file = next((f for f in list_files_in_folder(_drive, FOLDER_ID) if f['title'].lower() == filename.lower()), None)
     if not file:
         st.warning("KML file not found.")
@@ -220,7 +234,11 @@ def load_kml_file(_drive, filename="site_sewa_daya_2026.kml"):
         return gpd.GeoDataFrame()
     
 @st.cache_data(ttl=3600)
+@prefetchable
 def load_all_weekly_files():
+    if snapshot_path():
+        return read_snapshot_dataset("weekly")
+
     files = list_files_in_folder(drive, FOLDER_ID)
     
     # Filter only files starting with 'weekly'
@@ -248,10 +266,17 @@ def load_all_weekly_files():
 
 def find_excel_files(drive, prefix=""):
     file_list = drive.ListFile({'q': f"title contains '{prefix}' and trashed=false"}).GetList()
-    return [{'id': file['id'], 'title': file['title']} for file in file_list if file['title'].endswith('.xlsx')]
+    return [
+        {'id': file['id'], 'title': file['title'], 'modified': file.get('modifiedDate')}
+        for file in file_list if file['title'].endswith('.xlsx')
+    ]
 
 @st.cache_data(ttl=3600)
+@prefetchable
 def load_penalty_data():
+    if snapshot_path():
+        return read_snapshot_dataset("penalty")
+
     drive = get_drive()
     penalty_files = find_excel_files(drive, prefix="penalty")
 
@@ -263,9 +288,13 @@ def load_penalty_data():
         except Exception as e:
             st.warning(f"❌ Failed to read {file['title']}: {e}")
 
-    return pd.concat(df_list, ignore_index=True) if df_list else pd.DataFrame()
+    df = pd.concat(df_list, ignore_index=True) if df_list else pd.DataFrame()
+    record_dataset("penalty", penalty_files, df)
+    return df
 
 def upload_file_to_drive(file_obj, folder_id, filename):
+    if snapshot_path():
+        raise RuntimeError("Running from an offline snapshot: uploads to Google Drive are disabled.")
     drive = get_drive_oauth()
 
     # Search for existing file with the same name in the folder
@@ -293,6 +322,8 @@ def upload_file_to_drive(file_obj, folder_id, filename):
     return file["id"]
 
 def download_file_from_drive(drive, filename, folder_id):
+    if snapshot_path():
+        raise RuntimeError(f"Running from an offline snapshot: {filename} cannot be downloaded from Google Drive.")
     file_list = drive.ListFile({'q': f"'{folder_id}' in parents and trashed=false"}).GetList()
     for f in file_list:
         if f['title'] == filename:
@@ -302,9 +333,10 @@ def download_file_from_drive(drive, filename, folder_id):
                 return local_path
     raise FileNotFoundError(f"{filename} not found in Google Drive folder.")
 
-def load_bbm_tracker_data(drive, site_file, bbm_file, folder_id):
-    import pandas as pd
-    from datetime import datetime
+def read_bbm_sources(drive, site_file, bbm_file, folder_id):
+    """Raw site metadata and BBM refill log (Drive, or the offline snapshot)."""
+    if snapshot_path():
+        return read_snapshot_dataset("bbm_sites"), read_snapshot_dataset("bbm_refills")
 
     # Load site metadata
     site_path = download_file_from_drive(drive, site_file, folder_id)
@@ -313,6 +345,13 @@ def load_bbm_tracker_data(drive, site_file, bbm_file, folder_id):
     # Load BBM refill log
     bbm_path = download_file_from_drive(drive, bbm_file, folder_id)
     df_bbm = pd.read_excel(bbm_path)
+    return df_site, df_bbm
+
+def load_bbm_tracker_data(drive, site_file, bbm_file, folder_id):
+    import pandas as pd
+    from datetime import datetime
+
+    df_site, df_bbm = read_bbm_sources(drive, site_file, bbm_file, folder_id)
 
     # Merge on site_id
     df = pd.merge(df_bbm, df_site, on="site_id", how="left")
@@ -353,10 +392,19 @@ def load_bbm_tracker_data(drive, site_file, bbm_file, folder_id):
 
     return df
 
+def first_file(files):
+    """The listed workbooks load_availability_vs_penalty_data reads: only the first."""
+    return files[:1]
+
 @st.cache_data(ttl=3600)
+@prefetchable
 def load_availability_vs_penalty_data():
+    if snapshot_path():
+        return read_snapshot_dataset("availability_vs_penalty")
+
     drive = get_drive()
-    files = find_excel_files(drive, prefix="availability_vs_penalty")
+    # Only the first matching workbook is read (and recorded in the manifest)
+    files = first_file(find_excel_files(drive, prefix="availability_vs_penalty"))
     
     if not files:
         st.warning("No availability_vs_penalty files found in Google Drive.")
@@ -421,6 +469,94 @@ def load_availability_vs_penalty_data():
         return pd.DataFrame()
 
     combined_df = pd.concat(dfs, ignore_index=True)
+    record_dataset("availability_vs_penalty", files, combined_df)
     return combined_df
 
 
+# --- Lazy dataset handles: existence / size / schema without parsing rows ---
+@st.cache_data(ttl=3600)
+def list_dataset_files(prefix):
+    """Drive metadata of a dataset's workbooks (same match as find_excel_files); nothing is downloaded."""
+    drive = get_drive()
+    file_list = drive.ListFile({'q': f"title contains '{prefix}' and trashed=false"}).GetList()
+    return [
+        {'id': f['id'], 'title': f['title'], 'modified': f.get('modifiedDate'), 'size': f.get('fileSize')}
+        for f in file_list if f['title'].endswith('.xlsx')
+    ]
+
+
+@st.cache_resource
+def _dataset_manifest():
+    # Process-wide: rows / columns of each dataset loaded so far, with the file signature they came from
+    return {}
+
+
+def _file_signature(files):
+    return tuple(sorted((f['id'], f['modified']) for f in files))
+
+
+def record_dataset(name, files, df):
+    """Remember a live load's size and columns, for DatasetHandle.row_count() / schema()."""
+    _dataset_manifest()[name] = {
+        "signature": _file_signature(files), "rows": len(df), "columns": [str(c) for c in df.columns],
+    }
+
+
+class DatasetHandle:
+    """Lazy reference to a dataset; rows are only parsed by ``load()``.
+
+    ``exists()``, ``row_count()`` and ``schema()`` come from the snapshot
+    manifest offline, or from Drive file metadata plus the manifest the
+    dataset's loader recorded at its last Drive read (whoever called it:
+    a page, the shared frames or the warmup thread). ``row_count()`` /
+    ``schema()`` return None while unknown.
+    """
+
+    def __init__(self, name, loader, prefix, read_files=list):
+        self.name = name
+        self.loader = loader
+        self.prefix = prefix
+        self.read_files = read_files  # listed files -> the ones the loader reads
+
+    def _files(self):
+        return list_dataset_files(self.prefix)
+
+    def _signature(self):
+        # Only the files the loader reads: a change to any other match leaves the data as it was
+        return _file_signature(self.read_files(self._files()))
+
+    def _stats(self):
+        if snapshot_path():
+            return read_manifest(snapshot_path())["datasets"].get(self.name)
+        entry = _dataset_manifest().get(self.name)
+        return entry if entry and entry["signature"] == self._signature() else None
+
+    def exists(self) -> bool:
+        if snapshot_path():
+            return self.name in read_manifest(snapshot_path())["datasets"]
+        return bool(self._files())
+
+    def row_count(self):
+        stats = self._stats()
+        return stats["rows"] if stats else None
+
+    def schema(self):
+        stats = self._stats()
+        return list(stats["columns"]) if stats else None
+
+    def load(self) -> pd.DataFrame:
+        # The loader records its rows / columns in the manifest when it reads Drive
+        return self.loader()
+
+
+# name -> (loader, Drive title prefix, listed files -> files the loader reads)
+DATASET_SOURCES = {
+    "penalty": (load_penalty_data, "penalty", list),
+    "availability_vs_penalty": (load_availability_vs_penalty_data, "availability_vs_penalty", first_file),
+}
+
+
+def dataset(name) -> DatasetHandle:
+    loader, prefix, read_files = DATASET_SOURCES[name]
+    return DatasetHandle(name, loader, prefix, read_files)
+
@@ -7,9 +7,14 @@ from io import BytesIO
 import streamlit as st
 from pydrive2.auth import GoogleAuth
 from pydrive2.drive import GoogleDrive
+from utils.snapshot import snapshot_path, read_snapshot_dataset
+from utils.prefetch import prefetchable
 
 @st.cache_resource
 def get_drive():
+    # Offline snapshot mode: no Drive connection (and no credentials) needed
+    if snapshot_path():
+        return None
     if "google_service_account" in st.secrets:
         return get_drive_service()
     elif "google_oauth" in st.secrets and "STREAMLIT_SERVER_HEADLESS" not in os.environ:
@@ -66,8 +71,16 @@ oauth_scope:
 
 # === Google Drive File Utilities ===
 
+def snapshot_excel_name(filename):
+    """Snapshot dataset name of a workbook read through read_excel_from_drive."""
+    return f"drive_excel/{filename}"
+
 @st.cache_data(show_spinner="📥 Loading Excel from Drive...", ttl=3600)
+@prefetchable
 def read_excel_from_drive(folder_id, filename):
+    if snapshot_path():
+        return read_snapshot_dataset(snapshot_excel_name(filename))
+
     drive = get_drive()
     file_id = get_file_id_from_name(drive, folder_id, filename)
     file = drive.CreateFile({'id': file_id})
@@ -77,6 +90,8 @@ def read_excel_from_drive(folder_id, filename):
     return df
 
 def upload_file_to_drive(file_obj, folder_id, filename):
+    if snapshot_path():
+        raise RuntimeError("Running from an offline snapshot: uploads to Google Drive are disabled.")
     drive = get_drive()
     file_list = drive.ListFile({
         "q": f"'{folder_id}' in parents and title = '{filename}' and trashed=false"
@@ -101,6 +116,8 @@ def upload_file_to_drive(file_obj, folder_id, filename):
     return file["id"]
 
 def download_file_from_drive(drive, filename, folder_id):
+    if snapshot_path():
+        raise RuntimeError(f"Running from an offline snapshot: {filename} cannot be downloaded from Google Drive.")
     file_list = drive.ListFile({'q': f"'{folder_id}' in parents and trashed=false"}).GetList()
     for f in file_list:
         if f['title'] == filename:
@@ -124,12 +141,14 @@ def get_file_id_from_name(drive, folder_id, filename):
 
     return file_list[0]["id"]
 
-@st.cache_data(show_spinner="📊 Processing Kurva S data...", ttl=3600)
-def load_kurva_s(folder_id, 
-                 plan_filename="Report_MS_TDE.xlsx", 
-                 plan_sheet="Kurva S",
-                 actual_filename="activity_tracker_tde.xlsx", 
-                 actual_sheet="Sheet1"):
+def read_kurva_s_sources(folder_id,
+                         plan_filename="Report_MS_TDE.xlsx",
+                         plan_sheet="Kurva S",
+                         actual_filename="activity_tracker_tde.xlsx",
+                         actual_sheet="Sheet1"):
+    """Raw plan and actual sheets behind Kurva S (Drive, or the offline snapshot)."""
+    if snapshot_path():
+        return read_snapshot_dataset("kurva_s_plan"), read_snapshot_dataset("kurva_s_actual")
 
     drive = get_drive()
 
@@ -141,6 +160,28 @@ def load_kurva_s(folder_id,
         plan_file.GetContentFile(tmp.name)
         df_plan = pd.read_excel(tmp.name, sheet_name=plan_sheet)
 
+    # --- Load Actual file ---
+    actual_file_id = get_file_id_from_name(drive, folder_id, actual_filename)
+    actual_file = drive.CreateFile({'id': actual_file_id})
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx") as tmp:
+        actual_file.GetContentFile(tmp.name)
+        df_actual = pd.read_excel(tmp.name, sheet_name=actual_sheet)
+
+    return df_plan, df_actual
+
+@st.cache_data(show_spinner="📊 Processing Kurva S data...", ttl=3600)
+@prefetchable
+def load_kurva_s(folder_id, 
+                 plan_filename="Report_MS_TDE.xlsx", 
+                 plan_sheet="Kurva S",
+                 actual_filename="activity_tracker_tde.xlsx", 
+                 actual_sheet="Sheet1"):
+
+    df_plan, df_actual = read_kurva_s_sources(
+        folder_id, plan_filename, plan_sheet, actual_filename, actual_sheet
+    )
+
     # --- Clean & process plan data ---
     df_plan["Date"] = pd.to_datetime(df_plan["Date"], errors="coerce")
     df_plan = df_plan[["Date", "Plan"]]
@@ -155,14 +196,6 @@ def load_kurva_s(folder_id,
     total_plan = df_plan["Cumulative Plan"].iloc[-1]
     df_plan["Cumulative Percentage"] = (df_plan["Cumulative Plan"] / total_plan) * 100
 
-    # --- Load Actual file ---
-    actual_file_id = get_file_id_from_name(drive, folder_id, actual_filename)
-    actual_file = drive.CreateFile({'id': actual_file_id})
-
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx") as tmp:
-        actual_file.GetContentFile(tmp.name)
-        df_actual = pd.read_excel(tmp.name, sheet_name=actual_sheet)
-
     # --- Clean & process actual data ---
     df_actual["Date"] = pd.to_datetime(df_actual["Date"], errors="coerce")
     df_actual = df_actual[["Date", "Quantity"]]
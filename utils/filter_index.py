@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+ALL = "All"
+
+
+class HierarchyIndex:
+    """Area -> regional -> site lookup tables and row positions for one frame.
+
+    Option lists and row selection become dictionary lookups instead of
+    masking the whole frame. The third level is usually the site id but can
+    be any leaf column (e.g. NS). ``None`` or ``"All"`` means "no filter".
+    Row positions are ``iloc`` positions into the indexed frame, in frame order.
+    """
+
+    def __init__(self, df: pd.DataFrame, area_col: str, regional_col: str, site_col: str):
+        self.n_rows = len(df)
+        self._area = df[area_col].to_numpy()
+        self._regional = df[regional_col].to_numpy()
+        self._site = df[site_col].to_numpy()
+
+        pairs = df.groupby([area_col, regional_col], sort=True).indices
+        triples = df.groupby([area_col, regional_col, site_col], sort=True).indices
+
+        self._area_list = sorted(df[area_col].dropna().unique())
+        self._regional_list = sorted(df[regional_col].dropna().unique())
+        self._site_list = sorted(df[site_col].dropna().unique())
+
+        self._regionals_by_area = {}
+        for area, regional in pairs:
+            self._regionals_by_area.setdefault(area, []).append(regional)
+
+        self._sites_by_pair = {}
+        self._sites_by_area = {}
+        self._sites_by_regional = {}
+        for area, regional, site in triples:
+            self._sites_by_pair.setdefault((area, regional), []).append(site)
+            self._sites_by_area.setdefault(area, set()).add(site)
+            self._sites_by_regional.setdefault(regional, set()).add(site)
+
+        self._rows_by_area = df.groupby(area_col, sort=False).indices
+        self._rows_by_regional = df.groupby(regional_col, sort=False).indices
+        self._rows_by_pair = pairs
+        self._rows_by_site = df.groupby(site_col, sort=False).indices
+
+    # --- Option lists ---
+    def areas(self):
+        return self._area_list
+
+    def regionals(self, area=None):
+        if area in (None, ALL):
+            return self._regional_list
+        return self._regionals_by_area.get(area, [])
+
+    def sites(self, area=None, regional=None):
+        if regional in (None, ALL):
+            if area in (None, ALL):
+                return self._site_list
+            return sorted(self._sites_by_area.get(area, ()))
+        if area in (None, ALL):
+            return sorted(self._sites_by_regional.get(regional, ()))
+        return self._sites_by_pair.get((area, regional), [])
+
+    # --- Row selection ---
+    def rows(self, area=None, regional=None, site=None):
+        """Row positions matching every given level."""
+        area = None if area == ALL else area
+        regional = None if regional == ALL else regional
+        site = None if site == ALL else site
+
+        # Start from the most selective lookup, then check the remaining levels on that subset
+        if site is not None:
+            pos = self._rows_by_site.get(site)
+        elif area is not None and regional is not None:
+            return self._rows_by_pair.get((area, regional), np.empty(0, dtype=np.intp))
+        elif regional is not None:
+            pos = self._rows_by_regional.get(regional)
+        elif area is not None:
+            pos = self._rows_by_area.get(area)
+        else:
+            return np.arange(self.n_rows)
+
+        if pos is None:
+            return np.empty(0, dtype=np.intp)
+        if site is not None and area is not None:
+            pos = pos[self._area[pos] == area]
+        if site is not None and regional is not None:
+            pos = pos[self._regional[pos] == regional]
+        return pos
+
+
+@st.cache_resource(max_entries=8)
+def get_hierarchy_index(name, version, _df, area_col, regional_col, site_col) -> HierarchyIndex:
+    """Hierarchy index of a shared frame, built once per data version."""
+    return HierarchyIndex(_df, area_col, regional_col, site_col)
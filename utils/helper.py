@@ -1,7 +1,25 @@
+import numpy as np
 import pandas as pd
 from utils.data_loader import load_availability_vs_penalty_data
+from utils.penalty_engine import assign_band, is_not_achieved, penalty_map, penalty_streak
 
-def prepare_penalty_table(df: pd.DataFrame, format_percent: bool = False) -> pd.DataFrame:
+
+def format_rupiah(values) -> pd.Series:
+    """Whole rupiah with "." thousands separators (e.g. "Rp 1.234.567"), without a per-row format call."""
+    values = pd.Series(values)
+    rounded = np.round(values.to_numpy(dtype=float))
+    finite = np.isfinite(rounded)
+    digits = pd.Series(np.where(finite, np.abs(rounded), 0).astype(np.int64), index=values.index).astype(str)
+    grouped = digits.str.replace(r"\B(?=(\d{3})+$)", ".", regex=True)
+    sign = np.where(finite & np.signbit(rounded), "-", "")
+    text = "Rp " + pd.Series(sign, index=values.index) + grouped
+    # nan / inf read the same as Python's own formatting
+    # (built from numpy strings: pandas keeps NaN as missing through str concatenation)
+    return text.where(finite, np.char.add("Rp ", rounded.astype(str)))
+
+
+def prepare_penalty_table(df: pd.DataFrame, format_percent: bool = False, penalty_ke: pd.Series = None) -> pd.DataFrame:
+    # penalty_ke: precomputed Penalty Ke by row (e.g. from penalty_engine.incremental_penalty_facts)
     df = df.copy()
 
     # Ensure date column is datetime
@@ -16,102 +34,36 @@ def prepare_penalty_table(df: pd.DataFrame, format_percent: bool = False) -> pd.
     df["Gap Ava"] = df["Availability"] - df["Target Availability (%)"]
 
     # Achievement
-    df["Achievement"] = df["Gap Ava"].apply(lambda x: "Achieved" if pd.notna(x) and x >= 0 else "Not Achieved")
-
-    # Band classification
-    def get_band(row):
-        ava = row["Availability"]
-        if pd.isna(ava):
-            return None
-        ava_pct = ava * 100
-        cls = str(row.get("Class Site", "")).strip().lower()
-
-        # Diamond & Platinum
-        if "diamond" in cls or "platinum" in cls:
-            if 99.4 <= ava_pct <= 100:
-                return "Ach"
-            elif 99.0 <= ava_pct < 99.4:
-                return "A"
-            elif 98.0 <= ava_pct < 99.0:
-                return "B"
-            elif 97.0 <= ava_pct < 98.0:
-                return "C"
-            else:
-                return "D"
-
-        # Gold
-        if "gold" in cls:
-            if 99.0 <= ava_pct <= 100:
-                return "Ach"
-            elif 98.5 <= ava_pct < 99.0:
-                return "E"
-            elif 98.0 <= ava_pct < 98.5:
-                return "F"
-            elif 97.0 <= ava_pct < 98.0:
-                return "G"
-            else:
-                return "H"
-
-        # Silver & Bronze
-        if "silver" in cls or "bronze" in cls:
-            if 97.5 <= ava_pct <= 100:
-                return "Ach"
-            elif 97.0 <= ava_pct < 97.5:
-                return "I"
-            elif 96.5 <= ava_pct < 97.0:
-                return "J"
-            elif 95.0 <= ava_pct < 96.5:
-                return "K"
-            else:
-                return "L"
-
-        return None
+    df["Achievement"] = np.where(
+        is_not_achieved(df["Availability"], df["Target Availability (%)"]), "Not Achieved", "Achieved"
+    )
 
-    df["Band"] = df.apply(get_band, axis=1)
+    # Band classification (thresholds per class in penalty_engine.BAND_TABLES)
+    class_site = df["Class Site"] if "Class Site" in df.columns else pd.Series("", index=df.index)
+    df["Band"] = assign_band(df["Availability"], class_site)
 
     # Prepare for penalty calculation
     df["Month_sort"] = df["Periode Tagihan (Awal)"]
     df["Year"] = df["Month_sort"].dt.year
+    # Rows without a Site Id or billing period have no penalty group
+    df = df.dropna(subset=["Site Id", "Year"])
     df = df.sort_values(["Site Id", "Year", "Month_sort"])
 
-    # Penalty Ke calculation (reset each year)
-    def calc_penalty_ke(group):
-        penalty_list = []
-        counter = 0
-        for _, row in group.iterrows():
-            if row["Achievement"] == "Achieved":
-                counter = 0
-            else:
-                counter = min(counter + 1, 3)
-            penalty_list.append(counter)
-        group["Penalty Ke"] = penalty_list
-        return group
-
-    df = df.groupby(["Site Id", "Year"], group_keys=False).apply(calc_penalty_ke)
-
-    # Prosentase Penalty mapping
-    penalty_map = {
-        "A1": 5, "A2": 10, "A3": 15,
-        "B1": 10, "B2": 15, "B3": 20,
-        "C1": 15, "C2": 20, "C3": 25,
-        "D1": 25, "D2": 30, "D3": 35,
-        "E1": 5, "E2": 10, "E3": 15,
-        "F1": 10, "F2": 15, "F3": 20,
-        "G1": 15, "G2": 20, "G3": 25,
-        "H1": 25, "H2": 30, "H3": 35,
-        "I1": 5, "I2": 10, "I3": 15,
-        "J1": 10, "J2": 15, "J3": 20,
-        "K1": 15, "K2": 20, "K3": 25,
-        "L1": 25, "L2": 30, "L3": 35
-    }
+    # Penalty Ke calculation: consecutive misses per site, reset each year and on achievement
+    if penalty_ke is None:
+        df["Penalty Ke"] = penalty_streak(
+            df["Achievement"].eq("Not Achieved"), [df["Site Id"], df["Year"]]
+        )
+    else:
+        df["Penalty Ke"] = penalty_ke.reindex(df.index).to_numpy()
 
     # Combine Band + Penalty Ke into key
     df["Band_PenaltyKe"] = df["Band"].astype(str) + df["Penalty Ke"].astype(str)
 
-    # Map to penalty percentage, default to 0 if not found
+    # Map to penalty percentage (penalty_engine.PENALTY_STEPS), default to 0 if not found
     df["Prosentase Penalty"] = (
         df["Band_PenaltyKe"]
-        .map(penalty_map)
+        .map(penalty_map())
         .fillna(0)               # replace NaN with 0
         .astype(int)              # ensure integer formatting
         .astype(str) + "%"        # add percentage sign
@@ -127,7 +79,7 @@ def prepare_penalty_table(df: pd.DataFrame, format_percent: bool = False) -> pd.
     df = df.drop(columns=["Month_sort", "Year", "Band_PenaltyKe"])
 
     # Format Nilai Penalty as Rupiah
-    df["Nilai Penalty"] = df["Nilai Penalty"].apply(lambda x: f"Rp {x:,.0f}".replace(",", "."))
+    df["Nilai Penalty"] = format_rupiah(df["Nilai Penalty"])
 
     # Select & reorder
     display_df = df[
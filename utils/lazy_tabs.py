@@ -0,0 +1,40 @@
+import streamlit as st
+from streamlit.errors import StreamlitAPIException
+
+
+def _keep_widget_state(owned, active):
+    """Re-set hidden tabs' widget values so Streamlit does not drop them while unrendered."""
+    for label, keys in owned.items():
+        if label == active:
+            continue
+        for key in list(keys):
+            if key not in st.session_state:
+                continue
+            try:
+                st.session_state[key] = st.session_state[key]
+            except StreamlitAPIException:
+                # Buttons, uploaders, forms: their value cannot be set, nothing to keep
+                keys.discard(key)
+
+
+def lazy_tabs(tabs, key):
+    """Tab bar that runs only the selected tab's body.
+
+    ``tabs`` maps label -> render callable. Hidden tabs cost nothing on a
+    rerun; their filters are kept in session state and their data stays in
+    the page's caches, so switching back reuses both.
+    """
+    labels = list(tabs)
+    owned = st.session_state.setdefault(f"{key}_owned", {label: set() for label in labels})
+    if st.session_state.get(key) not in labels:
+        st.session_state.pop(key, None)
+    _keep_widget_state(owned, st.session_state.get(key, labels[0]))
+
+    active = st.radio("Tab", labels, horizontal=True, key=key, label_visibility="collapsed")
+    st.divider()
+
+    before = set(st.session_state.keys())
+    tabs[active]()
+    # Widgets first created by this tab belong to it
+    owned.setdefault(active, set()).update(set(st.session_state.keys()) - before - {key})
+    return active
@@ -0,0 +1,429 @@
+import calendar
+import itertools
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# --- Band thresholds per site class (availability in %) ---
+# (class keywords, [(band, lower bound)] from best to worst, band below the last bound)
+# A band covers [its lower bound, the previous band's lower bound); "Ach" goes up to 100 inclusive.
+BAND_TABLES = [
+    (("diamond", "platinum"), [("Ach", 99.4), ("A", 99.0), ("B", 98.0), ("C", 97.0)], "D"),
+    (("gold",), [("Ach", 99.0), ("E", 98.5), ("F", 98.0), ("G", 97.0)], "H"),
+    (("silver", "bronze"), [("Ach", 97.5), ("I", 97.0), ("J", 96.5), ("K", 95.0)], "L"),
+]
+
+# --- Penalty percentage per band for the 1st, 2nd and 3rd+ consecutive miss ---
+PENALTY_STEPS = {
+    "A": (5, 10, 15), "B": (10, 15, 20), "C": (15, 20, 25), "D": (25, 30, 35),
+    "E": (5, 10, 15), "F": (10, 15, 20), "G": (15, 20, 25), "H": (25, 30, 35),
+    "I": (5, 10, 15), "J": (10, 15, 20), "K": (15, 20, 25), "L": (25, 30, 35),
+}
+MAX_PENALTY_KE = 3
+
+
+def penalty_map(steps=None):
+    """Band + Penalty Ke key (e.g. "B2") -> penalty percentage."""
+    steps = PENALTY_STEPS if steps is None else steps
+    return {f"{band}{ke}": pct for band, values in steps.items() for ke, pct in enumerate(values, start=1)}
+
+
+def assign_band(availability, class_site, tables=None) -> np.ndarray:
+    """Band for each row from availability (0-1 ratio) and site class; None when unknown."""
+    tables = BAND_TABLES if tables is None else tables
+    pct = pd.to_numeric(pd.Series(availability), errors="coerce").to_numpy(dtype=float) * 100
+    cls = pd.Series(class_site).astype(str).str.strip().str.lower()
+
+    band = np.full(len(pct), None, dtype=object)
+    unassigned = np.ones(len(pct), dtype=bool)
+    for keywords, bands, fallback in tables:
+        in_class = unassigned & cls.str.contains("|".join(keywords), regex=True).to_numpy()
+        unassigned &= ~in_class
+        rows = in_class & ~np.isnan(pct)
+        if not rows.any():
+            continue
+
+        upper, upper_inclusive = 100.0, True
+        conditions, names = [], []
+        for name, lower in bands:
+            below_upper = pct[rows] <= upper if upper_inclusive else pct[rows] < upper
+            conditions.append((pct[rows] >= lower) & below_upper)
+            names.append(name)
+            upper, upper_inclusive = lower, False
+        band[rows] = np.select(conditions, names, default=fallback)
+    return band
+
+
+def penalty_streak(not_achieved, group_keys, cap=MAX_PENALTY_KE) -> np.ndarray:
+    """Consecutive misses per group (rows already in time order), reset on achievement, capped."""
+    not_achieved = pd.Series(np.asarray(not_achieved, dtype=bool))
+    keys = pd.DataFrame({i: np.asarray(k) for i, k in enumerate(group_keys)})
+    new_group = keys.ne(keys.shift()).any(axis=1)
+    run = (~not_achieved | new_group).cumsum()
+    streak = not_achieved.astype(int).groupby(run.to_numpy()).cumsum()
+    return streak.clip(upper=cap).to_numpy()
+
+
+def is_not_achieved(availability, target) -> np.ndarray:
+    """Same rule as the penalty table: achieved only when the gap is known and >= 0."""
+    gap = pd.to_numeric(pd.Series(availability), errors="coerce") - pd.to_numeric(pd.Series(target), errors="coerce")
+    return ~(gap.notna() & (gap >= 0)).to_numpy()
+
+
+# --- Incremental penalty table ---
+# Input columns of the penalty table; a change anywhere else (e.g. the KML-derived Area) keeps closed months
+PENALTY_TABLE_INPUTS = [
+    "Regional TI", "Site Id", "Site Name", "Class Site", "Periode Tagihan (Awal)",
+    "Target Availability (%)", "Availability", "Nilai Penalty",
+]
+
+
+def _streak_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Streak inputs in the penalty table's order (Site Id, Year, billing period); rows without either dropped."""
+    periode = pd.to_datetime(df["Periode Tagihan (Awal)"], errors="coerce")
+    frame = pd.DataFrame({
+        "site": df["Site Id"],
+        "periode": periode,
+        "year": periode.dt.year,
+        "missed": is_not_achieved(
+            pd.to_numeric(df["Availability"], errors="coerce"),
+            pd.to_numeric(df["Target Availability (%)"], errors="coerce"),
+        ),
+        "availability": pd.to_numeric(df["Availability"], errors="coerce"),
+        "class_site": df["Class Site"] if "Class Site" in df.columns else "",
+    }, index=df.index).dropna(subset=["site", "year"])
+    frame["year"] = frame["year"].astype(int)
+    frame["month"] = frame["year"] * 12 + frame["periode"].dt.month
+    return frame.sort_values(["site", "year", "periode"])
+
+
+def _streaks_with_carry(frame: pd.DataFrame, carry: pd.DataFrame) -> np.ndarray:
+    """Penalty Ke for ``frame`` continuing each (site, year) from its carried streak."""
+    keys = [frame["site"].to_numpy(), frame["year"].to_numpy()]
+    raw = penalty_streak(frame["missed"], keys, cap=np.iinfo(np.int64).max)
+    if carry.empty:
+        return np.minimum(raw, MAX_PENALTY_KE)
+
+    carried = carry["ke"].reindex(pd.MultiIndex.from_arrays(keys)).fillna(0).to_numpy(dtype=int)
+    # Rows before the first achievement of the group continue the carried run
+    leading = (~frame["missed"]).groupby(keys, sort=False).cumsum().eq(0).to_numpy()
+    return np.minimum(np.where(leading, raw + carried, raw), MAX_PENALTY_KE)
+
+
+def _carry_after(frame: pd.DataFrame, ke, previous=None) -> pd.DataFrame:
+    """Streak state per (site, year) after the last processed month: Penalty Ke and band."""
+    last = pd.DataFrame({
+        "site": frame["site"].to_numpy(),
+        "year": frame["year"].to_numpy(),
+        "ke": ke,
+        "band": assign_band(frame["availability"], frame["class_site"]),
+    }).groupby(["site", "year"], sort=False).last()
+    if previous is None or previous.empty:
+        return last
+    return pd.concat([previous[~previous.index.isin(last.index)], last])
+
+
+@st.cache_resource
+def _penalty_state():
+    # Survives data refreshes: the last build's inputs, its table rows and the streak state after it
+    return {"lock": threading.Lock(), "inputs": None, "facts": None, "carry": None, "last_month": None}
+
+
+def _appended_rows(inputs: pd.DataFrame, state) -> int:
+    """Position of the first new row when ``inputs`` only appends later months to the last build, else -1.
+
+    The stored rows must come first, unchanged and under the same index;
+    comparing them is a column-wise equality check, not a hash of every row.
+    """
+    previous = state["inputs"]
+    if previous is None or previous.empty or state["last_month"] is None:
+        return -1
+    n_old = len(previous)
+    if len(inputs) < n_old or not inputs.columns.equals(previous.columns):
+        return -1
+    if not inputs.index[:n_old].equals(previous.index) or not inputs.iloc[:n_old].equals(previous):
+        return -1
+    periode = pd.to_datetime(inputs["Periode Tagihan (Awal)"].iloc[n_old:], errors="coerce").dropna()
+    if (periode.dt.year * 12 + periode.dt.month).le(state["last_month"]).any():
+        return -1  # rows for a closed month: its streaks would change
+    return n_old
+
+
+def incremental_penalty_facts(df: pd.DataFrame, build) -> pd.DataFrame:
+    """Penalty table of ``df`` built by ``build(rows, penalty_ke)``, one closed month at a time.
+
+    ``build`` turns rows plus their Penalty Ke into table rows (band,
+    penalty %, rupiah, display order by month first). When ``df`` only adds
+    rows for months after the last build, just those rows are built, their
+    streaks continuing from the stored per-site state, and appended to the
+    stored table. Any change to a past month triggers a full rebuild.
+    """
+    state = _penalty_state()
+    with state["lock"]:
+        inputs = df[[col for col in PENALTY_TABLE_INPUTS if col in df.columns]]
+        n_old = _appended_rows(inputs, state)
+        if n_old >= 0:
+            frame = _streak_frame(df.iloc[n_old:])
+            ke = _streaks_with_carry(frame, state["carry"])
+            carry = _carry_after(frame, ke, state["carry"]) if not frame.empty else state["carry"]
+            facts = state["facts"]
+            if not frame.empty:
+                facts = pd.concat([facts, build(df.iloc[n_old:], pd.Series(ke, index=frame.index))])
+        else:
+            frame = _streak_frame(df)
+            ke = _streaks_with_carry(frame, pd.DataFrame())
+            carry = _carry_after(frame, ke)
+            facts = build(df, pd.Series(ke, index=frame.index))
+            state["last_month"] = None
+
+        if not frame.empty:
+            state["last_month"] = int(frame["month"].max())
+        state["inputs"] = inputs
+        state["facts"] = facts
+        state["carry"] = carry
+        return facts
+
+
+# --- What-if scenarios ---
+# Scenarios evaluated per broadcast chunk (rows x chunk matrices)
+SCENARIO_CHUNK = 64
+
+
+def class_table_key(table):
+    """Name used for a BAND_TABLES entry in scenarios: its first class keyword."""
+    return table[0][0]
+
+
+def scenario_grid(bands=None, steps=None, targets=None) -> list:
+    """Every combination of the given alternatives as scenarios.
+
+    Each argument maps an option label to an override, e.g.
+    ``bands={"Gold -0.5": {"gold": [98.5, 98.0, 97.5, 96.5]}}``,
+    ``steps={"x1.2": {"E": (6, 12, 18), ...}}``, ``targets={"Gold 98.5%": {"gold": 98.5}}``.
+    """
+    axes = [
+        [(label, {kind: override}) for label, override in (options or {"": {}}).items()]
+        for kind, options in (("bands", bands), ("steps", steps), ("targets", targets))
+    ]
+    scenarios = []
+    for combo in itertools.product(*axes):
+        scenario = {"name": " · ".join(label for label, _ in combo if label) or "Current"}
+        for _, override in combo:
+            scenario.update({kind: value for kind, value in override.items() if value})
+        scenarios.append(scenario)
+    return scenarios
+
+
+def _scenario_tables(scenarios, tables, steps):
+    """Per-scenario lower bounds (S, C, 4), penalty % (S, C, 5, ke) and class targets in % (S, C + 1)."""
+    n_bounds = len(tables[0][1])
+    lowers = np.empty((len(scenarios), len(tables), n_bounds))
+    pct = np.zeros((len(scenarios), len(tables), n_bounds + 1, MAX_PENALTY_KE))
+    targets = np.full((len(scenarios), len(tables) + 1), np.nan)  # last column: unmatched class
+
+    for s, scenario in enumerate(scenarios):
+        scenario_steps = {**steps, **scenario.get("steps", {})}
+        for c, table in enumerate(tables):
+            key = class_table_key(table)
+            bounds = scenario.get("bands", {}).get(key, [lower for _, lower in table[1]])
+            if len(bounds) != n_bounds or list(bounds) != sorted(bounds, reverse=True):
+                raise ValueError(f"Scenario '{scenario.get('name')}': {key} needs {n_bounds} descending band bounds")
+            lowers[s, c] = bounds
+            # Band 0 is "Ach" (no penalty); the rest follow the table, then its fallback band
+            band_names = [name for name, _ in table[1]][1:] + [table[2]]
+            for b, band in enumerate(band_names, start=1):
+                pct[s, c, b] = scenario_steps.get(band, (0,) * MAX_PENALTY_KE)
+            targets[s, c] = scenario.get("targets", {}).get(key, np.nan)
+    return lowers, pct, targets
+
+
+def _streak_matrix(missed, new_group, cap=MAX_PENALTY_KE):
+    """penalty_streak for many scenarios at once: ``missed`` is (S, N), rows in time order."""
+    count = np.cumsum(missed, axis=1)
+    # A streak restarts after an achieved row and at the start of each (site, year)
+    anchor = np.where(~missed, count, np.where(new_group, count - missed, 0))
+    return np.minimum(count - np.maximum.accumulate(anchor, axis=1), cap)
+
+
+def simulate_scenarios(df: pd.DataFrame, scenarios, tables=None, steps=None) -> pd.DataFrame:
+    """Total penalty per scenario, Regional TI and month over the full site-month history.
+
+    Each scenario may override band bounds (``bands``), penalty percentages
+    (``steps``) and target availability in % (``targets``) per class table;
+    anything not overridden follows BAND_TABLES / PENALTY_STEPS and the
+    workbook's own targets. Penalty = penalty % x Nilai BAST (else Nominal PO).
+    """
+    tables = BAND_TABLES if tables is None else tables
+    steps = PENALTY_STEPS if steps is None else steps
+    columns = ["Scenario", "Regional TI", "Month", "Penalty (Rp)", "Penalized Site-Months"]
+    if df.empty or not scenarios:
+        return pd.DataFrame(columns=columns)
+
+    frame = _streak_frame(df)
+    availability = frame["availability"].to_numpy() * 100
+    row_target = pd.to_numeric(df.loc[frame.index, "Target Availability (%)"], errors="coerce").to_numpy() * 100
+    amount_col = "Nilai BAST" if "Nilai BAST" in df.columns else "Nominal PO"
+    base = pd.to_numeric(df.loc[frame.index, amount_col], errors="coerce").fillna(0).to_numpy()
+
+    # Class table per row (-1: no table, never banded)
+    cls_text = pd.Series(frame["class_site"]).astype(str).str.strip().str.lower()
+    cls = np.full(len(frame), -1)
+    for c, (keywords, _, _) in reversed(list(enumerate(tables))):
+        cls[cls_text.str.contains("|".join(keywords), regex=True).to_numpy()] = c
+    banded = (cls >= 0) & ~np.isnan(availability)
+    keys = frame[["site", "year"]]
+    new_group = keys.ne(keys.shift()).any(axis=1).to_numpy()
+
+    # Rows ordered by (Regional TI, month) so each group is one slice for np.add.reduceat
+    group_codes, group_index = pd.MultiIndex.from_arrays([
+        df.loc[frame.index, "Regional TI"].fillna("Unknown").to_numpy(),
+        frame["periode"].dt.to_period("M").dt.to_timestamp().to_numpy(),
+    ], names=["Regional TI", "Month"]).factorize(sort=True)
+    order = np.argsort(group_codes, kind="stable")
+    starts = np.flatnonzero(np.r_[True, np.diff(group_codes[order]) != 0])
+
+    lowers, pct, targets = _scenario_tables(scenarios, tables, steps)
+
+    # Bands depend only on a scenario's bounds and streaks only on its targets: compute each distinct one once
+    unique_lowers, lower_of = np.unique(lowers.reshape(len(scenarios), -1), axis=0, return_inverse=True)
+    unique_lowers = unique_lowers.reshape(-1, *lowers.shape[1:])
+    band = (availability[None, :, None] < unique_lowers[:, cls]).sum(axis=2).astype(np.int8)
+    band[:, availability > 100] = lowers.shape[2]  # above 100% falls to the fallback band, like assign_band
+
+    unique_targets, target_of = np.unique(np.nan_to_num(targets, nan=-1), axis=0, return_inverse=True)
+    target = unique_targets[:, cls]
+    target = np.where(target < 0, row_target[None, :], target)
+    missed = ~((availability[None, :] - target) >= 0)  # NaN gap counts as missed, as in is_not_achieved
+    ke = _streak_matrix(missed, new_group[None, :]).astype(np.int8)
+
+    lower_of, target_of = np.ravel(lower_of), np.ravel(target_of)
+    row_cls = np.maximum(cls, 0)[order]
+    band, ke, base, banded = band[:, order], ke[:, order], base[order], banded[order]
+
+    penalty_parts, count_parts = [], []
+    for start in range(0, len(scenarios), SCENARIO_CHUNK):
+        chunk = np.arange(start, min(start + SCENARIO_CHUNK, len(scenarios)))
+        chunk_ke = ke[target_of[chunk]]
+        rate = pct[chunk[:, None], row_cls[None, :], band[lower_of[chunk]], np.maximum(chunk_ke - 1, 0)]
+        rate = np.where((chunk_ke > 0) & banded[None, :], rate, 0)
+
+        penalty_parts.append(np.add.reduceat(rate / 100 * base[None, :], starts, axis=1))
+        count_parts.append(np.add.reduceat((rate > 0).astype(np.int64), starts, axis=1))
+
+    names = pd.Series([scenario.get("name") or f"Scenario {i + 1}" for i, scenario in enumerate(scenarios)])
+    names = names.where(~names.duplicated(), names + " #" + (names.groupby(names).cumcount() + 1).astype(str))
+
+    def long(parts, value_name):
+        index = pd.MultiIndex.from_tuples(list(group_index[group_codes[order][starts]]), names=["Regional TI", "Month"])
+        wide = pd.DataFrame(np.vstack(parts).T, index=index, columns=names.tolist())
+        return wide.reset_index().melt(id_vars=["Regional TI", "Month"], var_name="Scenario", value_name=value_name)
+
+    result = long(penalty_parts, "Penalty (Rp)")
+    result["Penalized Site-Months"] = long(count_parts, "Penalized Site-Months")["Penalized Site-Months"]
+    return result[columns]
+
+
+def scenario_totals(result: pd.DataFrame, baseline="Current") -> pd.DataFrame:
+    """One row per scenario: total penalty, penalized site-months and change vs the baseline."""
+    totals = result.groupby("Scenario", sort=False)[["Penalty (Rp)", "Penalized Site-Months"]].sum()
+    if baseline in totals.index:
+        totals["vs Current (Rp)"] = totals["Penalty (Rp)"] - totals.loc[baseline, "Penalty (Rp)"]
+    return totals.sort_values("Penalty (Rp)").reset_index()
+
+
+@st.cache_resource(max_entries=4, show_spinner="Simulating scenarios...")
+def get_scenario_results(version, scenario_key, _df, _scenarios) -> pd.DataFrame:
+    return simulate_scenarios(_df, _scenarios)
+
+
+def scenario_cache_key(scenarios) -> str:
+    return json.dumps(scenarios, sort_keys=True, default=str)
+
+
+# --- Month-end projection ---
+def project_month_end(daily: pd.DataFrame, penalty: pd.DataFrame) -> pd.DataFrame:
+    """Projected month-end availability, band, penalty % and rupiah exposure for every site.
+
+    Month-to-date daily availability is extended to month end at the site's
+    recent rate (rolling 7-day availability, else its month-to-date mean).
+    The penalty streak carried in is the site's run of missed months earlier
+    in the same year, taken from the penalty workbook.
+    """
+    if daily.empty or penalty.empty:
+        return pd.DataFrame()
+
+    as_of = daily["Date"].max().normalize()
+    month_start = as_of.replace(day=1)
+    days_in_month = calendar.monthrange(as_of.year, as_of.month)[1]
+    remaining_days = days_in_month - as_of.day
+
+    # --- Month-to-date per site ---
+    mtd = daily[(daily["Date"] >= month_start) & (daily["Date"] <= as_of)].sort_values("Date")
+    site_key = mtd["site_id"].astype(str).str.strip()
+    recent_col = "availability_7d" if "availability_7d" in mtd.columns else "availability (%)"
+    per_site = pd.DataFrame({
+        "site_key": site_key,
+        "avail": mtd["availability (%)"],
+        "recent": mtd[recent_col],
+    }).groupby("site_key").agg(
+        mtd_sum=("avail", "sum"),
+        mtd_days=("avail", "count"),
+        mtd_availability=("avail", "mean"),
+        recent_rate=("recent", "last"),
+    )
+    per_site["recent_rate"] = per_site["recent_rate"].fillna(per_site["mtd_availability"])
+    per_site["projected_pct"] = (
+        (per_site["mtd_sum"] + remaining_days * per_site["recent_rate"])
+        / (per_site["mtd_days"] + remaining_days)
+    )
+
+    # --- Site terms and streak carried in, from the penalty workbook ---
+    history = penalty.assign(site_key=penalty["Site Id"].astype(str).str.strip())
+    history = history.sort_values(["site_key", "Year", "Month_Num"], kind="stable")
+    before = history[
+        (history["Year"] == as_of.year) & (history["Month_Num"] < as_of.month)
+    ]
+    streak_in = pd.Series(
+        penalty_streak(
+            is_not_achieved(before["Availability"], before["Target Availability (%)"]),
+            [before["site_key"], before["Year"]],
+        ),
+        index=before.index,
+    ).groupby(before["site_key"].to_numpy()).last()
+
+    amount_col = "Nilai BAST" if "Nilai BAST" in history.columns else "Nominal PO"
+    terms = history.groupby("site_key").last()[
+        ["Regional TI", "Site Name", "Class Site", "Target Availability (%)", amount_col]
+    ]
+
+    result = per_site.join(terms, how="inner")
+    result["streak_in"] = streak_in.reindex(result.index).fillna(0).astype(int)
+
+    # --- Projected band and penalty (same rules as the penalty table) ---
+    projected = result["projected_pct"] / 100
+    target = pd.to_numeric(result["Target Availability (%)"], errors="coerce")
+    missed = is_not_achieved(projected, target)
+    result["Projected Availability"] = projected
+    result["Projected Status"] = np.where(missed, "Not Achieved", "Achieved")
+    result["Projected Band"] = assign_band(projected, result["Class Site"])
+    result["Projected Penalty Ke"] = np.where(missed, np.minimum(result["streak_in"] + 1, MAX_PENALTY_KE), 0)
+    key = result["Projected Band"].astype(str) + result["Projected Penalty Ke"].astype(str)
+    result["Projected Penalty (%)"] = key.map(penalty_map()).fillna(0).astype(int)
+    result["Projected Exposure"] = result["Projected Penalty (%)"] / 100 * pd.to_numeric(result[amount_col], errors="coerce").fillna(0)
+
+    result = result.reset_index().rename(columns={
+        "site_key": "Site Id",
+        "mtd_availability": "MTD Availability (%)",
+        "mtd_days": "MTD Days",
+        "recent_rate": "Recent Rate (%)",
+        "streak_in": "Penalty Ke (so far)",
+    })
+    return result.sort_values("Projected Exposure", ascending=False).reset_index(drop=True)
+
+
+@st.cache_resource(max_entries=2, show_spinner="Projecting month-end penalties...")
+def get_month_end_projection(daily_version, penalty_version, _daily, _penalty) -> pd.DataFrame:
+    return project_month_end(_daily, _penalty)
@@ -0,0 +1,17 @@
+import functools
+
+
+def prefetchable(func):
+    """Lets a cached loader be handed a value read elsewhere.
+
+    Put it under ``st.cache_data``: ``loader(*args, _prefetched=value)``
+    returns ``value`` (and so caches it under ``args``) without reading the
+    source again. ``_prefetched`` starts with an underscore, so Streamlit
+    leaves it out of the cache key.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, _prefetched=None, **kwargs):
+        if _prefetched is not None:
+            return _prefetched
+        return func(*args, **kwargs)
+    return wrapper
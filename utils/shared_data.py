@@ -0,0 +1,293 @@
+import hashlib
+from typing import NamedTuple
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.data_loader import (
+    get_drive,
+    load_kml_file,
+    load_all_daily_files,
+    load_all_weekly_files,
+    load_availability_vs_penalty_data,
+)
+from utils.availability_metrics import (
+    add_rolling_metrics,
+    add_availability_check,
+    get_validation_summary,
+    normalize_availability_scale,
+)
+from utils.site_levels import get_site_levels
+
+NUMERIC_AVAILABILITY_COLS = ["occurrence", "outage_2g (Hour)", "outage_4g (Hour)", "availability (%)"]
+
+# Max filter selections memoized per page (LRU); operators usually flip between a few sites
+FILTER_CACHE_ENTRIES = 32
+
+
+# --- Read-only shared frames: a stray write fails instead of changing every session's data ---
+READ_ONLY_MESSAGE = "Shared frames are read-only; work on a slice or .copy() (sites: editable_session_sites())"
+
+
+def _read_only_error(*args, **kwargs):
+    raise TypeError(READ_ONLY_MESSAGE)
+
+
+class _ReadOnlyIndexer:
+    """``.loc`` / ``.iloc`` / ``.at`` / ``.iat`` of a read-only frame: lookups pass through, assignment raises."""
+
+    def __init__(self, indexer):
+        self._indexer = indexer
+
+    def __call__(self, axis=None):
+        return _ReadOnlyIndexer(self._indexer(axis))
+
+    def __getitem__(self, key):
+        return self._indexer[key]
+
+    __setitem__ = _read_only_error
+
+
+class ReadOnlyFrameMixin:
+    """Blocks writes to a frame once ``_lock_frame`` has run.
+
+    Column assignment, ``del``, ``insert``, indexer assignment and every
+    ``inplace=True`` method raise; the value arrays are marked non-writeable
+    so numpy-level writes fail too. Anything derived (slices, ``copy()``,
+    ``assign``, groupbys) is an ordinary mutable frame.
+    """
+
+    def _locked(self):
+        return self.__dict__.get("_frame_locked", False)
+
+    def _guarded(method):
+        def wrapper(self, *args, **kwargs):
+            if self._locked():
+                _read_only_error()
+            return getattr(super(ReadOnlyFrameMixin, self), method)(*args, **kwargs)
+        return wrapper
+
+    __setitem__ = _guarded("__setitem__")
+    __delitem__ = _guarded("__delitem__")
+    insert = _guarded("insert")
+    isetitem = _guarded("isetitem")
+    pop = _guarded("pop")
+    update = _guarded("update")
+    _update_inplace = _guarded("_update_inplace")  # every inplace=True method ends here
+
+    def __setattr__(self, name, value):
+        # pandas' own bookkeeping uses private names; columns / index / column attributes are data
+        if self._locked() and not name.startswith("_"):
+            _read_only_error()
+        super().__setattr__(name, value)
+
+    @property
+    def loc(self):
+        return _ReadOnlyIndexer(super().loc) if self._locked() else super().loc
+
+    @property
+    def iloc(self):
+        return _ReadOnlyIndexer(super().iloc) if self._locked() else super().iloc
+
+    @property
+    def at(self):
+        return _ReadOnlyIndexer(super().at) if self._locked() else super().at
+
+    @property
+    def iat(self):
+        return _ReadOnlyIndexer(super().iat) if self._locked() else super().iat
+
+    del _guarded
+
+
+class ReadOnlyDataFrame(ReadOnlyFrameMixin, pd.DataFrame):
+    pass
+
+
+class ReadOnlyGeoDataFrame(ReadOnlyFrameMixin, gpd.GeoDataFrame):
+    pass
+
+
+def read_only_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Read-only frame over ``df``'s data (no copy), for sharing across sessions."""
+    frame = (ReadOnlyGeoDataFrame if isinstance(df, gpd.GeoDataFrame) else ReadOnlyDataFrame)(df)
+    for block in frame._mgr.blocks:
+        values = getattr(block.values, "_ndarray", block.values)  # datetime-like arrays wrap an ndarray
+        if isinstance(values, np.ndarray):
+            values.flags.writeable = False
+    object.__setattr__(frame, "_frame_locked", True)
+    return frame
+
+
+class SharedFrame(NamedTuple):
+    """A prepared dataset shared by every session.
+
+    ``df`` is the same object for all reruns and sessions and is read-only
+    (``read_only_frame``): assigning into it raises. Slice it (``df[mask]``)
+    and work on the result instead.
+    """
+    name: str
+    version: str
+    df: pd.DataFrame
+
+    @property
+    def empty(self):
+        return self.df.empty
+
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    """Short content hash of a frame, used as its data version."""
+    if df.empty:
+        return "empty"
+    try:
+        hashed = pd.util.hash_pandas_object(df, index=False)
+    except TypeError:
+        # Mixed/unhashable object columns: fall back to their string form
+        hashed = pd.util.hash_pandas_object(df.astype(str), index=False)
+    digest = hashlib.sha1(hashed.to_numpy().tobytes())
+    digest.update(",".join(map(str, df.columns)).encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+# --- Preparation: derived columns computed once per data version ---
+def prepare_daily(df: pd.DataFrame) -> pd.DataFrame:
+    if df.empty:
+        return df
+    df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
+    for col in NUMERIC_AVAILABILITY_COLS:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    df = df.dropna(subset=["Date"]).reset_index(drop=True)
+    df["Date_Display"] = df["Date"].dt.strftime("%d-%B-%Y")
+    # Ratio-scale files rescaled once, so rankings, rolling metrics and charts all read percentages;
+    # reported availability is then checked against the outage hours on every load
+    return add_availability_check(normalize_availability_scale(df))
+
+
+def prepare_weekly(df: pd.DataFrame) -> pd.DataFrame:
+    if df.empty:
+        return df
+    df["Week"] = df["Week"].astype(str)
+    # Numeric week number, e.g. '2025-W14' -> 14
+    df["Week_Num"] = pd.to_numeric(df["Week"].str.extract(r"W(\d+)")[0], errors="coerce")
+    df = df.dropna(subset=["Week", "Week_Num"]).reset_index(drop=True)
+    for col in NUMERIC_AVAILABILITY_COLS:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    df["Year"] = df["period"].astype(str).str[:4].astype(int)
+    return df
+
+
+def area_by_regional(df: pd.DataFrame, sites: pd.DataFrame) -> dict:
+    """Area of each Regional TI, taken from the KML sites it contains (majority vote)."""
+    if sites.empty or not {"Site ID", "Area"}.issubset(sites.columns):
+        return {}
+    site_area = sites.loc[sites["Area"].astype(str).str.strip() != "", ["Site ID", "Area"]]
+    site_area = dict(zip(site_area["Site ID"].astype(str).str.strip(), site_area["Area"]))
+    pairs = pd.DataFrame({
+        "regional": df["Regional TI"],
+        "area": df["Site Id"].astype(str).str.strip().map(site_area),
+    }).dropna()
+    return pairs.groupby("regional")["area"].agg(lambda s: s.value_counts().idxmax()).to_dict()
+
+
+def prepare_availability_vs_penalty(df: pd.DataFrame, sites: pd.DataFrame = None) -> pd.DataFrame:
+    if df.empty:
+        return df
+    # Area derived from the site master instead of a hard-coded Area -> Regional TI list
+    mapping = area_by_regional(df, sites if sites is not None else pd.DataFrame())
+    # object dtype: an empty mapping (no/unmatched KML) would otherwise give a float NaN column
+    df["Area"] = df["Regional TI"].map(mapping).astype(object)
+    df.loc[df["Regional TI"].notna() & df["Area"].isna(), "Area"] = "Unmapped"
+    # Month-Year label for the x-axis, e.g. "January-2025"
+    df["Month-Year"] = df["Month"].astype(str) + "-" + df["Year"].astype("Int64").astype(str)
+    df["Month_Num"] = pd.to_datetime(df["Month-Year"], format="%B-%Y", errors="coerce").dt.month
+    df["Status"] = np.where(
+        df["Availability"] >= df["Target Availability (%)"], "Achieved", "Not Achieved"
+    )
+    return df
+
+
+def _share(name, df):
+    return SharedFrame(name=name, version=frame_fingerprint(df), df=read_only_frame(df))
+
+
+# --- Process-wide builders (no per-rerun copies, unlike st.cache_data) ---
+@st.cache_resource(ttl=3600, show_spinner="Preparing daily availability data...")
+def get_shared_daily() -> SharedFrame:
+    # Rolling 7/30-day columns travel with the frame; only appended days are re-summed
+    shared = _share("daily", add_rolling_metrics(prepare_daily(load_all_daily_files())))
+    get_validation_summary(shared.name, shared.version, shared.df)
+    return shared
+
+
+@st.cache_resource(ttl=3600, show_spinner="Preparing weekly availability data...")
+def get_shared_weekly() -> SharedFrame:
+    return _share("weekly", prepare_weekly(load_all_weekly_files()))
+
+
+@st.cache_resource(ttl=3600, show_spinner="Preparing penalty data...")
+def get_shared_availability_vs_penalty() -> SharedFrame:
+    return _share(
+        "availability_vs_penalty",
+        prepare_availability_vs_penalty(load_availability_vs_penalty_data(), get_shared_sites().df),
+    )
+
+
+@st.cache_resource(ttl=3600, show_spinner="Loading CDC site data...")
+def get_shared_sites() -> SharedFrame:
+    gdf = load_kml_file(get_drive())
+    # Version from the attributes; the point geometry is derived from Longitude/Latitude
+    attributes = pd.DataFrame(gdf).drop(columns=["geometry"], errors="ignore")
+    shared = SharedFrame(name="sites", version=frame_fingerprint(attributes), df=read_only_frame(gdf))
+    # Map aggregation levels are built with the load, so the first map view only draws
+    if not gdf.empty:
+        get_site_levels(shared.name, shared.version, shared.df)
+    return shared
+
+
+def refresh_shared_sites():
+    """Reload the KML once for the whole process; sessions pick up the new version on rerun."""
+    load_kml_file.clear()
+    get_shared_sites.clear()
+    get_shared_availability_vs_penalty.clear()  # its Area column comes from the sites
+    return get_shared_sites()
+
+
+# --- Per-session view of the shared sites (copy-on-write) ---
+def session_sites():
+    """Site GeoDataFrame for this session.
+
+    Sessions only keep the version they are looking at; the frame itself is
+    the process-wide one unless this session asked for an editable copy.
+    A private copy made against an older version is dropped.
+    """
+    shared = get_shared_sites()
+    if st.session_state.get("cdc_sites_version") != shared.version:
+        st.session_state["cdc_sites_version"] = shared.version
+        st.session_state.pop("cdc_sites_gdf", None)
+    return st.session_state.get("cdc_sites_gdf", shared.df)
+
+
+def editable_session_sites():
+    """Session-private copy of the sites, made on the first write."""
+    gdf = session_sites()
+    if "cdc_sites_gdf" not in st.session_state:
+        gdf = gdf.copy()
+        st.session_state["cdc_sites_gdf"] = gdf
+    return gdf
+
+
+@st.cache_resource(max_entries=8)
+def shared_csv_bytes(name: str, version: str, _df: pd.DataFrame) -> bytes:
+    """CSV export of a shared frame, encoded once per data version."""
+    return _df.to_csv(index=False).encode("utf-8")
+
+
+def clear_shared_data():
+    """Drop every shared frame so the next access reloads from the loaders."""
+    get_shared_daily.clear()
+    get_shared_weekly.clear()
+    get_shared_availability_vs_penalty.clear()
+    get_shared_sites.clear()
+    shared_csv_bytes.clear()
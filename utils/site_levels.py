@@ -0,0 +1,120 @@
+import os
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.spatial_index import site_coordinates
+
+# Zoom ranges of the site layer's levels of detail: regional centroids up to
+# REGIONAL_MAX_ZOOM, class hex bins up to HEX_MAX_ZOOM, individual sites beyond
+REGIONAL_MAX_ZOOM = int(os.environ.get("DASHBOARD_MAP_REGIONAL_MAX_ZOOM", 5))
+HEX_MAX_ZOOM = int(os.environ.get("DASHBOARD_MAP_HEX_MAX_ZOOM", 8))
+
+# Hex bin circumradius in degrees (0.3 deg ~ 33 km)
+HEX_SIZE_DEG = float(os.environ.get("DASHBOARD_MAP_HEX_SIZE_DEG", 0.3))
+
+SITE_CLASSES = ["Platinum", "Gold", "Silver", "Bronze"]
+CLASS_COLUMNS = SITE_CLASSES + ["Other"]
+
+STATUS_FILTERS = ["All", "On Service", "Cut Off"]
+
+
+def status_mask(gdf, status) -> np.ndarray:
+    """Rows matching a STATUS_FILTERS entry (same "on" / "cut" text match as the summary cards)."""
+    text = gdf["Status"].astype(str).str.lower()
+    if status == "On Service":
+        return text.str.contains("on", na=False).to_numpy()
+    if status == "Cut Off":
+        return text.str.contains("cut", na=False).to_numpy()
+    return np.ones(len(gdf), dtype=bool)
+
+
+def level_for_zoom(zoom) -> str:
+    """"regional", "hex" or "sites" for a map zoom level."""
+    if zoom is None or zoom <= REGIONAL_MAX_ZOOM:
+        return "regional"
+    if zoom <= HEX_MAX_ZOOM:
+        return "hex"
+    return "sites"
+
+
+def _points(gdf, mask):
+    """Sites with coordinates under ``mask``: lat, lon, Regional and Site Class (unknown classes -> Other)."""
+    lat, lon = site_coordinates(gdf)
+    points = pd.DataFrame({
+        "lat": lat,
+        "lon": lon,
+        "Regional": gdf["Regional"].to_numpy() if "Regional" in gdf.columns else None,
+        "Site Class": gdf["Site Class"].to_numpy() if "Site Class" in gdf.columns else None,
+    })[mask]
+    points = points.dropna(subset=["lat", "lon"])
+    points["Site Class"] = points["Site Class"].where(points["Site Class"].isin(SITE_CLASSES), "Other")
+    return points
+
+
+def _class_counts(points, keys):
+    counts = pd.crosstab([points[k] for k in keys], points["Site Class"])
+    return counts.reindex(columns=CLASS_COLUMNS, fill_value=0)
+
+
+def regional_centroids(gdf, mask) -> pd.DataFrame:
+    """One row per Regional: centroid (lat, lon), site count and count per class."""
+    points = _points(gdf, mask).dropna(subset=["Regional"])
+    if points.empty:
+        return pd.DataFrame(columns=["Regional", "lat", "lon", "Sites"] + CLASS_COLUMNS)
+    centroids = points.groupby("Regional").agg(lat=("lat", "mean"), lon=("lon", "mean"), Sites=("lat", "size"))
+    return centroids.join(_class_counts(points, ["Regional"])).reset_index()
+
+
+def _hex_round(q, r):
+    """Nearest hex (axial coordinates) of fractional axial coordinates."""
+    x, z = q, r
+    y = -x - z
+    rx, ry, rz = np.round(x), np.round(y), np.round(z)
+    dx, dy, dz = np.abs(rx - x), np.abs(ry - y), np.abs(rz - z)
+    fix_x = (dx > dy) & (dx > dz)
+    fix_z = ~fix_x & (dz >= dy)
+    rx = np.where(fix_x, -ry - rz, rx)
+    rz = np.where(fix_z, -rx - ry, rz)
+    return rx.astype(np.int64), rz.astype(np.int64)
+
+
+def hex_center(q, r, size=HEX_SIZE_DEG):
+    """(lat, lon) of pointy-top hex centers, lon as x and lat as y."""
+    lon = size * np.sqrt(3) * (q + r / 2)
+    lat = size * 1.5 * r
+    return lat, lon
+
+
+def hex_bins(gdf, mask, size=HEX_SIZE_DEG) -> pd.DataFrame:
+    """Sites binned into hexagons: one row per non-empty hex with its center, count and count per class."""
+    points = _points(gdf, mask)
+    if points.empty:
+        return pd.DataFrame(columns=["q", "r", "lat", "lon", "Sites"] + CLASS_COLUMNS + ["Class"])
+    x, y = points["lon"].to_numpy(), points["lat"].to_numpy()
+    points["q"], points["r"] = _hex_round((np.sqrt(3) / 3 * x - y / 3) / size, (2 / 3 * y) / size)
+
+    bins = _class_counts(points, ["q", "r"])
+    bins.insert(0, "Sites", bins.sum(axis=1))
+    bins = bins.reset_index()
+    bins["lat"], bins["lon"] = hex_center(bins["q"].to_numpy(), bins["r"].to_numpy(), size)
+    bins["Class"] = bins[CLASS_COLUMNS].idxmax(axis=1)  # dominant class colors the hex
+    return bins[["q", "r", "lat", "lon", "Sites"] + CLASS_COLUMNS + ["Class"]]
+
+
+def build_site_levels(gdf) -> dict:
+    """{status filter: {"regional": centroids, "hex": hex bins}} for every STATUS_FILTERS entry."""
+    return {
+        status: {
+            "regional": regional_centroids(gdf, status_mask(gdf, status)),
+            "hex": hex_bins(gdf, status_mask(gdf, status)),
+        }
+        for status in STATUS_FILTERS
+    }
+
+
+@st.cache_resource(max_entries=2)
+def get_site_levels(name, version, _gdf) -> dict:
+    """Aggregate levels of a shared site frame, built once per data version (when the KML loads)."""
+    return build_site_levels(_gdf)
@@ -0,0 +1,246 @@
+import json
+import os
+from html import escape
+
+import folium
+import numpy as np
+import pandas as pd
+import streamlit as st
+from branca.element import MacroElement
+from folium.plugins import FastMarkerCluster
+from jinja2 import Template
+
+from utils.site_levels import (
+    CLASS_COLUMNS, HEX_MAX_ZOOM, HEX_SIZE_DEG, REGIONAL_MAX_ZOOM, STATUS_FILTERS, status_mask
+)
+
+# Hex values of the folium.Icon color names used for regionals (Leaflet.awesome-markers palette)
+MARKER_HEX = {
+    "red": "#d63e2a", "darkred": "#a23336", "lightred": "#ff8e7f", "orange": "#f69730",
+    "beige": "#ffcb92", "green": "#72b026", "darkgreen": "#728224", "lightgreen": "#bbf970",
+    "blue": "#38aadd", "darkblue": "#0067a3", "lightblue": "#8adaff", "purple": "#d252b9",
+    "darkpurple": "#5b396b", "pink": "#ff91ea", "cadetblue": "#436978", "gray": "#575757",
+    "lightgray": "#a3a3a3", "black": "#303030", "white": "#fbfbfb",
+}
+
+# Popup label -> site column (first one present wins)
+POPUP_FIELDS = [
+    ("Site ID", ["Site Id", "Site ID", "Name"]),
+    ("Site Name", ["Site Name"]),
+    ("Longitude", ["Longitude"]),
+    ("Latitude", ["Latitude"]),
+    ("Area", ["Area"]),
+    ("Regional", ["Regional"]),
+    ("NS", ["NS"]),
+    ("Site Class", ["Site Class"]),
+    ("Target AVA", ["Target"]),
+    ("Status", ["Status"]),
+]
+
+# Hex bin fill per dominant site class
+CLASS_HEX = {"Platinum": "#5b396b", "Gold": "#d4a017", "Silver": "#8e9aa6", "Bronze": "#b06a2c", "Other": "#575757"}
+
+# Viewport mode: most sites sent to the browser per view, and the view used before the map reports one
+VIEW_SITE_LIMIT = int(os.environ.get("DASHBOARD_MAP_VIEW_LIMIT", 2000))
+INDONESIA_BOUNDS = (-11.5, 94.5, 6.5, 141.5)  # south, west, north, east
+
+# Marker and popup are created in the browser from each compact data row:
+# [lat, lon, color, tooltip, popup values...]
+_MARKER_CALLBACK = """function (row) {
+    var labels = %s;
+    var escape = function (value) {
+        return String(value).replace(/[&<>"']/g, function (c) {
+            return {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[c];
+        });
+    };
+    var marker = L.circleMarker(new L.LatLng(row[0], row[1]), {
+        radius: 7, color: '#ffffff', weight: 1, fillColor: row[2], fillOpacity: 0.9
+    });
+    marker.bindTooltip(escape(row[3]));
+    marker.bindPopup(function () {
+        var html = '<div style="font-size: 14px; font-family: Arial, sans-serif;">';
+        for (var i = 0; i < labels.length; i++) {
+            html += '<b>' + labels[i] + ':</b> ' + escape(row[4 + i]) + '<br>';
+        }
+        return html + '</div>';
+    }, {maxWidth: 300});
+    return marker;
+}"""
+
+# Keeps exactly one level layer on the map: the first whose max zoom (null = any) covers the current zoom
+_ZOOM_LEVELS_SCRIPT = """
+{% macro script(this, kwargs) %}
+(function () {
+    var map = {{ this._parent.get_name() }};
+    var levels = [{% for max_zoom, layer in this.levels %}[{{ max_zoom }}, {{ layer.get_name() }}],{% endfor %}];
+    var update = function () {
+        var zoom = map.getZoom();
+        var shown = null;
+        levels.forEach(function (level) {
+            var visible = shown === null && (level[0] === null || zoom <= level[0]);
+            if (visible) {
+                shown = level[1];
+                if (!map.hasLayer(level[1])) { map.addLayer(level[1]); }
+            } else if (map.hasLayer(level[1])) {
+                map.removeLayer(level[1]);
+            }
+        });
+    };
+    map.on('zoomend', update);
+    update();
+})();
+{% endmacro %}
+"""
+
+
+def marker_rows(gdf, colors) -> list:
+    """Compact [lat, lon, color, tooltip, popup values...] rows for sites with coordinates."""
+    def column(candidates):
+        name = next((c for c in candidates if c in gdf.columns), None)
+        return gdf[name].astype(object).where(gdf[name].notna(), "") if name else pd.Series("", index=gdf.index)
+
+    frame = pd.DataFrame({
+        "lat": pd.to_numeric(gdf["Latitude"], errors="coerce"),
+        "lon": pd.to_numeric(gdf["Longitude"], errors="coerce"),
+        "color": pd.Series(colors, index=gdf.index).map(lambda c: MARKER_HEX.get(c, c)),
+        "tooltip": column(["Site Name"]),
+        **{label: column(candidates) for label, candidates in POPUP_FIELDS},
+    })
+    frame = frame.dropna(subset=["lat", "lon"])
+    # JSON-safe Python values (no numpy scalars)
+    return json.loads(frame.to_json(orient="values"))
+
+
+def site_layer(rows, name="Sites") -> FastMarkerCluster:
+    """Client-side cluster layer drawing markers from compact ``marker_rows``."""
+    labels = json.dumps([label for label, _ in POPUP_FIELDS])
+    return FastMarkerCluster(
+        rows,
+        callback=_MARKER_CALLBACK % labels,
+        name=name,
+        chunkedLoading=True,
+        disableClusteringAtZoom=11,
+    )
+
+
+# --- Level-of-detail layers (aggregates from utils.site_levels) ---
+def _class_breakdown(row):
+    return ", ".join(f"{c} {int(row[c])}" for c in CLASS_COLUMNS if row[c])
+
+
+def regional_layer(centroids, regional_colors, name="Regionals") -> folium.FeatureGroup:
+    """One bubble per Regional at its sites' centroid, sized by site count."""
+    layer = folium.FeatureGroup(name=name)
+    largest = max(centroids["Sites"].max(), 1) if len(centroids) else 1
+    for row in centroids.to_dict("records"):
+        size = int(36 + 44 * np.sqrt(row["Sites"] / largest))
+        color = MARKER_HEX.get(regional_colors.get(row["Regional"], "gray"), "#575757")
+        regional = escape(str(row["Regional"]))
+        folium.Marker(
+            [row["lat"], row["lon"]],
+            icon=folium.DivIcon(
+                html=(
+                    f'<div style="width:{size}px;height:{size}px;line-height:{size}px;border-radius:50%;'
+                    f'background:{color};opacity:0.85;border:2px solid #ffffff;text-align:center;'
+                    f'font:bold 13px Arial, sans-serif;color:#1f2d3d;">{int(row["Sites"]):,}</div>'
+                ),
+                icon_size=(size, size),
+                icon_anchor=(size // 2, size // 2),
+            ),
+            tooltip=f"<b>{regional}</b>: {int(row['Sites']):,} sites<br>{_class_breakdown(row)}",
+        ).add_to(layer)
+    return layer
+
+
+def hex_polygon(lat, lon, size=HEX_SIZE_DEG):
+    """[lon, lat] ring (GeoJSON order) of the pointy-top hexagon centered at (lat, lon)."""
+    angles = np.radians(30 + 60 * np.arange(7))
+    return np.column_stack([lon + size * np.cos(angles), lat + size * np.sin(angles)]).round(5).tolist()
+
+
+def hex_layer(bins, size=HEX_SIZE_DEG, name="Site density") -> folium.FeatureGroup:
+    """Hex bins colored by their dominant site class, more opaque where denser."""
+    layer = folium.FeatureGroup(name=name)
+    if bins.empty:
+        return layer
+    densest = max(np.log1p(bins["Sites"].max()), 1e-9)
+    features = [
+        {
+            "type": "Feature",
+            "geometry": {"type": "Polygon", "coordinates": [hex_polygon(row["lat"], row["lon"], size)]},
+            "properties": {
+                "fill": CLASS_HEX[row["Class"]],
+                "opacity": round(0.3 + 0.55 * float(np.log1p(row["Sites"])) / densest, 3),
+                "label": f"{int(row['Sites']):,} sites: {_class_breakdown(row)}",
+            },
+        }
+        for row in bins.to_dict("records")
+    ]
+    folium.GeoJson(
+        {"type": "FeatureCollection", "features": features},
+        style_function=lambda f: {
+            "fillColor": f["properties"]["fill"], "fillOpacity": f["properties"]["opacity"],
+            "color": "#ffffff", "weight": 1,
+        },
+        tooltip=folium.GeoJsonTooltip(fields=["label"], labels=False),
+    ).add_to(layer)
+    return layer
+
+
+def add_zoom_levels(m, levels):
+    """Show one of ``levels`` [(max zoom or None, layer), ...] at a time, switching in the browser on zoom."""
+    macro = MacroElement()
+    macro._template = Template(_ZOOM_LEVELS_SCRIPT)
+    macro.levels = [(json.dumps(max_zoom), layer) for max_zoom, layer in levels]
+    m.add_child(macro)
+
+
+def build_site_map(rows, decorate=None, levels=None, regional_colors=None, location=(-2, 118), zoom_start=5) -> folium.Map:
+    """Map with every site in one client-side cluster layer.
+
+    With ``levels`` ({"regional": ..., "hex": ...} aggregates) the sites are
+    only shown when zoomed in; regional bubbles and then class hex bins
+    stand in for them at lower zoom.
+    """
+    m = folium.Map(location=list(location), zoom_start=zoom_start)
+    sites = site_layer(rows).add_to(m)
+    if levels is not None:
+        regionals = regional_layer(levels["regional"], regional_colors or {}).add_to(m)
+        density = hex_layer(levels["hex"]).add_to(m)
+        add_zoom_levels(m, [(REGIONAL_MAX_ZOOM, regionals), (HEX_MAX_ZOOM, density), (None, sites)])
+    if decorate is not None:
+        decorate(m)
+    return m
+
+
+@st.cache_resource(max_entries=8, show_spinner="Drawing site map...")
+def site_map_html(version, status, _gdf, _colors, _decorate=None, _levels=None, _regional_colors=None) -> str:
+    """Standalone map HTML per (site data version, status filter); repeat views skip folium entirely.
+
+    ``_levels`` are the version's ``get_site_levels`` aggregates (per status filter).
+    """
+    mask = status_mask(_gdf, status)
+    rows = marker_rows(_gdf[mask], np.asarray(_colors)[mask])
+    levels = _levels[status] if _levels is not None else None
+    return build_site_map(rows, _decorate, levels, _regional_colors).get_root().render()
+
+
+# --- Viewport mode: only the sites in the visible area are sent ---
+def view_bounds(map_state, default=INDONESIA_BOUNDS):
+    """(south, west, north, east) of the last view reported by st_folium, else ``default``."""
+    bounds = (map_state or {}).get("bounds") or {}
+    try:
+        south_west, north_east = bounds["_southWest"], bounds["_northEast"]
+        return (float(south_west["lat"]), float(south_west["lng"]), float(north_east["lat"]), float(north_east["lng"]))
+    except (KeyError, TypeError, ValueError):
+        return default
+
+
+def viewport_positions(index, mask, bounds, limit=VIEW_SITE_LIMIT):
+    """(positions, total) of sites in ``bounds`` matching ``mask``, evenly thinned to at most ``limit``."""
+    positions = index.bbox(*bounds)
+    positions = positions[mask[positions]]
+    total = len(positions)
+    if total > limit:
+        positions = positions[np.linspace(0, total - 1, limit).astype(int)]
+    return positions, total
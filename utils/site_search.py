@@ -0,0 +1,145 @@
+import bisect
+import inspect
+import os
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Options sent to the browser per search selector
+SEARCH_LIMIT = 50
+# Typing pause after which the search box reruns the page with its query (Streamlit duration string)
+SEARCH_TYPING_PAUSE = os.environ.get("DASHBOARD_SEARCH_TYPING_PAUSE", "300ms")
+# Streamlit versions without ``text_input(live=...)`` only send the query on Enter / blur
+_LIVE_TEXT_INPUT = "live" in inspect.signature(st.text_input).parameters
+# Share of the query's trigrams a site must contain to count as a fuzzy match
+FUZZY_MIN_OVERLAP = 0.5
+
+# Score per kind of match; the best one wins for each site
+_EXACT, _ID_PREFIX, _NAME_PREFIX, _FUZZY = 100, 60, 40, 30
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SiteSearchIndex:
+    """Prefix and fuzzy (trigram) search over site ID and site name."""
+
+    def __init__(self, ids, names=None):
+        self.ids = list(ids)
+        names = list(names) if names is not None else [""] * len(self.ids)
+        self.names = ["" if pd.isna(n) else str(n).strip() for n in names]
+        self._name_of = dict(zip(self.ids, self.names))
+
+        self._pos_of = {site_id: pos for pos, site_id in enumerate(self.ids)}
+        self._exact = {str(site_id).strip().lower(): pos for pos, site_id in enumerate(self.ids)}
+        # Tie-break on ID order
+        self._id_rank = np.argsort(np.argsort([str(i) for i in self.ids], kind="stable"))
+
+        # Sorted tokens (ID, full name, each later name word) for prefix lookups by bisect
+        tokens = []
+        for pos, (site_id, name) in enumerate(zip(self.ids, self.names)):
+            tokens.append((str(site_id).strip().lower(), pos, _ID_PREFIX))
+            lowered = name.lower()
+            if lowered:
+                tokens.append((lowered, pos, _NAME_PREFIX))
+                tokens.extend((word, pos, _NAME_PREFIX) for word in lowered.split()[1:])
+        tokens.sort()
+        self._token_keys = [t[0] for t in tokens]
+        self._token_pos = np.array([t[1] for t in tokens], dtype=np.int64)
+        self._token_score = np.array([t[2] for t in tokens], dtype=float)
+
+        # Trigram -> positions, for typo-tolerant matching
+        postings = {}
+        for pos, (site_id, name) in enumerate(zip(self.ids, self.names)):
+            for gram in _trigrams(f"{str(site_id).lower()} {name.lower()}"):
+                postings.setdefault(gram, []).append(pos)
+        self._postings = {gram: np.asarray(p, dtype=np.int64) for gram, p in postings.items()}
+
+    def label(self, site_id):
+        name = self._name_of.get(site_id, "")
+        return f"{site_id} — {name}" if name else str(site_id)
+
+    def search(self, query, limit=SEARCH_LIMIT, allowed=None):
+        """Best matching site IDs: exact ID, ID prefix, name prefix, then fuzzy."""
+        query = str(query).strip().lower()
+        if not query or not self.ids:
+            return []
+        scores = np.zeros(len(self.ids))
+
+        # Prefix: one contiguous slice of the sorted tokens
+        start = bisect.bisect_left(self._token_keys, query)
+        end = bisect.bisect_left(self._token_keys, query + "\uffff", lo=start)
+        np.maximum.at(scores, self._token_pos[start:end], self._token_score[start:end])
+        if query in self._exact:
+            scores[self._exact[query]] = _EXACT
+
+        # Fuzzy: share of the query's trigrams found in the site's ID + name
+        query_grams = _trigrams(query)
+        grams = [self._postings[g] for g in query_grams if g in self._postings]
+        if grams:
+            overlap = np.bincount(np.concatenate(grams), minlength=len(self.ids)) / len(query_grams)
+            scores = np.maximum(scores, np.where(overlap >= FUZZY_MIN_OVERLAP, _FUZZY + overlap, 0))
+
+        if allowed is not None:
+            keep = np.zeros(len(self.ids), dtype=bool)
+            keep[[self._pos_of[a] for a in allowed if a in self._pos_of]] = True
+            scores[~keep] = 0
+
+        matched = np.flatnonzero(scores > 0)
+        order = np.lexsort((self._id_rank[matched], -scores[matched]))[:limit]
+        return [self.ids[pos] for pos in matched[order]]
+
+
+@st.cache_resource(max_entries=8)
+def get_site_search_index(name, version, _ids, _lookup=None, id_col=None, name_col=None) -> SiteSearchIndex:
+    """Search index over a site list, built once per data version.
+
+    Names come from ``_lookup[name_col]`` matched on ``_lookup[id_col]``
+    (IDs compared as stripped strings), e.g. the KML site master.
+    """
+    ids = list(_ids)
+    names = None
+    if _lookup is not None and not _lookup.empty and {id_col, name_col}.issubset(_lookup.columns):
+        lookup = _lookup.assign(_key=_lookup[id_col].astype(str).str.strip()).drop_duplicates("_key")
+        names = lookup.set_index("_key")[name_col].reindex([str(i).strip() for i in ids]).tolist()
+    return SiteSearchIndex(ids, names)
+
+
+def site_search_select(label, search_index, key, allowed=None, default=None, leading=(), limit=SEARCH_LIMIT, container=None):
+    """Search box plus a selectbox holding only the matching sites (at most ``limit``).
+
+    The query is sent while typing, after a ``SEARCH_TYPING_PAUSE`` pause, so
+    the selectbox refills as the operator types. Without a query the selectbox offers the first ``limit`` allowed sites,
+    keeping the current and default choices selectable. ``leading`` options
+    (e.g. "All") are always offered first.
+    """
+    container = container or st
+    live = {"live": SEARCH_TYPING_PAUSE} if _LIVE_TEXT_INPUT else {}
+    query = container.text_input(f"🔎 Search {label}", key=f"{key}_query", placeholder="Site ID or name", **live)
+
+    candidates = list(allowed) if allowed is not None else search_index.ids
+    if query.strip():
+        options = search_index.search(query, limit=limit, allowed=candidates)
+    else:
+        options = candidates[:limit]
+        candidate_set = set(candidates)
+        for pick in (default, st.session_state.get(key)):
+            if pick is not None and pick not in options and pick in candidate_set:
+                options = [pick] + options
+    options = list(leading) + [o for o in options if o not in leading]
+
+    if not options:
+        container.caption("No matching site.")
+        return None
+
+    current = st.session_state.get(key)
+    if current in options and not query.strip():
+        index = options.index(current)
+    elif default in options and not query.strip():
+        index = options.index(default)
+    else:
+        index = 0
+    return container.selectbox(label, options, index=index, key=key, format_func=search_index.label)
@@ -0,0 +1,152 @@
+"""Offline snapshot bundle: every dataset in one zip of Parquet files plus a manifest.
+
+Export (needs live Drive credentials):
+    python -m utils.snapshot export snapshots/dashboard.zip
+
+Run the dashboard from a bundle, without any Drive call or secrets:
+    DASHBOARD_SNAPSHOT=snapshots/dashboard.zip streamlit run app.py
+"""
+import hashlib
+import io
+import json
+import os
+import sys
+import zipfile
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+
+SNAPSHOT_ENV = "DASHBOARD_SNAPSHOT"
+MANIFEST_NAME = "manifest.json"
+FORMAT_VERSION = 1
+PARQUET_COMPRESSION = "zstd"
+
+
+def snapshot_path():
+    """Bundle path when the app runs offline from a snapshot, else ''."""
+    return os.environ.get(SNAPSHOT_ENV, "")
+
+
+def _member_name(name):
+    return f"{name}.parquet"
+
+
+def _to_parquet_frame(df):
+    """Make Excel-loaded frames Parquet-safe: string column names, no mixed-type object columns."""
+    df = pd.DataFrame(df).copy()
+    df.columns = [str(c) for c in df.columns]
+    for col in df.columns:
+        if df[col].dtype == object and pd.api.types.infer_dtype(df[col], skipna=True).startswith("mixed"):
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+
+def write_snapshot(path, datasets):
+    """Write {name: DataFrame} to ``path`` and return the manifest.
+
+    GeoDataFrames are stored without their geometry column and rebuilt from
+    ``lon``/``lat`` on read.
+    """
+    from utils.shared_data import frame_fingerprint
+
+    entries = {}
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED) as zf:
+        for name, df in datasets.items():
+            has_geometry = "geometry" in getattr(df, "columns", [])
+            frame = _to_parquet_frame(df.drop(columns=["geometry"]) if has_geometry else df)
+
+            buffer = io.BytesIO()
+            frame.to_parquet(buffer, index=False, compression=PARQUET_COMPRESSION)
+            zf.writestr(_member_name(name), buffer.getvalue())
+
+            entries[name] = {
+                "file": _member_name(name),
+                "rows": len(frame),
+                "columns": list(frame.columns),
+                "fingerprint": frame_fingerprint(frame),
+                "geometry": "points_from_lon_lat" if has_geometry else None,
+            }
+
+        bundle_version = hashlib.sha1(
+            "".join(f"{n}:{e['fingerprint']}" for n, e in sorted(entries.items())).encode("utf-8")
+        ).hexdigest()[:12]
+        manifest = {
+            "format_version": FORMAT_VERSION,
+            "version": bundle_version,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "datasets": entries,
+        }
+        zf.writestr(MANIFEST_NAME, json.dumps(manifest, indent=2))
+    return manifest
+
+
+@st.cache_resource
+def read_manifest(path):
+    with zipfile.ZipFile(path) as zf:
+        manifest = json.loads(zf.read(MANIFEST_NAME))
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format {manifest.get('format_version')} in {path}")
+    return manifest
+
+
+def read_snapshot_dataset(name, path=None):
+    """Load one dataset from the bundle (a fresh frame on every call)."""
+    path = path or snapshot_path()
+    entry = read_manifest(path)["datasets"].get(name)
+    if entry is None:
+        raise FileNotFoundError(f"Dataset '{name}' is not in snapshot {path}")
+
+    with zipfile.ZipFile(path) as zf:
+        df = pd.read_parquet(io.BytesIO(zf.read(entry["file"])))
+
+    if entry.get("geometry") == "points_from_lon_lat":
+        import geopandas as gpd
+        df = gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(df["lon"], df["lat"]), crs="EPSG:4326")
+    return df
+
+
+def collect_datasets():
+    """Load every dataset from Drive, keyed by its snapshot name."""
+    from utils import data_loader, drive_utils
+    from my_pages import tracker_bbm, tracker_tde
+
+    df_site, df_bbm = data_loader.read_bbm_sources(
+        data_loader.get_drive(), tracker_bbm.ALL_SITE_FILE, tracker_bbm.BBM_FILE, tracker_bbm.DATA_FOLDER_ID
+    )
+    df_plan, df_actual = drive_utils.read_kurva_s_sources(tracker_tde.EXCEL_FOLDER_ID)
+
+    return {
+        "kml_sites": data_loader.load_kml_file(data_loader.get_drive()),
+        "daily": data_loader.load_all_daily_files(),
+        "weekly": data_loader.load_all_weekly_files(),
+        "availability_vs_penalty": data_loader.load_availability_vs_penalty_data(),
+        "penalty": data_loader.load_penalty_data(),
+        "bbm_sites": df_site,
+        "bbm_refills": df_bbm,
+        "kurva_s_plan": df_plan,
+        "kurva_s_actual": df_actual,
+        drive_utils.snapshot_excel_name("sow_tde.xlsx"): drive_utils.read_excel_from_drive(
+            tracker_tde.EXCEL_FOLDER_ID, "sow_tde.xlsx"
+        ),
+        drive_utils.snapshot_excel_name(tracker_tde.EXCEL_FILE_NAME): drive_utils.read_excel_from_drive(
+            tracker_tde.EXCEL_FOLDER_ID, tracker_tde.EXCEL_FILE_NAME
+        ),
+    }
+
+
+def export_snapshot(path):
+    if snapshot_path():
+        raise RuntimeError(f"Unset {SNAPSHOT_ENV} to export: the export reads live Drive data.")
+    return write_snapshot(path, collect_datasets())
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "export":
+        print("Usage: python -m utils.snapshot export <bundle.zip>")
+        sys.exit(1)
+    manifest = export_snapshot(sys.argv[2])
+    print(f"Snapshot {manifest['version']} written to {sys.argv[2]}:")
+    for name, entry in manifest["datasets"].items():
+        print(f"  {name}: {entry['rows']} rows")
@@ -0,0 +1,131 @@
+import os
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+
+# Grid cell size in degrees (0.25 deg ~ 28 km at the equator)
+GRID_CELL_DEG = float(os.environ.get("DASHBOARD_SPATIAL_CELL_DEG", 0.25))
+
+
+def haversine_km(lat, lon, lats, lons) -> np.ndarray:
+    """Great-circle distance (km) from one point to arrays of points."""
+    lat1, lon1 = np.radians(lat), np.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+class SpatialIndex:
+    """Uniform lat/lon grid over site points.
+
+    Points are bucketed into ``cell_deg`` cells, so bounding-box, radius and
+    nearest-K queries only look at the cells they overlap instead of every
+    site. Results are ``iloc`` positions into the indexed frame; rows
+    without coordinates are never returned.
+    """
+
+    def __init__(self, lat, lon, cell_deg=GRID_CELL_DEG):
+        self.n_rows = len(lat)
+        self.cell_deg = cell_deg
+        self._lat = np.asarray(lat, dtype=float)
+        self._lon = np.asarray(lon, dtype=float)
+        self._valid = np.flatnonzero(np.isfinite(self._lat) & np.isfinite(self._lon))
+
+        # Cell key = row * stride + col, both shifted to be non-negative
+        self._offset = int(np.ceil(180 / cell_deg)) + 1
+        self._stride = 2 * self._offset + 1
+        rows, cols = self._cell(self._lat[self._valid], self._lon[self._valid])
+        keys = rows * self._stride + cols
+        order = np.argsort(keys, kind="stable")
+        self._positions = self._valid[order]
+        cell_keys, starts = np.unique(keys[order], return_index=True)
+        ends = np.append(starts[1:], len(keys))
+        self._cells = dict(zip(cell_keys.tolist(), zip(starts.tolist(), ends.tolist())))
+
+    def __len__(self):
+        return len(self._valid)
+
+    def _cell(self, lat, lon):
+        rows = np.floor(np.asarray(lat) / self.cell_deg).astype(np.int64) + self._offset
+        cols = np.floor(np.asarray(lon) / self.cell_deg).astype(np.int64) + self._offset
+        return rows, cols
+
+    def _candidates(self, south, west, north, east) -> np.ndarray:
+        """Positions in the grid cells overlapping a box (a superset of the box)."""
+        (r0, r1), (c0, c1) = self._cell([south, north], [west, east])
+        n_cells = (r1 - r0 + 1) * (c1 - c0 + 1)
+        if n_cells > len(self._cells):
+            # Box covers more cells than are occupied: a plain scan is cheaper
+            return self._valid
+        keys = (np.arange(r0, r1 + 1)[:, None] * self._stride + np.arange(c0, c1 + 1)[None, :]).ravel()
+        spans = [self._cells[k] for k in keys.tolist() if k in self._cells]
+        if not spans:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([self._positions[start:end] for start, end in spans])
+
+    # --- Queries ---
+    def bbox(self, south, west, north, east) -> np.ndarray:
+        """Positions inside a lat/lon box, in frame order."""
+        south, north = max(south, -90.0), min(north, 90.0)
+        west, east = max(west, -180.0), min(east, 180.0)
+        if south > north or west > east:
+            return np.empty(0, dtype=np.int64)
+        candidates = self._candidates(south, west, north, east)
+        lat, lon = self._lat[candidates], self._lon[candidates]
+        inside = (lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)
+        return np.sort(candidates[inside])
+
+    def within(self, lat, lon, radius_km, exclude=None):
+        """(positions, distances in km) of points within ``radius_km``, nearest first."""
+        dlat = radius_km / KM_PER_DEGREE
+        dlon = radius_km / (KM_PER_DEGREE * max(np.cos(np.radians(lat)), 0.01))
+        candidates = self._candidates(
+            max(lat - dlat, -90.0), max(lon - dlon, -180.0), min(lat + dlat, 90.0), min(lon + dlon, 180.0)
+        )
+        if exclude is not None:
+            candidates = candidates[candidates != exclude]
+        distances = haversine_km(lat, lon, self._lat[candidates], self._lon[candidates])
+        keep = distances <= radius_km
+        order = np.argsort(distances[keep], kind="stable")
+        return candidates[keep][order], distances[keep][order]
+
+    def nearest(self, lat, lon, k, exclude=None):
+        """(positions, distances in km) of the ``k`` nearest points, nearest first."""
+        available = len(self) - (exclude is not None)
+        k = min(k, available)
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        # Grow the search radius until it holds k points; all of them are then
+        # closer than anything outside the radius
+        radius = self.cell_deg * KM_PER_DEGREE
+        while radius < np.pi * EARTH_RADIUS_KM:
+            positions, distances = self.within(lat, lon, radius, exclude)
+            if len(positions) >= k:
+                return positions[:k], distances[:k]
+            radius *= 2
+        positions, distances = self.within(lat, lon, np.pi * EARTH_RADIUS_KM, exclude)
+        return positions[:k], distances[:k]
+
+    def point(self, position):
+        """(lat, lon) of one indexed row."""
+        return self._lat[position], self._lon[position]
+
+
+def site_coordinates(gdf):
+    """Latitude / longitude arrays of a site frame (columns first, point geometry as fallback)."""
+    if {"Latitude", "Longitude"}.issubset(gdf.columns):
+        return (
+            pd.to_numeric(gdf["Latitude"], errors="coerce").to_numpy(dtype=float),
+            pd.to_numeric(gdf["Longitude"], errors="coerce").to_numpy(dtype=float),
+        )
+    return gdf.geometry.y.to_numpy(dtype=float), gdf.geometry.x.to_numpy(dtype=float)
+
+
+@st.cache_resource(max_entries=4)
+def get_spatial_index(name, version, _gdf) -> SpatialIndex:
+    """Spatial index of a shared site frame, built once per data version."""
+    return SpatialIndex(*site_coordinates(_gdf))
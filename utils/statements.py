@@ -0,0 +1,138 @@
+"""Monthly penalty statements: one workbook per Regional TI, packaged as a zip.
+
+Workbooks are written by worker processes with xlsxwriter in constant-memory
+mode (rows are streamed to disk as they are written), so memory stays flat
+however many site-months a regional has.
+"""
+import io
+import multiprocessing
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import xlsxwriter
+
+# Worker processes for statement generation (1 = in-process, no pool)
+STATEMENT_WORKERS = int(os.environ.get("DASHBOARD_STATEMENT_WORKERS", min(os.cpu_count() or 1, 8)))
+
+# Statement columns written as numbers with an Excel format instead of display text
+PERCENT_COLUMNS = ["Target Availability (%)", "Availability", "Gap Ava", "Prosentase Penalty"]
+MONEY_COLUMNS = ["Nilai BAST", "Nilai Penalty"]
+SITE_DETAIL_COLUMNS = ["Site Id", "Site Name", "Class Site", "Months", "Not Achieved Months", "Nilai BAST", "Nilai Penalty"]
+
+
+def _safe_name(text):
+    return re.sub(r"[^A-Za-z0-9_-]+", "_", str(text)).strip("_") or "Unknown"
+
+
+def statement_frames(df: pd.DataFrame, facts: pd.DataFrame) -> dict:
+    """{Regional TI: (penalty table, monthly summary, site details)} from the shared frame and penalty facts."""
+    raw = df.assign(
+        _regional=df["Regional TI"].fillna("Unknown"),
+        _month=pd.to_datetime(df["Periode Tagihan (Awal)"], errors="coerce").dt.to_period("M").dt.to_timestamp(),
+        _missed=df["Status"].eq("Not Achieved").astype(int),
+        **{col: pd.to_numeric(df[col], errors="coerce") for col in MONEY_COLUMNS if col in df.columns},
+    )
+    amount_cols = [col for col in MONEY_COLUMNS if col in raw.columns]
+
+    monthly = raw.groupby(["_regional", "_month"]).agg(
+        Sites=("Site Id", "nunique"),
+        **{"Not Achieved": ("_missed", "sum")},
+        **{col: (col, "sum") for col in amount_cols},
+    ).reset_index()
+    monthly.insert(2, "Achieved", monthly["Sites"] - monthly["Not Achieved"])
+    monthly["Month"] = monthly["_month"].dt.strftime("%B-%Y")
+
+    latest = raw.sort_values("_month").groupby(["_regional", "Site Id"])
+    sites = latest.agg(
+        **{"Site Name": ("Site Name", "last"), "Class Site": ("Class Site", "last")},
+        Months=("_month", "nunique"),
+        **{"Not Achieved Months": ("_missed", "sum")},
+        **{col: (col, "sum") for col in amount_cols},
+    ).reset_index()
+
+    # Penalty table: the page's rows, with the numeric values taken back from the source frame
+    table = facts.copy()
+    table["Target Availability (%)"] = pd.to_numeric(df.loc[table.index, "Target Availability (%)"], errors="coerce")
+    table["Availability"] = pd.to_numeric(df.loc[table.index, "Availability"], errors="coerce")
+    table["Gap Ava"] = table["Availability"] - table["Target Availability (%)"]
+    table["Prosentase Penalty"] = pd.to_numeric(table["Prosentase Penalty"].astype(str).str.rstrip("%"), errors="coerce") / 100
+    table["Nilai Penalty"] = pd.to_numeric(df.loc[table.index, "Nilai Penalty"], errors="coerce")
+
+    table_regional = table["Regional TI"].fillna("Unknown")
+    frames = {}
+    for regional in sorted(raw["_regional"].unique(), key=str):
+        frames[regional] = (
+            table[table_regional == regional],
+            monthly.loc[monthly["_regional"] == regional, ["Month", "Sites", "Achieved", "Not Achieved"] + amount_cols],
+            sites.loc[sites["_regional"] == regional, [c for c in SITE_DETAIL_COLUMNS if c in sites.columns]],
+        )
+    return frames
+
+
+def _write_sheet(workbook, name, frame, header_format, column_formats):
+    worksheet = workbook.add_worksheet(name)
+    for i, col in enumerate(frame.columns):
+        worksheet.set_column(i, i, max(12, min(len(str(col)) + 4, 40)), column_formats.get(col))
+    worksheet.freeze_panes(1, 0)
+
+    # Constant-memory mode: rows must be written top to bottom, each one once
+    worksheet.write_row(0, 0, [str(c) for c in frame.columns], header_format)
+    values = frame.astype(object).where(frame.notna(), None)
+    for r, row in enumerate(values.itertuples(index=False, name=None), start=1):
+        worksheet.write_row(r, 0, row)
+
+
+def statement_file_names(regionals) -> dict:
+    """{regional: file name}, unique even when regionals sanitize to the same name ("Regional 1" / "Regional/1")."""
+    names, taken = {}, set()
+    for regional in regionals:
+        base = f"penalty_statement_{_safe_name(regional)}"
+        name, counter = f"{base}.xlsx", 2
+        while name.lower() in taken:
+            name, counter = f"{base}_{counter}.xlsx", counter + 1
+        taken.add(name.lower())
+        names[regional] = name
+    return names
+
+
+def write_statement(file_name, table, monthly, sites):
+    """(file name, xlsx bytes) of one regional's statement; runs in a worker process."""
+    buffer = io.BytesIO()
+    workbook = xlsxwriter.Workbook(buffer, {"constant_memory": True})
+    header_format = workbook.add_format({"bold": True, "bg_color": "#DDEBF7", "border": 1})
+    money_format = workbook.add_format({"num_format": "#,##0"})
+    percent_format = workbook.add_format({"num_format": "0.00%"})
+    column_formats = {
+        **{col: money_format for col in MONEY_COLUMNS},
+        **{col: percent_format for col in PERCENT_COLUMNS},
+    }
+    _write_sheet(workbook, "Penalty Table", table, header_format, column_formats)
+    _write_sheet(workbook, "Monthly Summary", monthly, header_format, column_formats)
+    _write_sheet(workbook, "Site Details", sites, header_format, column_formats)
+    workbook.close()
+    return file_name, buffer.getvalue()
+
+
+def build_statements_zip(df: pd.DataFrame, facts: pd.DataFrame, workers=STATEMENT_WORKERS) -> bytes:
+    """Every regional's statement workbook, generated in parallel, in one zip archive."""
+    frames = statement_frames(df, facts)
+    file_names = statement_file_names(frames)
+    jobs = [(file_names[regional], *parts) for regional, parts in frames.items()]
+
+    if workers > 1 and len(jobs) > 1:
+        # Spawned, not forked: forking the multithreaded Streamlit server can deadlock the children
+        spawn = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), mp_context=spawn) as pool:
+            outputs = list(pool.map(write_statement, *zip(*jobs)))
+    else:
+        outputs = [write_statement(*job) for job in jobs]
+
+    archive = io.BytesIO()
+    # xlsx files are already deflated; storing avoids compressing them twice
+    with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_STORED) as zf:
+        for file_name, content in outputs:
+            zf.writestr(file_name, content)
+    return archive.getvalue()
@@ -0,0 +1,207 @@
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, NamedTuple
+
+import streamlit as st
+
+from utils.data_loader import (
+    get_drive,
+    load_kml_file,
+    load_all_daily_files,
+    load_all_weekly_files,
+    load_penalty_data,
+    load_availability_vs_penalty_data,
+)
+from utils.drive_utils import load_kurva_s, read_excel_from_drive
+from utils.shared_data import (
+    get_shared_sites,
+    get_shared_daily,
+    get_shared_weekly,
+    get_shared_availability_vs_penalty,
+)
+from utils.cubes import get_daily_cube
+from utils.availability_metrics import get_anomalies
+from my_pages import tracker_bbm, tracker_tde
+
+logger = logging.getLogger(__name__)
+
+# --- Config (environment) ---
+# Seconds between background re-prefetches; keep it below the loaders' 3600s TTL. 0 disables.
+PREFETCH_INTERVAL = int(os.environ.get("DASHBOARD_PREFETCH_INTERVAL", 3000))
+# Written once every dataset has loaded, for the load balancer / readiness probe.
+READY_FILE = os.environ.get("DASHBOARD_READY_FILE", "")
+# Seconds between retries of datasets that have never loaded (blocks readiness until they do).
+RETRY_INTERVAL = int(os.environ.get("DASHBOARD_WARMUP_RETRY_INTERVAL", 60))
+
+def _daily_with_aggregates():
+    shared = get_shared_daily()
+    get_daily_cube(shared.name, shared.version, shared.df)  # only new/changed days are aggregated
+    get_anomalies(shared.name, shared.version, shared.df)
+
+
+class Dataset(NamedTuple):
+    """A dataset the warmup loads.
+
+    ``source(*args())`` is the cached read of the raw data; ``then`` builds
+    what is derived from it (shared frames, aggregates), and ``derived`` are
+    the caches it fills, rebuilt after a re-prefetch.
+    """
+    priority: int
+    name: str
+    source: Callable
+    args: Callable = tuple
+    then: Callable = None
+    derived: tuple = ()
+
+
+# --- Registered datasets, loaded in priority order ---
+DATASETS = [
+    Dataset(1, "kml_sites", load_kml_file, lambda: (get_drive(),), get_shared_sites, (get_shared_sites,)),
+    Dataset(2, "daily", load_all_daily_files, then=_daily_with_aggregates, derived=(get_shared_daily,)),
+    Dataset(3, "weekly", load_all_weekly_files, then=get_shared_weekly, derived=(get_shared_weekly,)),
+    Dataset(4, "availability_vs_penalty", load_availability_vs_penalty_data,
+            then=get_shared_availability_vs_penalty, derived=(get_shared_availability_vs_penalty,)),
+    Dataset(5, "penalty", load_penalty_data),
+    Dataset(6, "bbm_tracker", tracker_bbm.load_processed_data),
+    Dataset(7, "kurva_s", load_kurva_s, lambda: (tracker_tde.EXCEL_FOLDER_ID,)),
+    Dataset(8, "tde_sow", read_excel_from_drive, lambda: (tracker_tde.EXCEL_FOLDER_ID, "sow_tde.xlsx")),
+    Dataset(9, "tde_activity", read_excel_from_drive,
+            lambda: (tracker_tde.EXCEL_FOLDER_ID, tracker_tde.EXCEL_FILE_NAME)),
+]
+
+
+def _refresh_source(dataset, args):
+    """Re-read a source once, bypassing the cache, and cache that read.
+
+    The cached entry is only replaced after the read succeeded, so a failed
+    re-prefetch leaves sessions on the previous data.
+    """
+    data = dataset.source.__wrapped__(*args)
+    dataset.source.clear(*args)
+    dataset.source(*args, _prefetched=data)  # stored as-is, not read again
+    for func in dataset.derived:
+        func.clear()
+
+
+def _load_all(state, refresh=False, only=None):
+    for dataset in sorted(DATASETS, key=lambda d: d.priority):
+        if only is not None and dataset.name not in only:
+            continue
+        started = time.perf_counter()
+        try:
+            args = dataset.args()
+            if refresh:
+                _refresh_source(dataset, args)
+            else:
+                dataset.source(*args)
+            if dataset.then is not None:
+                dataset.then()
+            with state["lock"]:
+                state["loaded"][dataset.name] = round(time.perf_counter() - started, 2)
+                state["errors"].pop(dataset.name, None)
+        except Exception as e:
+            logger.warning("Failed to load %s: %s", dataset.name, e)
+            with state["lock"]:
+                state["errors"][dataset.name] = str(e)
+
+
+def _missing(state):
+    """Datasets that have never loaded in this process."""
+    with state["lock"]:
+        return [d.name for d in DATASETS if d.name not in state["loaded"]]
+
+
+def _finish_pass(state):
+    missing = _missing(state)
+    with state["lock"]:
+        state["ready"] = not missing
+        state["last_prefetch"] = datetime.now().isoformat(timespec="seconds")
+    _write_ready_file(state)
+    return missing
+
+
+def _status(state):
+    with state["lock"]:
+        return {
+            "ready": state["ready"],
+            "started": state["started"],
+            "last_prefetch": state["last_prefetch"],
+            "prefetch_interval": PREFETCH_INTERVAL,
+            "loaded": dict(state["loaded"]),
+            "errors": dict(state["errors"]),
+        }
+
+
+def _write_ready_file(state):
+    if not READY_FILE or not state["ready"]:
+        return
+    with open(READY_FILE, "w") as f:
+        json.dump(_status(state), f, indent=2)
+
+
+def _run(state):
+    _load_all(state)
+    missing = _finish_pass(state)
+    if missing:
+        logger.warning("Not ready: %s failed to load", ", ".join(missing))
+
+    # Datasets that never loaded are retried until they do; readiness waits for them
+    while missing and RETRY_INTERVAL > 0:
+        time.sleep(RETRY_INTERVAL)
+        _load_all(state, only=missing)
+        missing = _finish_pass(state)
+    if not missing:
+        logger.info("Ready: %d datasets loaded", len(state["loaded"]))
+
+    while PREFETCH_INTERVAL > 0:
+        time.sleep(PREFETCH_INTERVAL)
+        _load_all(state, refresh=True)
+        _finish_pass(state)
+
+
+@st.cache_resource
+def start_warmup():
+    """Start the background warmup/prefetch thread once per server process.
+
+    ``python warmup.py`` calls it before the Streamlit server starts, so the
+    worker warms up and writes ``READY_FILE`` without waiting for traffic.
+    app.py calls it too: under plain ``streamlit run app.py`` the first
+    session starts the thread, otherwise it returns the running one.
+    """
+    if READY_FILE and os.path.exists(READY_FILE):
+        os.remove(READY_FILE)  # stale marker from a previous process
+
+    state = {
+        "lock": threading.Lock(),
+        "ready": False,
+        "loaded": {},
+        "errors": {},
+        "last_prefetch": None,
+        "started": datetime.now().isoformat(timespec="seconds"),
+    }
+    thread = threading.Thread(target=_run, args=(state,), name="dataset-warmup", daemon=True)
+    thread.start()
+    return state
+
+
+def warmup_status():
+    """Readiness and per-dataset load times (seconds) of the warmup thread."""
+    return _status(start_warmup())
+
+
+# --- Server entrypoint: python warmup.py [streamlit run options] ---
+if __name__ == "__main__":
+    import sys
+    from streamlit.web import cli as stcli
+
+    import warmup  # the module app.py imports, so both share one warmup thread and its caches
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    warmup.start_warmup()
+    app_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+    sys.argv = ["streamlit", "run", app_path, *sys.argv[1:]]
+    sys.exit(stcli.main())